@@ -10,27 +10,147 @@ class Settings(BaseSettings):
     
     # LongCat API Configuration
     longcat_api_key: str = ""
+    # OpenAI-compatible endpoint; point it at a local stand-in for benchmarks
+    longcat_base_url: str = "https://api.longcat.chat/openai"
     
     # Vector Database Configuration (FAISS)
     faiss_index_path: str = "./faiss_index"
     
+    # Index layout used for full rebuilds: flat (exact), ivf_flat, ivf_pq or hnsw.
+    # faiss_ivf_nlist=0 picks ~4*sqrt(n) lists; nprobe/ef_search are the default
+    # per-query recall/latency knobs and can be overridden per chat request
+    faiss_index_type: str = "flat"
+    faiss_ivf_nlist: int = 0
+    faiss_pq_m: int = 16
+    faiss_pq_nbits: int = 8
+    faiss_hnsw_m: int = 32
+    faiss_hnsw_ef_construction: int = 200
+    faiss_nprobe: int = 8
+    faiss_ef_search: int = 64
+    faiss_train_sample: int = 50000
+    # Memory-map index.faiss and the chunk store on load so several worker
+    # processes share one copy through the page cache; the first update in a
+    # process copies the index into its memory
+    index_mmap: bool = False
+    
+    # Bind at once and load the embedding model and index in the background
+    # (/health reports "starting" until done); skips the startup data folder scan
+    fast_startup: bool = False
+    
     # Data Configuration
     data_folder: str = "./data"
     
+    # Embedding Configuration
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_normalize: bool = True
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "./embedding_cache"
+    embedding_cache_max_entries: int = 200000
+    
     # RAG Configuration
     chunk_size: int = 1000
     chunk_overlap: int = 200
     similarity_k: int = 5
     
+    # Context assembly: retrieved chunks overlapping in the same source are
+    # merged, chunks with a MinHash similarity of at least
+    # context_dedup_threshold to a better ranked one are dropped (0 disables),
+    # and the rest is packed into context_max_tokens (0 = unlimited), counted
+    # with the embedding model's tokenizer
+    context_merge_enabled: bool = True
+    context_dedup_threshold: float = 0.8
+    context_max_tokens: int = 1500
+    
+    # Hybrid retrieval: dense (FAISS) and BM25 keyword candidates, hybrid_candidates
+    # from each side, fused with weighted reciprocal rank fusion
+    hybrid_search_enabled: bool = True
+    hybrid_candidates: int = 20
+    hybrid_dense_weight: float = 1.0
+    hybrid_sparse_weight: float = 1.0
+    hybrid_rrf_k: int = 60
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    
+    # Semantic response cache: a query whose embedding has at least the given
+    # cosine similarity to an earlier one gets that query's answer, until the
+    # TTL expires or the indexed documents change
+    response_cache_enabled: bool = True
+    response_cache_max_entries: int = 1000
+    response_cache_ttl_seconds: float = 3600.0
+    response_cache_similarity_threshold: float = 0.95
+    
+    # Exact-match LRU caches: query text -> embedding, and embedding + search
+    # parameters + index version -> retrieved chunks
+    query_cache_enabled: bool = True
+    query_cache_max_entries: int = 1024
+    retrieval_cache_max_entries: int = 256
+    
+    # Processes used to load and split files during a full reindex (0 = one per
+    # CPU core), and chunks embedded and added to the index per streamed batch
+    ingestion_workers: int = 0
+    ingestion_batch_size: int = 256
+    
+    # Worker threads for embedding/search of async chat requests; keep at least
+    # query_batch_max_size so concurrent queries can fill an embedding batch
+    query_executor_workers: int = 32
+    
+    # Micro-batching of concurrent query embeddings into one forward pass
+    query_batch_enabled: bool = True
+    query_batch_max_size: int = 32
+    query_batch_wait_ms: float = 5.0
+    
+    # Background indexing worker: wait for a quiet period of debounce_ms, but
+    # never delay an update longer than max_delay_ms; nice lowers its CPU priority
+    index_worker_debounce_ms: int = 500
+    index_worker_max_delay_ms: int = 5000
+    index_worker_nice: int = 10
+    
+    # Watch the data folder and index created/modified/deleted files automatically;
+    # watch_backend is auto (inotify, falling back to polling), inotify or polling
+    watch_data_folder: bool = False
+    watch_backend: str = "auto"
+    watch_poll_interval_ms: int = 1000
+    watch_debounce_ms: int = 1000
+    
     # LLM Configuration
     llm_model: str = "LongCat-Flash-Chat"
     llm_temperature: float = 0.7
     llm_max_tokens: int = 8192
     
+    # LLM HTTP client: pooled keep-alive connections, connect/read timeouts
+    # and a deadline (seconds) for a whole answer or the first streamed token;
+    # 429, 5xx and connection errors are retried with jittered exponential
+    # backoff, honoring Retry-After up to llm_retry_max_delay. With hedging, a
+    # second identical request is sent once the first has been slower than
+    # llm_hedge_percentile of recent calls, and the first answer wins
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 30.0
+    llm_connect_timeout: float = 5.0
+    llm_read_timeout: float = 60.0
+    llm_timeout: float = 120.0
+    llm_max_retries: int = 2
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 10.0
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_min_delay: float = 1.0
+    llm_hedge_min_samples: int = 20
+    
     # Server Configuration
     backend_host: str = "0.0.0.0"
     backend_port: int = 8000
     
+    # Logging: level, text or json (one JSON object per line), async writes
+    # through a bounded queue (records are dropped rather than blocking when it
+    # is full), and the share of queries whose retrieval/prompt/response
+    # details are logged
+    log_level: str = "INFO"
+    log_format: str = "text"
+    log_async: bool = True
+    log_queue_size: int = 10000
+    log_query_sample_rate: float = 1.0
+    
     # System Prompt
     system_prompt: str = (
         "You are Isabella a helpful,lovely,caring,possessive and obsessive girl.Address the user as Sir or Master always."
@@ -1,29 +1,304 @@
 """LongCat API client wrapper using OpenAI-compatible interface."""
 
-from typing import Optional
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 
-from openai import OpenAI
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+    Timeout,
+)
 
 from app.config import get_settings
 from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+
+# Errors worth another attempt: rate limits, 5xx and network failures
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+# Latencies kept per request kind for the hedging percentile
+HEDGE_WINDOW = 256
 
 
 class LongCatClient:
-    """Client for interacting with LongCat API using OpenAI-compatible interface."""
+    """
+    Client for interacting with LongCat API using OpenAI-compatible interface.
+    
+    Requests share a pooled keep-alive HTTP client with explicit connect and
+    read timeouts. Rate limit (429), server (5xx) and connection errors are
+    retried here rather than by the SDK, with full-jitter exponential backoff
+    that honors Retry-After. The async methods (used by the API) also enforce
+    llm_timeout for a whole answer or the first streamed chunk and, with
+    llm_hedge_enabled, hedge slow requests: once a request has run longer than
+    llm_hedge_percentile of recent ones, an identical second request is sent
+    and whichever answers first is used.
+    """
     
     def __init__(self):
         self.settings = get_settings()
         self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._latencies: dict[str, deque] = {
+            "complete": deque(maxlen=HEDGE_WINDOW),
+            "first_chunk": deque(maxlen=HEDGE_WINDOW)
+        }
+        self._latency_lock = threading.Lock()
+    
+    def _timeout(self) -> Timeout:
+        """Connect and read timeouts for every request."""
+        return Timeout(
+            self.settings.llm_read_timeout,
+            connect=self.settings.llm_connect_timeout
+        )
+    
+    def _limits(self) -> httpx.Limits:
+        """Connection pool size and keep-alive settings."""
+        return httpx.Limits(
+            max_connections=self.settings.llm_max_connections,
+            max_keepalive_connections=self.settings.llm_max_keepalive_connections,
+            keepalive_expiry=self.settings.llm_keepalive_expiry
+        )
     
     def _get_client(self) -> OpenAI:
         """Get or create the OpenAI client configured for LongCat."""
         if self._client is None:
             self._client = OpenAI(
                 api_key=self.settings.longcat_api_key,
-                base_url="https://api.longcat.chat/openai"
+                base_url=self.settings.longcat_base_url,
+                timeout=self._timeout(),
+                max_retries=0,
+                http_client=DefaultHttpxClient(limits=self._limits())
             )
         return self._client
     
+    def _get_async_client(self) -> AsyncOpenAI:
+        """Get or create the async OpenAI client configured for LongCat."""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(
+                api_key=self.settings.longcat_api_key,
+                base_url=self.settings.longcat_base_url,
+                timeout=self._timeout(),
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(limits=self._limits())
+            )
+        return self._async_client
+    
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+    
+    def _build_messages(self, system_prompt: str, context: str, user_question: str) -> list[dict]:
+        """Build the chat messages with the retrieved context embedded in the user turn."""
+        # Build the user message with context
+        user_message = f"""Context:
+{context}
+
+User Question: {user_question}"""
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+    
+    def _parse_response(self, response) -> dict:
+        """Extract content and token usage from a chat completion."""
+        return {
+            "content": response.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
+                "completion_tokens": response.usage.completion_tokens if response.usage else 0,
+                "total_tokens": response.usage.total_tokens if response.usage else 0
+            }
+        }
+    
+    def _retry_after(self, error: Exception) -> Optional[float]:
+        """Seconds the server asked us to wait (Retry-After / retry-after-ms), if any."""
+        response = getattr(error, "response", None)
+        if response is None:
+            return None
+        
+        headers = response.headers
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            value = headers.get("retry-after")
+            if not value:
+                return None
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                pass
+            # HTTP-date form
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Delay before retrying after an error.
+        
+        Args:
+            error: The error of the failed attempt
+            attempt: Number of retries already made
+        
+        Returns:
+            Seconds to wait, or None if the request should not be retried
+        """
+        if not isinstance(error, RETRYABLE_ERRORS) or attempt >= self.settings.llm_max_retries:
+            return None
+        
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            # Waiting longer than we are willing to only delays the error
+            return retry_after if retry_after <= self.settings.llm_retry_max_delay else None
+        
+        # Full jitter keeps concurrent requests from retrying in lockstep
+        ceiling = min(self.settings.llm_retry_max_delay, self.settings.llm_retry_base_delay * 2 ** attempt)
+        return random.uniform(0, ceiling)
+    
+    def _on_retry(self, error: Exception, attempt: int, delay: float) -> None:
+        """Log and count a retry."""
+        if isinstance(error, RateLimitError):
+            reason = "rate_limited"
+        elif isinstance(error, InternalServerError):
+            reason = "server_error"
+        elif isinstance(error, APITimeoutError):
+            reason = "timeout"
+        else:
+            reason = "connection"
+        get_metrics().llm_retries.inc(reason=reason)
+        logger.warning(
+            f"LongCat API {reason} ({str(error)}), retry {attempt + 1}/{self.settings.llm_max_retries} in {delay:.2f}s"
+        )
+    
+    def _with_retries(self, request: Callable[[], Any]) -> Any:
+        """Call request(), retrying retryable errors."""
+        attempt = 0
+        while True:
+            try:
+                return request()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                self._on_retry(e, attempt, delay)
+                time.sleep(delay)
+                attempt += 1
+    
+    async def _awith_retries(self, request: Callable[[], Awaitable]) -> Any:
+        """Await request(), retrying retryable errors."""
+        attempt = 0
+        while True:
+            try:
+                return await request()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                self._on_retry(e, attempt, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+    
+    def _hedge_delay(self, kind: str) -> Optional[float]:
+        """Seconds after which a request of this kind is hedged, or None to not hedge."""
+        if not self.settings.llm_hedge_enabled:
+            return None
+        with self._latency_lock:
+            recent = sorted(self._latencies[kind])
+        if not recent or len(recent) < self.settings.llm_hedge_min_samples:
+            return None
+        
+        rank = math.ceil(self.settings.llm_hedge_percentile / 100 * len(recent)) - 1
+        return max(recent[min(len(recent) - 1, max(0, rank))], self.settings.llm_hedge_min_delay)
+    
+    def _observe(self, kind: str, seconds: float) -> None:
+        """Record the latency of a successful request."""
+        with self._latency_lock:
+            self._latencies[kind].append(seconds)
+    
+    async def _arequest(
+        self,
+        kind: str,
+        request: Callable[[], Awaitable],
+        discard: Optional[Callable[[Any], Awaitable]] = None
+    ) -> Any:
+        """
+        Run a request with retries, the llm_timeout deadline and hedging.
+        
+        Args:
+            kind: Latency class used for the hedging percentile
+            request: Starts one copy of the request
+            discard: Releases the result of a copy that lost the race
+        
+        Returns:
+            Result of the first copy to succeed
+        """
+        started = time.perf_counter()
+        result = await asyncio.wait_for(
+            self._hedged(kind, lambda: self._awith_retries(request), discard),
+            timeout=self.settings.llm_timeout
+        )
+        self._observe(kind, time.perf_counter() - started)
+        return result
+    
+    async def _hedged(
+        self,
+        kind: str,
+        request: Callable[[], Awaitable],
+        discard: Optional[Callable[[Any], Awaitable]]
+    ) -> Any:
+        """Run request(); if it is still running after the hedge delay, race a second copy."""
+        primary = asyncio.ensure_future(request())
+        tasks = [primary]
+        try:
+            delay = self._hedge_delay(kind)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    get_metrics().llm_hedges.inc(outcome="sent")
+                    tasks.append(asyncio.ensure_future(request()))
+            
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    winner = winners[0]
+                    if winner is not primary:
+                        get_metrics().llm_hedges.inc(outcome="won")
+                    for loser in winners[1:]:
+                        if discard is not None:
+                            await discard(loser.result())
+                    return winner.result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
     def generate_response(
         self,
         system_prompt: str,
@@ -42,38 +317,143 @@ class LongCatClient:
             Dictionary containing response content and usage statistics
         """
         client = self._get_client()
+        messages = self._build_messages(system_prompt, context, user_question)
         
-        # Build the user message with context
-        user_message = f"""Context:
-{context}
-
-User Question: {user_question}"""
+        try:
+            response = self._with_retries(
+                lambda: client.chat.completions.create(
+                    model=self.settings.llm_model,
+                    messages=messages,
+                    max_tokens=self.settings.llm_max_tokens,
+                    temperature=self.settings.llm_temperature
+                )
+            )
+            
+            return self._parse_response(response)
         
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}
-        ]
+        except Exception as e:
+            logger.error(f"LongCat API error: {str(e)}")
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+    
+    async def agenerate_response(
+        self,
+        system_prompt: str,
+        context: str,
+        user_question: str
+    ) -> dict:
+        """
+        Generate a response from the LongCat LLM without blocking the event loop.
+        
+        Args:
+            system_prompt: System instructions for the AI
+            context: Retrieved document context
+            user_question: User's question
+        
+        Returns:
+            Dictionary containing response content and usage statistics
+        """
+        client = self._get_async_client()
+        messages = self._build_messages(system_prompt, context, user_question)
         
         try:
-            response = client.chat.completions.create(
+            response = await self._arequest(
+                "complete",
+                lambda: client.chat.completions.create(
+                    model=self.settings.llm_model,
+                    messages=messages,
+                    max_tokens=self.settings.llm_max_tokens,
+                    temperature=self.settings.llm_temperature
+                )
+            )
+            
+            return self._parse_response(response)
+        
+        except asyncio.TimeoutError:
+            logger.error(f"LongCat API error: no response within {self.settings.llm_timeout}s")
+            raise RuntimeError(f"Failed to generate response: no response within {self.settings.llm_timeout}s")
+        except Exception as e:
+            logger.error(f"LongCat API error: {str(e)}")
+            raise RuntimeError(f"Failed to generate response: {str(e)}")
+    
+    async def astream_response(
+        self,
+        system_prompt: str,
+        context: str,
+        user_question: str
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a response from the LongCat LLM token by token.
+        
+        Retries, the deadline and hedging cover the request up to its first
+        chunk; once output has been sent to the caller it cannot be retried.
+        
+        Args:
+            system_prompt: System instructions for the AI
+            context: Retrieved document context
+            user_question: User's question
+        
+        Yields:
+            {"type": "token", "content": str} for each content delta, then a final
+            {"type": "usage", "usage": dict} with token usage statistics
+        """
+        client = self._get_async_client()
+        messages = self._build_messages(system_prompt, context, user_question)
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        
+        async def open_stream() -> tuple:
+            """Start a stream and wait for its first chunk."""
+            stream = await client.chat.completions.create(
                 model=self.settings.llm_model,
                 messages=messages,
                 max_tokens=self.settings.llm_max_tokens,
-                temperature=self.settings.llm_temperature
+                temperature=self.settings.llm_temperature,
+                stream=True,
+                stream_options={"include_usage": True}
             )
+            try:
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except BaseException:
+                await stream.close()
+                raise
+            return stream, first
+        
+        async def close_stream(opened: tuple) -> None:
+            await opened[0].close()
+        
+        async def chunks(stream, first) -> AsyncIterator:
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+        
+        stream = None
+        try:
+            stream, first = await self._arequest("first_chunk", open_stream, discard=close_stream)
             
-            return {
-                "content": response.choices[0].message.content,
-                "usage": {
-                    "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
-                    "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-                    "total_tokens": response.usage.total_tokens if response.usage else 0
-                }
-            }
-            
+            async for chunk in chunks(stream, first):
+                if chunk.usage:
+                    usage = {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                        "total_tokens": chunk.usage.total_tokens
+                    }
+                
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield {"type": "token", "content": chunk.choices[0].delta.content}
+        
+        except asyncio.TimeoutError:
+            logger.error(f"LongCat API error: no response within {self.settings.llm_timeout}s")
+            raise RuntimeError(f"Failed to generate response: no response within {self.settings.llm_timeout}s")
         except Exception as e:
             logger.error(f"LongCat API error: {str(e)}")
             raise RuntimeError(f"Failed to generate response: {str(e)}")
+        finally:
+            if stream is not None:
+                await stream.close()
+        
+        yield {"type": "usage", "usage": usage}
 
 
 # Singleton instance
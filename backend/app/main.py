@@ -1,25 +1,34 @@
 """FastAPI application entry point with startup events and routes."""
 
+import json
 import traceback
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from app.config import get_settings
+from app.llm.longcat_client import get_longcat_client
 from app.models import (
     ChatRequest,
     ChatResponse,
     ErrorResponse,
     HealthResponse,
+    ReindexJobResponse,
     ReindexResponse,
     StatsResponse,
 )
+from app.rag.indexing_worker import get_indexing_worker
 from app.rag.ingestion import get_document_ingestion
+from app.rag.jobs import ReindexJob, get_reindex_job_manager
 from app.rag.retrieval import get_rag_retrieval
 from app.rag.vectorstore import get_vectorstore_manager
+from app.rag.warmup import get_startup_warmup
+from app.rag.watcher import get_data_folder_watcher
 from app.utils.logger import logger
+from app.utils.metrics import get_metrics
 
 
 @asynccontextmanager
@@ -33,14 +42,16 @@ async def lifespan(app: FastAPI):
     logger.info(f"FAISS Index path: {settings.faiss_index_path}")
     logger.info(f"LLM Model: {settings.llm_model}")
     
-    # Load existing index or create new one on startup
-    try:
-        ingestion = get_document_ingestion()
-        docs, chunks = ingestion.load_or_create_index()
-        logger.info(f"Startup complete: {docs} documents, {chunks} chunks")
-    except Exception as e:
-        logger.error(f"Startup failed: {str(e)}")
-        logger.warning("Server starting without indexed documents. Call /reindex to index manually.")
+    # Single background worker for history and file index updates
+    get_indexing_worker().start()
+    
+    # Load the embedding model and index (and start the watcher); with
+    # fast_startup this happens in the background and /health reports readiness
+    warmup = get_startup_warmup()
+    if settings.fast_startup:
+        warmup.start()
+    else:
+        warmup.run()
     
     logger.info("RAG Chatbot Backend started successfully!")
     
@@ -48,6 +59,10 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down RAG Chatbot Backend...")
+    get_data_folder_watcher().stop()
+    get_indexing_worker().stop()
+    await get_longcat_client().aclose()
+    logger.shutdown()
 
 
 # Create FastAPI app
@@ -80,11 +95,17 @@ async def chat(request: ChatRequest) -> ChatResponse:
     try:
         if not request.message.strip():
             raise HTTPException(status_code=400, detail="Message cannot be empty")
+        _require_ready()
         
         retrieval = get_rag_retrieval()
-        response = retrieval.query(request.message)
+        response = await retrieval.aquery(
+            request.message,
+            nprobe=request.nprobe,
+            ef_search=request.ef_search,
+            include_timings=request.include_timings
+        )
         return response
-        
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -93,38 +114,175 @@ async def chat(request: ChatRequest) -> ChatResponse:
         raise HTTPException(status_code=500, detail=f"Failed to process message: {str(e)}")
 
 
-@app.post("/reindex", response_model=ReindexResponse, responses={500: {"model": ErrorResponse}})
-async def reindex() -> ReindexResponse:
+def _require_ready() -> None:
+    """Reject chat requests while the startup warmup is still loading the model and index."""
+    if not get_startup_warmup().ready:
+        raise HTTPException(status_code=503, detail="Server is starting, try again shortly")
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream", responses={400: {"model": ErrorResponse}})
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """
+    Process a chat message through the RAG pipeline, streaming the answer as server-sent events.
+    
+    Events:
+    - `sources`: retrieved source documents, sent before generation starts
+    - `token`: a piece of the generated answer
+    - `done`: the complete ChatResponse including token usage
+    - `error`: generation failed
     """
-    Manually trigger re-indexing of all documents in the data folder.
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    _require_ready()
+    
+    retrieval = get_rag_retrieval()
+    
+    async def event_stream():
+        try:
+            async for event in retrieval.astream_query(
+                request.message,
+                nprobe=request.nprobe,
+                ef_search=request.ef_search,
+                include_timings=request.include_timings
+            ):
+                yield _format_sse(event["event"], event["data"])
+        except Exception as e:
+            logger.log_error(str(e), "Chat stream endpoint")
+            traceback.print_exc()
+            yield _format_sse("error", {"detail": f"Failed to process message: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _reindex_message(result: dict) -> str:
+    """Summarize a reindex result."""
+    if result["mode"] == "full":
+        return f"Indexed {result['documents']} documents with {result['chunks']} chunks"
+    return (
+        f"{result['added']} added, {result['modified']} modified, {result['removed']} removed, "
+        f"{result['unchanged']} unchanged; index has {result['chunks']} chunks"
+    )
+
+
+def _job_response(job: ReindexJob) -> ReindexJobResponse:
+    """Build the status response of a reindex job."""
+    data = job.to_dict()
+    
+    result = None
+    if data["status"] == "completed" and data["result"] is not None:
+        message = _reindex_message(data["result"])
+        result = ReindexResponse(
+            status="success",
+            message=message,
+            job_id=job.job_id,
+            **{key: data["result"][key] for key in (
+                "mode", "added", "modified", "removed", "unchanged", "chunks_added", "chunks_removed"
+            )}
+        )
+    elif data["status"] == "failed":
+        message = f"Failed to reindex: {data['error']}"
+    elif data["status"] == "cancelled":
+        message = "Reindex cancelled; the previous index is still being served"
+    else:
+        message = f"Reindexing: {data['files_done']}/{data['files_total']} files, {data['chunks_embedded']} chunks"
+    
+    data.pop("result")
+    return ReindexJobResponse(message=message, result=result, **data)
+
+
+@app.post("/reindex", response_model=ReindexResponse, status_code=202, responses={500: {"model": ErrorResponse}})
+async def reindex(full: bool = False) -> ReindexResponse:
+    """
+    Start re-indexing the documents in the data folder as a background job.
+    
+    Returns immediately with a job ID; poll `GET /reindex/{job_id}` for progress.
+    Queries keep being served from the previous index until the job finishes.
+    If a job is already running, its ID is returned instead of starting another.
+    
+    By default only added, modified and removed files are processed, based on a
+    (size, mtime, sha256) manifest of the last indexing run. Pass `full=true` to
+    rebuild the whole index.
     
     This will:
-    - Scan the data folder for PDF and Markdown files
-    - Load and chunk all documents
+    - Scan the data folder for PDF, Markdown, text and Word files
+    - Load and chunk the changed documents
     - Generate embeddings and store in vector database
     """
     try:
-        ingestion = get_document_ingestion()
-        docs, chunks = ingestion.index_documents()
+        job, created = get_reindex_job_manager().start(full=full)
         
         return ReindexResponse(
-            status="success",
-            message=f"Indexed {docs} documents with {chunks} chunks"
+            status="accepted" if created else "running",
+            message=(
+                f"Reindex job {job.job_id} started" if created
+                else f"Reindex job {job.job_id} is already running"
+            ),
+            mode="full" if job.full else "incremental",
+            job_id=job.job_id
         )
-        
+    
     except Exception as e:
         logger.log_error(str(e), "Reindex endpoint")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to reindex: {str(e)}")
 
 
+@app.get("/reindex/{job_id}", response_model=ReindexJobResponse, responses={404: {"model": ErrorResponse}})
+async def reindex_status(job_id: str) -> ReindexJobResponse:
+    """
+    Get the status of a reindex job.
+    
+    Reports phase, files done/total, chunks embedded, throughput and ETA, and
+    the reindex result once the job has completed.
+    """
+    job = get_reindex_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Reindex job not found: {job_id}")
+    return _job_response(job)
+
+
+@app.post("/reindex/{job_id}/cancel", response_model=ReindexJobResponse, responses={404: {"model": ErrorResponse}})
+async def reindex_cancel(job_id: str) -> ReindexJobResponse:
+    """
+    Cancel a running reindex job.
+    
+    The job stops after the current file or embedding batch. A cancelled full
+    rebuild leaves the previous index in place; a cancelled differential
+    reindex keeps (and saves) the files it already processed.
+    """
+    job = get_reindex_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Reindex job not found: {job_id}")
+    return _job_response(job)
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health() -> HealthResponse:
     """
     Check the health status of the application.
     
     Returns vector database connection status and indexed document counts.
+    While a fast startup is still warming up, reports status "starting"
+    without touching the model or index.
     """
+    if not get_startup_warmup().ready:
+        return HealthResponse(
+            status="starting",
+            vector_db="loading",
+            documents_indexed=0,
+            total_chunks=0,
+            readiness="starting"
+        )
+    
     try:
         vectorstore_manager = get_vectorstore_manager()
         is_connected = vectorstore_manager.is_connected()
@@ -139,7 +297,7 @@ async def health() -> HealthResponse:
             documents_indexed=ingestion_stats.get("total_documents", 0),
             total_chunks=stats.get("total_chunks", 0)
         )
-        
+    
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         return HealthResponse(
@@ -166,14 +324,57 @@ async def stats() -> StatsResponse:
             total_chunks=stats.get("total_chunks", 0),
             vector_db_size=stats.get("vector_db_size", "0 MB"),
             last_indexed=stats.get("last_indexed", "Never"),
-            files_by_type=stats.get("files_by_type", {})
+            files_by_type=stats.get("files_by_type", {}),
+            index_type=stats.get("index_type"),
+            embedding_cache=get_vectorstore_manager().get_embedding_cache_stats(),
+            query_batching=get_vectorstore_manager().get_query_batcher_stats(),
+            response_cache=get_rag_retrieval().get_response_cache_stats(),
+            query_cache=get_rag_retrieval().get_query_cache_stats(),
+            indexing_worker=get_indexing_worker().get_stats(),
+            watcher=get_data_folder_watcher().get_stats(),
+            logging=logger.get_stats()
         )
-        
+    
     except Exception as e:
         logger.error(f"Stats endpoint failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
 
+def _collect_component_metrics() -> None:
+    """Copy counters and gauges kept by other components into the metrics registry."""
+    metrics = get_metrics()
+    retrieval = get_rag_retrieval()
+    vectorstore_manager = get_vectorstore_manager()
+    
+    query_cache = retrieval.get_query_cache_stats() or {}
+    caches = {
+        "response": retrieval.get_response_cache_stats(),
+        "retrieval": query_cache.get("results"),
+        "query_embedding": vectorstore_manager.get_query_embedding_cache_stats(),
+        "embedding": vectorstore_manager.get_embedding_cache_stats()
+    }
+    for cache, cache_stats in caches.items():
+        if cache_stats is not None:
+            metrics.cache_hits.set(cache_stats["hits"], cache=cache)
+            metrics.cache_misses.set(cache_stats["misses"], cache=cache)
+    
+    metrics.indexing_queue_depth.set(get_indexing_worker().get_stats()["queue_depth"])
+    if get_startup_warmup().ready:
+        metrics.indexed_chunks.set(vectorstore_manager.get_collection_stats().get("total_chunks", 0))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Expose metrics in the Prometheus text format.
+    
+    Includes per-stage chat latency histograms with recent p50/p95/p99, query,
+    token and cache counters, and indexing duration and throughput.
+    """
+    _collect_component_metrics()
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     settings = get_settings()
     uvicorn.run(
@@ -7,6 +7,9 @@ from pydantic import BaseModel, Field
 class ChatRequest(BaseModel):
     """Request model for chat endpoint."""
     message: str = Field(..., min_length=1, description="User message to process")
+    nprobe: Optional[int] = Field(None, ge=1, description="IVF lists to search (IVF indexes only)")
+    ef_search: Optional[int] = Field(None, ge=1, description="HNSW search breadth (HNSW indexes only)")
+    include_timings: bool = Field(False, description="Return per-stage timings with the response")
 
 
 class Source(BaseModel):
@@ -28,12 +31,40 @@ class ChatResponse(BaseModel):
     response: str = Field(..., description="AI assistant response")
     sources: list[Source] = Field(default_factory=list, description="Source documents")
     tokens: TokenUsage = Field(..., description="Token usage")
+    cached: bool = Field(False, description="Whether the answer was served from the semantic response cache")
+    timings: Optional[dict[str, float]] = Field(None, description="Milliseconds spent per pipeline stage, if requested")
 
 
 class ReindexResponse(BaseModel):
     """Response model for reindex endpoint."""
     status: str = Field(..., description="Operation status")
     message: str = Field(..., description="Status message")
+    mode: str = Field("full", description="Reindex mode: full or incremental")
+    added: int = Field(0, description="Files added since the last indexing run")
+    modified: int = Field(0, description="Files modified since the last indexing run")
+    removed: int = Field(0, description="Files removed since the last indexing run")
+    unchanged: int = Field(0, description="Files skipped because they are unchanged")
+    chunks_added: int = Field(0, description="Chunks embedded and added to the index")
+    chunks_removed: int = Field(0, description="Chunks removed from the index")
+    job_id: Optional[str] = Field(None, description="ID of the background reindex job")
+
+
+class ReindexJobResponse(BaseModel):
+    """Response model for reindex job status."""
+    job_id: str = Field(..., description="Reindex job ID")
+    status: str = Field(..., description="Job status: queued, running, completed, failed or cancelled")
+    phase: str = Field(..., description="Current phase: indexing, saving or complete")
+    mode: str = Field(..., description="Reindex mode: full or incremental")
+    message: str = Field(..., description="Status message")
+    files_done: int = Field(0, description="Files processed so far")
+    files_total: int = Field(0, description="Files to process")
+    chunks_embedded: int = Field(0, description="Chunks embedded and added so far")
+    elapsed_seconds: float = Field(0.0, description="Time since the job started")
+    throughput_chunks_per_second: float = Field(0.0, description="Chunks embedded per second")
+    eta_seconds: Optional[float] = Field(None, description="Estimated time remaining")
+    created_at: str = Field(..., description="Job creation timestamp")
+    result: Optional[ReindexResponse] = Field(None, description="Outcome once the job has completed")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
 
 
 class HealthResponse(BaseModel):
@@ -42,6 +73,7 @@ class HealthResponse(BaseModel):
     vector_db: str = Field(..., description="Vector database status")
     documents_indexed: int = Field(..., description="Number of documents indexed")
     total_chunks: int = Field(..., description="Total number of chunks")
+    readiness: str = Field("ready", description="Startup state: starting or ready")
 
 
 class StatsResponse(BaseModel):
@@ -51,6 +83,14 @@ class StatsResponse(BaseModel):
     vector_db_size: str = Field(..., description="Vector database size")
     last_indexed: str = Field(..., description="Last indexed timestamp")
     files_by_type: dict[str, int] = Field(default_factory=dict, description="File count by type")
+    index_type: Optional[str] = Field(None, description="FAISS index type (flat, ivf_flat, ivf_pq, hnsw)")
+    embedding_cache: Optional[dict] = Field(None, description="Embedding cache size and hit/miss counters")
+    query_batching: Optional[dict] = Field(None, description="Query embedding micro-batching statistics")
+    response_cache: Optional[dict] = Field(None, description="Semantic response cache size and hit/miss counters")
+    query_cache: Optional[dict] = Field(None, description="Exact-match query embedding and retrieval result cache statistics")
+    indexing_worker: Optional[dict] = Field(None, description="Background indexing queue depth, lag and batch statistics")
+    watcher: Optional[dict] = Field(None, description="Data folder watcher backend and event counters")
+    logging: Optional[dict] = Field(None, description="Log format, queue depth and dropped record count")
 
 
 class ErrorResponse(BaseModel):
@@ -0,0 +1,427 @@
+"""Compact BM25 inverted index kept alongside the FAISS index."""
+
+import json
+import math
+import os
+import re
+import shutil
+import uuid
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.utils.logger import logger
+
+
+# Files stored next to index.faiss: the delta since the last merge, rewritten
+# on every save, and the merged base it applies to, named by a random ID and
+# hard-linked from the previous save until the next merge
+BM25_ARRAYS_FILE = "bm25.npz"
+BM25_META_FILE = "bm25.json"
+BM25_BASE_PREFIX = "bm25-base-"
+
+# Identifiers such as "ERR-404", "v1.2.3" or "snake_case" stay one token (and
+# are also indexed by their parts), so exact codes and names match
+TOKEN_PATTERN = re.compile(r"\w+(?:[-.:/]\w+)*")
+PART_SPLIT_PATTERN = re.compile(r"[-.:/_]")
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its "
+    "me my of on or our she so that the their them they this to was we were "
+    "what when which who will with you your".split()
+)
+
+# Postings added since the last merge are kept in a small per-term delta
+# segment; it is merged into the CSR arrays once it grows past this share
+MERGE_MIN_POSTINGS = 100000
+MERGE_FRACTION = 0.25
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase BM25 terms."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        if token in STOP_WORDS:
+            continue
+        tokens.append(token)
+        if PART_SPLIT_PATTERN.search(token):
+            tokens.extend(part for part in PART_SPLIT_PATTERN.split(token) if part and part not in STOP_WORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts with precomputed postings.
+    
+    Postings live in CSR form: `offsets[t]:offsets[t + 1]` slices `post_docs`
+    and `post_tfs` for term t. Incremental adds go to a delta segment that is
+    merged into the CSR arrays when it gets large; removals only clear the
+    document's alive flag and are compacted away on merge. A query touches just
+    the postings of its terms, never the whole corpus.
+    
+    Saves mirror that split: the CSR arrays are written once per merge and
+    linked into later saves, so a save in between only writes the delta.
+    
+    Not thread-safe by itself: the vectorstore manager mutates it under the
+    write side of its index lock and searches under the read side.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        
+        self._vocab: dict[str, int] = {}
+        self._doc_ids: list[str] = []
+        self._doc_index: dict[str, int] = {}
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._live_docs = 0
+        self._live_length = 0
+        
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_tfs = np.zeros(0, dtype=np.float32)
+        
+        self._delta: dict[int, tuple[array, array]] = {}
+        self._delta_postings = 0
+        
+        # Documents and terms numbered before the last merge belong to the
+        # base; _base_id names its files once written, _folder is the last
+        # save they can be linked from
+        self._base_docs = 0
+        self._base_terms = 0
+        self._base_id: Optional[str] = None
+        self._folder: Optional[Path] = None
+    
+    def __len__(self) -> int:
+        """Number of live documents."""
+        return self._live_docs
+    
+    def _ensure_capacity(self, size: int) -> None:
+        """Grow the per-document arrays (amortized doubling)."""
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, len(self._lengths) * 2, 1024)
+        lengths = np.zeros(capacity, dtype=np.int32)
+        alive = np.zeros(capacity, dtype=bool)
+        lengths[:len(self._lengths)] = self._lengths
+        alive[:len(self._alive)] = self._alive
+        self._lengths = lengths
+        self._alive = alive
+    
+    def add(self, doc_ids: list[str], texts: Iterable[str]) -> None:
+        """Index chunk texts under their docstore IDs."""
+        for doc_id, text in zip(doc_ids, texts):
+            if doc_id in self._doc_index:
+                self.remove([doc_id])
+            
+            doc = len(self._doc_ids)
+            self._ensure_capacity(doc + 1)
+            self._doc_ids.append(doc_id)
+            self._doc_index[doc_id] = doc
+            
+            terms = tokenize(text)
+            self._lengths[doc] = len(terms)
+            self._alive[doc] = True
+            self._live_docs += 1
+            self._live_length += len(terms)
+            
+            for term, tf in Counter(terms).items():
+                term_id = self._vocab.setdefault(term, len(self._vocab))
+                postings = self._delta.get(term_id)
+                if postings is None:
+                    postings = self._delta[term_id] = (array("i"), array("f"))
+                postings[0].append(doc)
+                postings[1].append(tf)
+                self._delta_postings += 1
+        
+        if self._delta_postings > max(MERGE_MIN_POSTINGS, MERGE_FRACTION * len(self._post_docs)):
+            self.merge()
+    
+    def remove(self, doc_ids: Iterable[str]) -> int:
+        """
+        Drop documents from the index.
+        
+        Returns:
+            Number of documents removed
+        """
+        removed = 0
+        for doc_id in doc_ids:
+            doc = self._doc_index.pop(doc_id, None)
+            if doc is None:
+                continue
+            self._alive[doc] = False
+            self._live_docs -= 1
+            self._live_length -= int(self._lengths[doc])
+            removed += 1
+        
+        # Mostly-dead segments waste memory and query time: compact them
+        if removed and self._live_docs < len(self._doc_ids) // 2:
+            self.merge()
+        return removed
+    
+    def _postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """Get (docs, tfs) of a term from the CSR arrays plus the delta segment."""
+        docs = np.zeros(0, dtype=np.int32)
+        tfs = np.zeros(0, dtype=np.float32)
+        
+        if term_id + 1 < len(self._offsets):
+            start, end = self._offsets[term_id], self._offsets[term_id + 1]
+            docs, tfs = self._post_docs[start:end], self._post_tfs[start:end]
+        
+        delta = self._delta.get(term_id)
+        if delta is not None:
+            docs = np.concatenate([docs, np.array(delta[0], dtype=np.int32)])
+            tfs = np.concatenate([tfs, np.array(delta[1], dtype=np.float32)])
+        
+        return docs, tfs
+    
+    def search(self, query: str, k: int) -> list[tuple[str, float]]:
+        """
+        Rank documents for a query.
+        
+        Returns:
+            Up to k (docstore ID, BM25 score) tuples, best first
+        """
+        if self._live_docs == 0:
+            return []
+        
+        term_ids = {self._vocab[term] for term in tokenize(query) if term in self._vocab}
+        if not term_ids:
+            return []
+        
+        avg_length = self._live_length / self._live_docs
+        all_docs, all_scores = [], []
+        
+        for term_id in term_ids:
+            docs, tfs = self._postings(term_id)
+            live = self._alive[docs]
+            docs, tfs = docs[live], tfs[live]
+            if len(docs) == 0:
+                continue
+            
+            df = len(docs)
+            idf = math.log(1 + (self._live_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / avg_length)
+            all_docs.append(docs)
+            all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+        
+        if not all_docs:
+            return []
+        
+        # Sum per document over the matched terms; cost scales with the
+        # postings touched, not with the corpus size
+        docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        
+        return [(self._doc_ids[docs[i]], float(scores[i])) for i in top]
+    
+    def _flat_postings(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All postings as parallel (term, doc, tf) arrays."""
+        base_terms = np.repeat(np.arange(len(self._offsets) - 1, dtype=np.int32), np.diff(self._offsets))
+        terms, docs, tfs = [base_terms], [self._post_docs], [self._post_tfs]
+        
+        for term_id, (delta_docs, delta_tfs) in self._delta.items():
+            terms.append(np.full(len(delta_docs), term_id, dtype=np.int32))
+            docs.append(np.array(delta_docs, dtype=np.int32))
+            tfs.append(np.array(delta_tfs, dtype=np.float32))
+        
+        return np.concatenate(terms), np.concatenate(docs), np.concatenate(tfs)
+    
+    def merge(self) -> None:
+        """Fold the delta segment into the CSR arrays and compact removed documents and terms."""
+        terms, docs, tfs = self._flat_postings()
+        
+        n_docs = len(self._doc_ids)
+        alive = self._alive[:n_docs]
+        keep = alive[docs]
+        terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+        
+        # Renumber live documents and used terms densely
+        doc_map = np.cumsum(alive) - 1
+        docs = doc_map[docs].astype(np.int32)
+        used_terms = np.unique(terms)
+        term_map = np.full(len(self._vocab), -1, dtype=np.int64)
+        term_map[used_terms] = np.arange(len(used_terms))
+        terms = term_map[terms]
+        
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        
+        counts = np.bincount(terms, minlength=len(used_terms))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._post_docs = docs
+        self._post_tfs = tfs
+        self._delta = {}
+        self._delta_postings = 0
+        
+        terms_by_id = {term_id: term for term, term_id in self._vocab.items()}
+        self._vocab = {terms_by_id[int(old)]: new for new, old in enumerate(used_terms)}
+        
+        live_docs = np.nonzero(alive)[0]
+        self._doc_ids = [self._doc_ids[doc] for doc in live_docs]
+        self._doc_index = {doc_id: doc for doc, doc_id in enumerate(self._doc_ids)}
+        self._lengths = self._lengths[live_docs].copy()
+        self._alive = np.ones(len(live_docs), dtype=bool)
+        
+        self._base_docs = len(self._doc_ids)
+        self._base_terms = len(self._vocab)
+        self._base_id = None
+    
+    def _write_base(self, folder: Path, base_id: str) -> None:
+        """Write the CSR arrays and the documents and terms they are numbered by."""
+        np.savez(
+            folder / f"{BM25_BASE_PREFIX}{base_id}.npz",
+            offsets=self._offsets,
+            post_docs=self._post_docs,
+            post_tfs=self._post_tfs,
+            lengths=self._lengths[:self._base_docs]
+        )
+        
+        vocab = [""] * self._base_terms
+        for term, term_id in self._vocab.items():
+            if term_id < self._base_terms:
+                vocab[term_id] = term
+        with open(folder / f"{BM25_BASE_PREFIX}{base_id}.json", "w", encoding="utf-8") as f:
+            json.dump({"vocab": vocab, "doc_ids": self._doc_ids[:self._base_docs]}, f)
+    
+    def save(self, folder_path: str) -> None:
+        """
+        Persist the index next to index.faiss.
+        
+        The base files are linked from the previous save unless a merge has
+        rewritten the CSR arrays since; only the delta segment, the documents
+        and terms added since the merge and the removed documents are written.
+        Does not modify the postings (searches may run concurrently).
+        """
+        folder = Path(folder_path)
+        n_docs = len(self._doc_ids)
+        
+        base_files = [f"{BM25_BASE_PREFIX}{self._base_id}{suffix}" for suffix in (".npz", ".json")]
+        if (
+            self._base_id is not None
+            and self._folder is not None
+            and all((self._folder / name).exists() for name in base_files)
+        ):
+            for name in base_files:
+                try:
+                    os.link(self._folder / name, folder / name)
+                except OSError:
+                    shutil.copyfile(self._folder / name, folder / name)
+        else:
+            self._base_id = uuid.uuid4().hex[:16]
+            self._write_base(folder, self._base_id)
+        
+        delta_terms, delta_docs, delta_tfs = [], [], []
+        for term_id, (docs, tfs) in self._delta.items():
+            delta_terms.append(np.full(len(docs), term_id, dtype=np.int32))
+            delta_docs.append(np.array(docs, dtype=np.int32))
+            delta_tfs.append(np.array(tfs, dtype=np.float32))
+        
+        np.savez(
+            folder / BM25_ARRAYS_FILE,
+            lengths=self._lengths[self._base_docs:n_docs],
+            removed=np.nonzero(~self._alive[:n_docs])[0].astype(np.int32),
+            delta_terms=np.concatenate(delta_terms) if delta_terms else np.zeros(0, dtype=np.int32),
+            delta_docs=np.concatenate(delta_docs) if delta_docs else np.zeros(0, dtype=np.int32),
+            delta_tfs=np.concatenate(delta_tfs) if delta_tfs else np.zeros(0, dtype=np.float32)
+        )
+        
+        vocab = [""] * (len(self._vocab) - self._base_terms)
+        for term, term_id in self._vocab.items():
+            if term_id >= self._base_terms:
+                vocab[term_id - self._base_terms] = term
+        with open(folder / BM25_META_FILE, "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "base": self._base_id,
+                "vocab": vocab,
+                "doc_ids": self._doc_ids[self._base_docs:]
+            }, f)
+    
+    def saved(self, folder_path: str) -> None:
+        """Link the base from this folder in later saves; call once a save is in place there."""
+        self._folder = Path(folder_path)
+    
+    @classmethod
+    def load(cls, folder_path: str, k1: float, b: float) -> Optional["BM25Index"]:
+        """Load a persisted index, or None if there is none (or it is unreadable)."""
+        folder = Path(folder_path)
+        if not (folder / BM25_ARRAYS_FILE).exists() or not (folder / BM25_META_FILE).exists():
+            return None
+        
+        try:
+            with open(folder / BM25_META_FILE, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = np.load(folder / BM25_ARRAYS_FILE)
+            
+            index = cls(k1=k1, b=b)
+            if "base" not in meta:
+                # Saved before the base was split out: everything is in these
+                # two files; merged below so the next save writes a base
+                index._vocab = {term: term_id for term_id, term in enumerate(meta["vocab"])}
+                index._doc_ids = meta["doc_ids"]
+                index._lengths = arrays["lengths"].astype(np.int32)
+                index._alive = arrays["alive"].astype(bool)
+                index._offsets = arrays["offsets"]
+                index._post_docs = arrays["post_docs"]
+                index._post_tfs = arrays["post_tfs"]
+            else:
+                base_name = f"{BM25_BASE_PREFIX}{meta['base']}"
+                with open(folder / f"{base_name}.json", "r", encoding="utf-8") as f:
+                    base_meta = json.load(f)
+                base = np.load(folder / f"{base_name}.npz")
+                
+                vocab = base_meta["vocab"] + meta["vocab"]
+                index._vocab = {term: term_id for term_id, term in enumerate(vocab)}
+                index._doc_ids = base_meta["doc_ids"] + meta["doc_ids"]
+                index._lengths = np.concatenate([base["lengths"], arrays["lengths"]]).astype(np.int32)
+                index._alive = np.ones(len(index._doc_ids), dtype=bool)
+                index._alive[arrays["removed"]] = False
+                index._offsets = base["offsets"]
+                index._post_docs = base["post_docs"]
+                index._post_tfs = base["post_tfs"]
+                index._base_docs = len(base_meta["doc_ids"])
+                index._base_terms = len(base_meta["vocab"])
+                index._base_id = meta["base"]
+                index._folder = folder
+            
+            index._doc_index = {
+                doc_id: doc for doc, doc_id in enumerate(index._doc_ids) if index._alive[doc]
+            }
+            index._live_docs = int(index._alive.sum())
+            index._live_length = int(index._lengths[index._alive].sum())
+            
+            terms = arrays["delta_terms"]
+            order = np.argsort(terms, kind="stable")
+            terms, docs, tfs = terms[order], arrays["delta_docs"][order], arrays["delta_tfs"][order]
+            starts = np.flatnonzero(np.diff(terms, prepend=-1))
+            for start, end in zip(starts, np.append(starts[1:], len(terms))):
+                index._delta[int(terms[start])] = (array("i", docs[start:end].tolist()), array("f", tfs[start:end].tolist()))
+            index._delta_postings = len(terms)
+            if index._base_id is None:
+                index.merge()
+            
+            return index
+        except Exception as e:
+            logger.warning(f"Failed to load BM25 index: {str(e)}")
+            return None
+    
+    def get_stats(self) -> dict:
+        """Get index size statistics."""
+        return {
+            "documents": self._live_docs,
+            "terms": len(self._vocab),
+            "postings": len(self._post_docs) + self._delta_postings
+        }
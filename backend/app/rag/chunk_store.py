@@ -0,0 +1,579 @@
+"""Segmented on-disk chunk store: chunk text and metadata addressed by FAISS label."""
+
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from collections.abc import Mapping
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+from app.utils.logger import logger
+
+
+# Stored next to index.faiss in place of the pickled index.pkl: the manifest
+# lists the segments, and each save adds a segment of immutable files named
+# <segment>.dat (records), <segment>.idx (table rows of the labels it added)
+# and <segment>.del (labels it deleted)
+CHUNK_MANIFEST_FILE = "chunks.json"
+DATA_SUFFIX = ".dat"
+TABLE_SUFFIX = ".idx"
+DELETED_SUFFIX = ".del"
+SEGMENT_SUFFIXES = (DATA_SUFFIX, TABLE_SUFFIX, DELETED_SUFFIX)
+
+# Stores saved before segments existed are a single segment of this name
+LEGACY_SEGMENT = "chunks"
+
+# Records added since the last save are written to <spill prefix>.spill-<pid>-<id>,
+# which the next save links into the index folder as its new segment's data file
+SPILL_SUFFIX = ".spill"
+
+# Docstore IDs are uuid4 strings
+ID_WIDTH = 36
+
+# One row per FAISS label: where the label's record lives in its segment's
+# data file. Rows of labels that never held a chunk, or were compacted away,
+# have length 0
+TABLE_DTYPE = np.dtype([
+    ("offset", "<i8"),
+    ("length", "<i4"),
+    ("doc_id", f"S{ID_WIDTH}")
+])
+
+# Tombstones: labels of deleted chunks
+DELETED_DTYPE = np.dtype("<i8")
+
+# Rewrite the data files once deleted records take up more than this share of them
+COMPACT_DEAD_RATIO = 0.5
+
+# A save that finds this many segments merges all but the first one
+MAX_SEGMENTS = 16
+
+
+def has_chunk_store(folder_path: str) -> bool:
+    """Check whether a folder holds a chunk store."""
+    return (Path(folder_path) / CHUNK_MANIFEST_FILE).exists()
+
+
+def _encode(doc: Document) -> bytes:
+    """Serialize a chunk to a data file record."""
+    return json.dumps([doc.page_content, doc.metadata], ensure_ascii=False, default=str).encode("utf-8")
+
+
+def _map_file(path: Path, length: int) -> Union[bytes, mmap.mmap]:
+    """Map the first `length` bytes of a file read-only."""
+    if length == 0:
+        return b""
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+
+
+def _read_file(path: Path, length: int) -> bytearray:
+    """Read the first `length` bytes of a file."""
+    with open(path, "rb") as f:
+        return bytearray(f.read(length))
+
+
+def _segment_name(manifest: dict) -> str:
+    """Name of the next segment added to a manifest."""
+    return f"{LEGACY_SEGMENT}-{manifest['next_segment']:06d}"
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    """Hard-link a file, copying it where links aren't supported."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _discard_spill(spill: BinaryIO, path: Path) -> None:
+    """Close and delete a spill file."""
+    spill.close()
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_stale_spill_files(spill_prefix: str) -> None:
+    """Delete spill files left behind by processes that are no longer running (POSIX only)."""
+    if os.name != "posix":
+        return
+    
+    prefix = Path(spill_prefix)
+    for path in prefix.parent.glob(f"{prefix.name}{SPILL_SUFFIX}-*"):
+        try:
+            pid = int(path.name.rsplit("-", 2)[1])
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            logger.info(f"Removing stale chunk spill file {path}")
+            path.unlink(missing_ok=True)
+        except (ValueError, IndexError, OSError):
+            continue
+
+
+def _read_manifest(folder: Path) -> dict:
+    """Read a store's manifest, converting the single-file layout to one segment."""
+    with open(folder / CHUNK_MANIFEST_FILE, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    
+    if "segments" not in manifest:
+        manifest = {
+            "segments": [{"name": LEGACY_SEGMENT, "first_label": 0, **manifest}],
+            "next_segment": 0
+        }
+    return manifest
+
+
+class ChunkStore(Docstore):
+    """
+    Docstore over segments of chunk data files and fixed-width label tables.
+    
+    Row i of a segment's table locates the record of the chunk with FAISS
+    label first_label + i, so a chunk is read with one table lookup and one
+    slice of that segment's data file. Records of added chunks go straight to
+    a spill file next to the index, so building a large index doesn't hold
+    its text in memory; only their table rows and the deletions are buffered
+    until the next save. The save links the previous segments into the new
+    index folder and the spill file in as the data of one new segment: a save
+    costs O(changed chunks), not O(corpus). Segment files are never written again
+    once saved, so processes that still map the files of an earlier save (or
+    save concurrently from the same files) can't corrupt each other. Once
+    dead records make up most of the data, or MAX_SEGMENTS segments have
+    accumulated, the next save rewrites the live chunks (of all segments, or
+    of all but the first) into a single segment.
+    
+    With `use_mmap` the files are memory-mapped, so processes serving the same
+    index share chunk text through the page cache.
+    """
+    
+    def __init__(self, use_mmap: bool = False, spill_prefix: Optional[str] = None):
+        self.use_mmap = use_mmap
+        # Keep spill files on the index's filesystem so saves can link them
+        self.spill_prefix = spill_prefix or os.path.join(tempfile.gettempdir(), LEGACY_SEGMENT)
+        
+        # Committed state as of the last save/load: the manifest and each
+        # segment's table and data, and the labels the segments cover
+        self._folder: Optional[Path] = None
+        self._manifest: dict = {"segments": [], "next_segment": 0}
+        self._tables: list[np.ndarray] = []
+        self._datas: list[Union[bytes, bytearray, mmap.mmap]] = []
+        self._first_labels = np.zeros(0, dtype=np.int64)
+        self._rows = 0
+        
+        # Changes since then: table rows for labels >= committed rows, with
+        # offsets into the spill file (length 0 for labels without a chunk),
+        # and newly deleted labels
+        self._pending = np.zeros(0, dtype=TABLE_DTYPE)
+        self._pending_rows = 0
+        self._pending_deletes: list[int] = []
+        self._spill: Optional[BinaryIO] = None
+        self._spill_path: Optional[Path] = None
+        self._spill_bytes = 0
+        self._spill_lock = threading.Lock()
+        self._spill_finalizer: Optional[weakref.finalize] = None
+        
+        self._alive = np.zeros(0, dtype=bool)
+        self._labels: dict[str, int] = {}
+        self._dead_bytes = 0
+        
+        # Dead record bytes the last save's rewrite left out, until `saved`
+        self._dropped_bytes = 0
+    
+    @classmethod
+    def open(cls, folder_path: str, use_mmap: bool = False, spill_prefix: Optional[str] = None) -> "ChunkStore":
+        """
+        Open the chunk store saved in a folder.
+        
+        Args:
+            folder_path: Index folder holding the chunk store files
+            use_mmap: Map the files instead of reading them into memory
+            spill_prefix: Path prefix of spill files (defaults to the temp directory)
+        """
+        store = cls(use_mmap, spill_prefix)
+        folder = Path(folder_path)
+        manifest = _read_manifest(folder)
+        store._adopt(folder, manifest, {})
+        
+        alive = np.zeros(store._rows, dtype=bool)
+        for first, table in zip(store._first_labels, store._tables):
+            alive[first:first + len(table)] = table["length"] > 0
+        for segment in manifest["segments"]:
+            deleted = np.fromfile(
+                folder / f"{segment['name']}{DELETED_SUFFIX}",
+                dtype=DELETED_DTYPE,
+                count=segment["deleted"]
+            )
+            alive[deleted] = False
+        store._alive = alive
+        
+        for first, table in zip(store._first_labels, store._tables):
+            live = np.flatnonzero(alive[first:first + len(table)])
+            store._dead_bytes += int(table["length"].sum()) - int(table["length"][live].sum())
+            store._labels.update(zip(
+                (doc_id.decode("ascii") for doc_id in table["doc_id"][live]),
+                (live + first).tolist()
+            ))
+        return store
+    
+    @classmethod
+    def from_docstore(
+        cls,
+        docstore: Docstore,
+        index_to_docstore_id: Mapping,
+        use_mmap: bool = False,
+        spill_prefix: Optional[str] = None
+    ) -> "ChunkStore":
+        """Build an (unsaved) chunk store from another docstore, e.g. a legacy pickled one."""
+        store = cls(use_mmap, spill_prefix)
+        for label in sorted(index_to_docstore_id):
+            doc_id = index_to_docstore_id[label]
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                store.add([label], [doc_id], [doc])
+        return store
+    
+    def _adopt(self, folder: Path, manifest: dict, loaded: dict) -> None:
+        """
+        Point the committed state at the segments listed in a manifest.
+        
+        Args:
+            folder: Folder holding the segment files
+            manifest: Manifest of the store in that folder
+            loaded: Already loaded (table, data) pairs by segment name, reused
+                instead of reading or mapping the files again
+        """
+        tables, datas = [], []
+        for segment in manifest["segments"]:
+            if segment["name"] in loaded:
+                table, data = loaded[segment["name"]]
+            else:
+                table, data = self._load_segment(folder, segment)
+            tables.append(table)
+            datas.append(data)
+        
+        segments = manifest["segments"]
+        self._folder = folder
+        self._manifest = manifest
+        self._tables = tables
+        self._datas = datas
+        self._first_labels = np.asarray([segment["first_label"] for segment in segments], dtype=np.int64)
+        self._rows = segments[-1]["first_label"] + segments[-1]["rows"] if segments else 0
+    
+    def _load_segment(self, folder: Path, segment: dict) -> tuple[np.ndarray, Union[bytes, bytearray, mmap.mmap]]:
+        """Read or map the table and data file of a segment."""
+        rows = segment["rows"]
+        table_file = folder / f"{segment['name']}{TABLE_SUFFIX}"
+        data_file = folder / f"{segment['name']}{DATA_SUFFIX}"
+        if self.use_mmap and rows > 0:
+            table = np.memmap(table_file, dtype=TABLE_DTYPE, mode="r", shape=(rows,))
+            return table, _map_file(data_file, segment["data_bytes"])
+        return np.fromfile(table_file, dtype=TABLE_DTYPE, count=rows), _read_file(data_file, segment["data_bytes"])
+    
+    @property
+    def size(self) -> int:
+        """Number of labels covered by the table (live or not)."""
+        return self._rows + self._pending_rows
+    
+    def add(self, labels: list[int], ids: list[str], documents: list[Document]) -> None:
+        """
+        Add chunks under new FAISS labels.
+        
+        Labels must be above every label added before; skipped labels are
+        recorded as empty rows.
+        """
+        previous = self.size - 1
+        for label, doc_id in zip(labels, ids):
+            if label <= previous:
+                raise ValueError(f"Label {label} is already in use")
+            if len(doc_id) > ID_WIDTH:
+                raise ValueError(f"Docstore ID too long for the chunk store: {doc_id}")
+            previous = label
+        
+        records = [_encode(doc) for doc in documents]
+        rows = np.asarray(labels, dtype=np.int64) - self._rows
+        if len(rows) and rows[-1] >= len(self._pending):
+            pending = np.zeros(max(int(rows[-1]) + 1, 2 * len(self._pending)), dtype=TABLE_DTYPE)
+            pending[:self._pending_rows] = self._pending[:self._pending_rows]
+            self._pending = pending
+        
+        lengths = np.fromiter((len(record) for record in records), dtype=np.int64, count=len(records))
+        self._pending["offset"][rows] = self._spill_bytes + np.cumsum(lengths) - lengths
+        self._pending["length"][rows] = lengths
+        self._pending["doc_id"][rows] = [doc_id.encode("ascii") for doc_id in ids]
+        self._pending_rows = max(self._pending_rows, int(rows[-1]) + 1 if len(rows) else 0)
+        self._write_spill(b"".join(records))
+        self._labels.update(zip(ids, labels))
+        
+        if self.size > len(self._alive):
+            alive = np.zeros(self.size, dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            self._alive = alive
+        self._alive[list(labels)] = True
+    
+    def delete_labels(self, labels: list[int]) -> None:
+        """Delete the chunks with the given FAISS labels."""
+        for label in labels:
+            if not self._alive[label]:
+                continue
+            self._alive[label] = False
+            self._pending_deletes.append(label)
+            doc_id, record = self._row(label)
+            self._dead_bytes += len(record)
+            del self._labels[doc_id]
+    
+    def label_of(self, doc_id: str) -> Optional[int]:
+        """Get the FAISS label of a live chunk."""
+        return self._labels.get(doc_id)
+    
+    def _write_spill(self, data: bytes) -> None:
+        """Append records to the spill file, creating it on first use."""
+        if not data:
+            return
+        
+        if self._spill is None:
+            path = Path(f"{self.spill_prefix}{SPILL_SUFFIX}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._spill = open(path, "w+b", buffering=0)
+            self._spill_path = path
+            self._spill_finalizer = weakref.finalize(self, _discard_spill, self._spill, path)
+        
+        with self._spill_lock:
+            self._spill.seek(self._spill_bytes)
+            view = memoryview(data)
+            while view:
+                view = view[self._spill.write(view):]
+        self._spill_bytes += len(data)
+    
+    def _read_spill(self, offset: int, length: int) -> bytes:
+        """Read a record from the spill file."""
+        with self._spill_lock:
+            self._spill.seek(offset)
+            return self._spill.read(length)
+    
+    def _row(self, label: int) -> tuple[str, bytes]:
+        """Get the docstore ID and raw record of a label."""
+        if label >= self._rows:
+            row = self._pending[label - self._rows]
+            return row["doc_id"].decode("ascii"), self._read_spill(int(row["offset"]), int(row["length"]))
+        
+        segment = int(np.searchsorted(self._first_labels, label, side="right")) - 1
+        row = self._tables[segment][label - int(self._first_labels[segment])]
+        start = int(row["offset"])
+        return row["doc_id"].decode("ascii"), self._datas[segment][start:start + int(row["length"])]
+    
+    def get(self, label: int) -> Optional[Document]:
+        """Read the chunk with a FAISS label, or None if there is no live chunk."""
+        if not 0 <= label < len(self._alive) or not self._alive[label]:
+            return None
+        doc_id, record = self._row(label)
+        text, metadata = json.loads(record)
+        return Document(id=doc_id, page_content=text, metadata=metadata)
+    
+    def search(self, search: str) -> Union[str, Document]:
+        """Look up a chunk by docstore ID (Docstore interface)."""
+        label = self._labels.get(search)
+        if label is None:
+            return f"ID {search} not found."
+        return self.get(label)
+    
+    def label_map(self) -> "LabelMap":
+        """Read-only FAISS label -> docstore ID mapping of the live chunks."""
+        return LabelMap(self)
+    
+    def _data_bytes(self) -> int:
+        """Total size of the committed and pending records."""
+        committed = sum(segment["data_bytes"] for segment in self._manifest["segments"])
+        return committed + self._spill_bytes
+    
+    def _needs_compaction(self) -> bool:
+        """Check whether dead records dominate the data files."""
+        total = self._data_bytes()
+        return total > 0 and self._dead_bytes > COMPACT_DEAD_RATIO * total
+    
+    def save(self, folder_path: str) -> None:
+        """
+        Write the store into a new index folder.
+        
+        The previous segments and the spill file are hard-linked (or copied)
+        into the folder, the spill file as the data of a new segment. When
+        compacting or merging segments, the live chunks are rewritten instead.
+        Call `saved` once the folder has reached its final location.
+        """
+        folder = Path(folder_path)
+        folder.mkdir(parents=True, exist_ok=True)
+        
+        segments = self._manifest["segments"]
+        if self._needs_compaction():
+            self._rewrite(folder, keep=0)
+            return
+        if len(segments) >= MAX_SEGMENTS:
+            self._rewrite(folder, keep=1)
+            return
+        
+        for segment in segments:
+            self._link_segment(segment, folder)
+        
+        manifest = {"segments": list(segments), "next_segment": self._manifest["next_segment"]}
+        self._dropped_bytes = 0
+        if self._pending_rows or self._pending_deletes:
+            data_file = folder / f"{_segment_name(manifest)}{DATA_SUFFIX}"
+            if self._spill_path is not None:
+                _link_or_copy(self._spill_path, data_file)
+            else:
+                data_file.touch()
+            self._add_segment(folder, manifest, self._rows, self._pending[:self._pending_rows], self._pending_deletes)
+        self._write_manifest(folder, manifest)
+    
+    def _link_segment(self, segment: dict, folder: Path) -> None:
+        """Hard-link (or copy) the files of a committed segment into a folder."""
+        for suffix in SEGMENT_SUFFIXES:
+            name = f"{segment['name']}{suffix}"
+            _link_or_copy(self._folder / name, folder / name)
+    
+    @staticmethod
+    def _add_segment(folder: Path, manifest: dict, first_label: int, table: np.ndarray, deletes: list[int]) -> dict:
+        """
+        Write the table and tombstones of a new segment and add it to the manifest.
+        
+        The segment's data file must already be in the folder.
+        
+        Args:
+            folder: Folder to write the segment files to
+            manifest: Manifest to add the segment to
+            first_label: Label of the first table row
+            table: One row per label from first_label on
+            deletes: Deleted labels
+        
+        Returns:
+            The manifest entry of the segment
+        """
+        name = _segment_name(manifest)
+        table.tofile(folder / f"{name}{TABLE_SUFFIX}")
+        np.asarray(deletes, dtype=DELETED_DTYPE).tofile(folder / f"{name}{DELETED_SUFFIX}")
+        
+        segment = {
+            "name": name,
+            "first_label": first_label,
+            "rows": len(table),
+            "data_bytes": os.path.getsize(folder / f"{name}{DATA_SUFFIX}"),
+            "deleted": len(deletes)
+        }
+        manifest["segments"].append(segment)
+        manifest["next_segment"] += 1
+        return segment
+    
+    def _rewrite(self, folder: Path, keep: int) -> None:
+        """
+        Rewrite everything after the first `keep` segments as one segment of live chunks.
+        
+        Tombstones of the kept segments' labels move into the new segment.
+        """
+        kept = self._manifest["segments"][:keep]
+        for segment in kept:
+            self._link_segment(segment, folder)
+        
+        manifest = {"segments": list(kept), "next_segment": self._manifest["next_segment"]}
+        first_label = kept[-1]["first_label"] + kept[-1]["rows"] if kept else 0
+        table = np.zeros(self.size - first_label, dtype=TABLE_DTYPE)
+        offset = 0
+        with open(folder / f"{_segment_name(manifest)}{DATA_SUFFIX}", "wb") as f:
+            for label in np.flatnonzero(self._alive[first_label:self.size]) + first_label:
+                doc_id, record = self._row(int(label))
+                f.write(record)
+                table[label - first_label] = (offset, len(record), doc_id.encode("ascii"))
+                offset += len(record)
+        
+        deletes = []
+        for first, kept_table in zip(self._first_labels[:keep], self._tables[:keep]):
+            dead = (kept_table["length"] > 0) & ~self._alive[first:first + len(kept_table)]
+            deletes.extend((np.flatnonzero(dead) + first).tolist())
+        
+        self._add_segment(folder, manifest, first_label, table, deletes)
+        self._write_manifest(folder, manifest)
+        
+        rewritten = self._data_bytes() - sum(segment["data_bytes"] for segment in kept)
+        self._dropped_bytes = rewritten - offset
+        if self._dropped_bytes:
+            logger.info(f"Compacted chunk store, dropped {self._dropped_bytes} bytes of deleted chunks")
+    
+    @staticmethod
+    def _write_manifest(folder: Path, manifest: dict) -> None:
+        """Record the segments and the committed length of each segment file."""
+        with open(folder / CHUNK_MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+    
+    def saved(self, folder_path: str) -> None:
+        """
+        Switch to the files of a completed save and clear the buffered changes.
+        
+        This replaces the state that `get` reads in several steps, so the
+        caller must keep readers out until it returns.
+        """
+        folder = Path(folder_path)
+        manifest = _read_manifest(folder)
+        
+        # Segments are immutable, so the ones already read or mapped stay valid
+        loaded = {
+            segment["name"]: (table, data)
+            for segment, table, data in zip(self._manifest["segments"], self._tables, self._datas)
+        }
+        self._adopt(folder, manifest, loaded)
+        self._dead_bytes -= self._dropped_bytes
+        self._dropped_bytes = 0
+        
+        # The new segment owns the spilled records now
+        if self._spill_finalizer is not None:
+            self._spill_finalizer()
+        self._spill = None
+        self._spill_path = None
+        self._spill_finalizer = None
+        self._spill_bytes = 0
+        self._pending = np.zeros(0, dtype=TABLE_DTYPE)
+        self._pending_rows = 0
+        self._pending_deletes = []
+    
+    def get_stats(self) -> dict:
+        """Get chunk counts and data file sizes."""
+        return {
+            "live_chunks": len(self._labels),
+            "labels": self.size,
+            "segments": len(self._manifest["segments"]),
+            "data_bytes": sum(segment["data_bytes"] for segment in self._manifest["segments"]),
+            "dead_bytes": self._dead_bytes,
+            "unsaved_chunks": int(np.count_nonzero(self._pending["length"][:self._pending_rows])),
+            "spill_bytes": self._spill_bytes,
+            "memory_mapped": self.use_mmap
+        }
+    
+    def __len__(self) -> int:
+        """Number of live chunks."""
+        return len(self._labels)
+
+
+class LabelMap(Mapping):
+    """Mapping view of a chunk store's live FAISS label -> docstore ID pairs."""
+    
+    def __init__(self, store: ChunkStore):
+        self._store = store
+    
+    def __getitem__(self, label: int) -> str:
+        store = self._store
+        if not 0 <= label < len(store._alive) or not store._alive[label]:
+            raise KeyError(label)
+        return store._row(label)[0]
+    
+    def __iter__(self) -> Iterator[int]:
+        return (int(label) for label in np.flatnonzero(self._store._alive))
+    
+    def __len__(self) -> int:
+        return len(self._store)
@@ -0,0 +1,207 @@
+"""Token-budgeted prompt context assembly from retrieved chunks."""
+
+import itertools
+import re
+import zlib
+from typing import Callable, Optional
+
+import numpy as np
+
+from app.config import get_settings
+from app.rag.vectorstore import get_vectorstore_manager
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+
+# MinHash signature size and shingle length (in words)
+MINHASH_PERMUTATIONS = 64
+SHINGLE_WORDS = 3
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; p > 2^32
+# and a, b < 2^32 keep every intermediate value within uint64
+_PRIME = np.uint64(4294967311)
+_rng = np.random.default_rng(0)
+_HASH_A = _rng.integers(1, 2 ** 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, 2 ** 32, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+# Shortest text overlap treated as the splitter's chunk overlap when chunks
+# carry no start_index (indexes built before it was recorded)
+MIN_TEXT_OVERLAP = 20
+
+# A chunk that doesn't fit is truncated into the remaining budget only if at
+# least this many tokens are left
+MIN_PARTIAL_TOKENS = 50
+
+# Characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of the word shingles of a text."""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) > SHINGLE_WORDS:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    else:
+        shingles = {" ".join(words)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) % _PRIME).min(axis=1)
+
+
+def _text_overlap(first: str, second: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `first` that is a prefix of `second` (0 if shorter than MIN_TEXT_OVERLAP)."""
+    for size in range(min(max_overlap, len(first), len(second)), MIN_TEXT_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+class ContextBuilder:
+    """
+    Turns retrieved chunks into the context part of the prompt.
+    
+    Chunks are split with an overlap, so neighbors retrieved together repeat
+    text, and repeated conversations in history.txt produce near-identical
+    chunks. The builder merges chunks that overlap within the same source and
+    page into one passage, drops passages whose MinHash similarity to a better
+    ranked one reaches context_dedup_threshold, and packs the rest, best
+    first, into context_max_tokens tokens as counted by the embedding model's
+    tokenizer.
+    """
+    
+    def __init__(self):
+        self.settings = get_settings()
+        self.vectorstore_manager = get_vectorstore_manager()
+        self._count_tokens: Optional[Callable[[str], int]] = None
+    
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the embedding model's tokenizer (or estimate them without one)."""
+        if self._count_tokens is None:
+            tokenizer = self.vectorstore_manager.get_tokenizer()
+            if tokenizer is not None:
+                self._count_tokens = lambda value: len(tokenizer.tokenize(value))
+            else:
+                logger.warning(f"Embedding model has no tokenizer; estimating context tokens as {CHARS_PER_TOKEN} characters each")
+                self._count_tokens = lambda value: -(-len(value) // CHARS_PER_TOKEN)
+        return self._count_tokens(text)
+    
+    def _merge(self, chunks: list[dict]) -> list[dict]:
+        """
+        Merge chunks whose text overlaps within the same source and page.
+        
+        Each merged passage takes the best score and rank of its parts.
+        """
+        groups: dict[tuple, list[tuple[int, dict]]] = {}
+        for rank, chunk in enumerate(chunks):
+            groups.setdefault((chunk.get("source"), chunk.get("page")), []).append((rank, dict(chunk)))
+        
+        merged: list[tuple[int, dict]] = []
+        for passages in groups.values():
+            # Join any two passages that overlap, in either order, until none
+            # do; without offsets the rank order says nothing about position
+            joined = True
+            while joined:
+                joined = False
+                for (rank, first), (other_rank, second) in itertools.permutations(passages, 2):
+                    overlap = self._overlap(first, second)
+                    if overlap is None:
+                        continue
+                    first["content"] += second["content"][overlap:]
+                    first["score"] = max(first["score"], second["score"])
+                    passages = [item for item in passages if item[1] is not first and item[1] is not second]
+                    passages.append((min(rank, other_rank), first))
+                    get_metrics().context_chunks.inc(outcome="merged")
+                    joined = True
+                    break
+            merged.extend(passages)
+        
+        return [chunk for _, chunk in sorted(merged, key=lambda item: item[0])]
+    
+    def _overlap(self, first: dict, second: dict) -> Optional[int]:
+        """
+        Characters of `second` already contained at the end of `first`.
+        
+        Returns:
+            Overlap length, or None if the chunks don't overlap
+        """
+        start, end = first.get("start_index"), second.get("start_index")
+        if start is not None and end is not None:
+            overlap = start + len(first["content"]) - end
+            # Offsets are relative to the loaded document; check the text too,
+            # since history increments restart them at 0
+            if 0 < overlap <= len(second["content"]) and first["content"].endswith(second["content"][:overlap]):
+                return overlap
+        
+        overlap = _text_overlap(first["content"], second["content"], self.settings.chunk_overlap)
+        return overlap or None
+    
+    def _deduplicate(self, chunks: list[dict]) -> list[dict]:
+        """Drop chunks that are near-duplicates of a better ranked chunk."""
+        threshold = self.settings.context_dedup_threshold
+        kept, signatures = [], []
+        for chunk in chunks:
+            signature = minhash_signature(chunk["content"])
+            if any(float(np.mean(signature == other)) >= threshold for other in signatures):
+                get_metrics().context_chunks.inc(outcome="duplicate")
+                continue
+            kept.append(chunk)
+            signatures.append(signature)
+        return kept
+    
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text at a word boundary so it fits into max_tokens."""
+        tokens = self.count_tokens(text)
+        cut = len(text)
+        while tokens > max_tokens and cut > 0:
+            cut = min(int(cut * max_tokens / tokens), cut - 1)
+            boundary = text.rfind(" ", 0, cut)
+            cut = boundary if boundary > 0 else cut
+            tokens = self.count_tokens(text[:cut] + " ...")
+        return text[:cut].rstrip() + " ..."
+    
+    def build(self, chunks: list[dict]) -> str:
+        """
+        Build the context string from retrieved chunks, best ranked first.
+        
+        Args:
+            chunks: Retrieved chunks in rank order
+        
+        Returns:
+            Context with one "[Document i - source (page p)]" section per passage
+        """
+        # Duplicates first: once merged into a longer passage, a chunk no
+        # longer looks like its copy
+        if self.settings.context_dedup_threshold > 0:
+            chunks = self._deduplicate(chunks)
+        if self.settings.context_merge_enabled:
+            chunks = self._merge(chunks)
+        
+        # Tokens left; once a limited budget is down to 0, every further
+        # chunk is dropped
+        limited = self.settings.context_max_tokens > 0
+        budget = self.settings.context_max_tokens
+        context_parts = []
+        for i, chunk in enumerate(chunks, 1):
+            source = chunk.get("source", "unknown")
+            page = chunk.get("page", None)
+            page_info = f" (page {page})" if page is not None else ""
+            header = f"[Document {i} - {source}{page_info}]\n"
+            
+            if limited:
+                header_tokens = self.count_tokens(header)
+                tokens = header_tokens + self.count_tokens(chunk["content"])
+                if tokens > budget:
+                    remaining = budget - header_tokens
+                    if remaining >= MIN_PARTIAL_TOKENS:
+                        context_parts.append(header + self._truncate(chunk["content"], remaining))
+                        get_metrics().context_chunks.inc(outcome="truncated")
+                        dropped = len(chunks) - i
+                    else:
+                        dropped = len(chunks) - i + 1
+                    if dropped:
+                        get_metrics().context_chunks.inc(dropped, outcome="dropped")
+                    break
+                budget -= tokens
+            
+            context_parts.append(header + chunk["content"])
+        
+        return "\n\n".join(context_parts)
@@ -0,0 +1,109 @@
+"""Micro-batching of concurrent query embeddings into shared forward passes."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.utils.logger import logger
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collects queries arriving within a short window and encodes them together.
+    
+    Transformer encoders are far cheaper per item in a batch than one at a time,
+    so under concurrent load one forward pass serves many requests. A lone query
+    waits at most `max_wait_ms` before being encoded on its own.
+    
+    Queries are encoded with embed_documents; this is only equivalent to
+    embed_query for symmetric models such as the sentence-transformers default,
+    which don't prepend a query instruction.
+    """
+    
+    def __init__(self, embeddings: Embeddings, max_batch_size: int, max_wait_ms: float):
+        self.embeddings = embeddings
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        
+        self._batches = 0
+        self._items = 0
+        self._max_batch_seen = 0
+    
+    def _ensure_started(self) -> None:
+        """Start the batching thread on first use."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="query-embedding-batcher", daemon=True)
+                self._thread.start()
+    
+    def embed(self, text: str) -> list[float]:
+        """
+        Embed a query, sharing the forward pass with concurrent callers.
+        
+        Blocks the calling thread until the batch containing the query is encoded.
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+    
+    def _collect_batch(self) -> list[tuple[str, Future]]:
+        """Wait for a first query, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window closed: only take what is already queued
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _run(self) -> None:
+        """Batching loop: collect, encode once, dispatch results."""
+        while True:
+            batch = self._collect_batch()
+            
+            # Identical concurrent queries share one row of the batch
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            
+            try:
+                vectors = self.embeddings.embed_documents(unique_texts)
+                by_text = dict(zip(unique_texts, vectors))
+                for text, future in batch:
+                    future.set_result(by_text[text])
+            except Exception as e:
+                logger.warning(f"Batched query embedding failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            
+            self._batches += 1
+            self._items += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+    
+    def get_stats(self) -> dict:
+        """Get batch count and size statistics."""
+        return {
+            "batches": self._batches,
+            "queries": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "max_batch_size_seen": self._max_batch_seen,
+            "queued": self._queue.qsize()
+        }
@@ -0,0 +1,353 @@
+"""Persistent on-disk cache of text embeddings keyed by content hash."""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils.logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Layout of a cache namespace folder
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.bin"
+TICKS_FILE = "ticks.i64"
+LOCK_FILE = "lock"
+
+DIGEST_SIZE = 32
+INITIAL_CAPACITY = 1024
+
+
+def text_digest(text: str) -> bytes:
+    """Compute the sha256 digest used as cache key for a text."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Size-bounded embedding store backed by memory-mapped files.
+    
+    Vectors live in a float32 matrix, with a parallel table of sha256 keys and
+    last-used ticks per row (tick 0 marks a free row). The files can be shared
+    by several processes: the tick table is the shared allocation map, and
+    writers take an exclusive file lock, pick free rows from it and stamp each
+    written row with the next tick after writing its vector and key. Each
+    process keeps its own key -> row index and brings it up to date by
+    scanning for rows with ticks newer than the last ones it has seen. A hit
+    is only returned if the row still holds its key before and after the
+    vector is copied, so rows another process evicted and reused read as
+    misses. When full, the least recently used rows are evicted; reads
+    record their use locally and stamp it with the next write.
+    """
+    
+    def __init__(self, cache_dir: str, max_entries: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        
+        self._dim: Optional[int] = None
+        self._capacity = 0
+        self._rows: dict[bytes, int] = {}
+        
+        # Newest tick the row index has caught up with, and rows read since
+        # the last write (row -> key), whose ticks the next write refreshes
+        self._synced_tick = 0
+        self._touched: dict[int, bytes] = {}
+        
+        self._vectors: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None
+        self._ticks: Optional[np.memmap] = None
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._load()
+    
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold the exclusive lock serializing writers across processes."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self.cache_dir / LOCK_FILE, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            # Closing the file releases the lock
+            yield
+    
+    def _load(self) -> None:
+        """Open an existing cache folder, discarding it if it is inconsistent."""
+        if not (self.cache_dir / META_FILE).exists():
+            return
+        
+        try:
+            with self._file_lock():
+                self._refresh()
+            logger.info(f"Loaded embedding cache with {len(self._rows)} entries from {self.cache_dir}")
+        except Exception as e:
+            logger.warning(f"Failed to load embedding cache: {str(e)}. Starting with an empty cache.")
+            self._close()
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self._dim = None
+            self._capacity = 0
+            self._rows = {}
+            self._synced_tick = 0
+    
+    def _refresh(self) -> None:
+        """
+        Catch up with rows written by other processes.
+        
+        Maps the files again if another process has grown them, then indexes
+        every row stamped with a tick newer than the last one seen.
+        """
+        meta_file = self.cache_dir / META_FILE
+        if not meta_file.exists():
+            return
+        
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        dim, capacity = int(meta["dim"]), int(meta["capacity"])
+        if self._dim is not None and dim != self._dim:
+            return
+        if capacity > self._capacity:
+            self._close()
+            self._open(dim, capacity)
+        
+        changed = np.flatnonzero(self._ticks > self._synced_tick)
+        if len(changed) == 0:
+            return
+        for row in changed:
+            self._rows[bytes(self._keys[row])] = int(row)
+        self._synced_tick = int(self._ticks[changed].max())
+    
+    def _open(self, dim: int, capacity: int) -> None:
+        """Map the cache files, creating or growing them to the given capacity."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        
+        for name, row_bytes in (
+            (VECTORS_FILE, dim * 4),
+            (KEYS_FILE, DIGEST_SIZE),
+            (TICKS_FILE, 8),
+        ):
+            path = self.cache_dir / name
+            with open(path, "ab") as f:
+                if f.tell() < capacity * row_bytes:
+                    f.truncate(capacity * row_bytes)
+        
+        self._vectors = np.memmap(self.cache_dir / VECTORS_FILE, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        self._keys = np.memmap(self.cache_dir / KEYS_FILE, dtype=np.uint8, mode="r+", shape=(capacity, DIGEST_SIZE))
+        self._ticks = np.memmap(self.cache_dir / TICKS_FILE, dtype=np.int64, mode="r+", shape=(capacity,))
+        self._dim = dim
+        self._capacity = capacity
+    
+    def _write_meta(self) -> None:
+        """Publish the dimension and capacity to other processes; caller holds the file lock."""
+        tmp_file = self.cache_dir / f"{META_FILE}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"dim": self._dim, "capacity": self._capacity}, f)
+        os.replace(tmp_file, self.cache_dir / META_FILE)
+    
+    def _close(self) -> None:
+        """Flush and release the memory maps."""
+        for array in (self._vectors, self._keys, self._ticks):
+            if array is not None:
+                array.flush()
+        self._vectors = None
+        self._keys = None
+        self._ticks = None
+    
+    def _allocate(self, needed: int) -> np.ndarray:
+        """
+        Find `needed` free rows, growing the files or evicting LRU rows; caller holds the file lock.
+        
+        Returns:
+            Free row numbers
+        """
+        free = np.flatnonzero(self._ticks == 0)
+        if len(free) >= needed:
+            return free[:needed]
+        
+        used = self._capacity - len(free)
+        target = min(self.max_entries, max(INITIAL_CAPACITY, self._capacity * 2, used + needed))
+        if target > self._capacity:
+            dim = self._dim
+            self._close()
+            self._open(dim, target)
+            self._write_meta()
+            free = np.flatnonzero(self._ticks == 0)
+            if len(free) >= needed:
+                return free[:needed]
+        
+        # At the size bound: evict the least recently used rows plus some slack
+        # so eviction isn't triggered on every insert
+        used_rows = np.flatnonzero(self._ticks)
+        to_evict = min(len(used_rows), needed - len(free) + self.max_entries // 10)
+        oldest = used_rows[np.argsort(self._ticks[used_rows], kind="stable")[:to_evict]]
+        for row in oldest:
+            key = bytes(self._keys[row])
+            if self._rows.get(key) == row:
+                del self._rows[key]
+        self._ticks[oldest] = 0
+        self.evictions += len(oldest)
+        
+        return np.sort(np.concatenate([free, oldest]))[:needed]
+    
+    def _read(self, digest: bytes) -> Optional[np.ndarray]:
+        """Copy the cached vector of a digest, or None if its row no longer holds it."""
+        row = self._rows.get(digest)
+        if row is None:
+            return None
+        
+        # Check the key on both sides of the copy: a writer clears the tick
+        # before overwriting a row and sets the new key after the new vector
+        vector = None
+        if self._ticks[row] != 0 and bytes(self._keys[row]) == digest:
+            vector = np.array(self._vectors[row])
+            if self._ticks[row] == 0 or bytes(self._keys[row]) != digest:
+                vector = None
+        
+        if vector is None:
+            del self._rows[digest]
+            return None
+        self._touched[row] = digest
+        return vector
+    
+    def get_many(self, digests: list[bytes]) -> list[Optional[np.ndarray]]:
+        """Look up embeddings by text digest; missing entries are None."""
+        with self._lock:
+            if self._ticks is None:
+                self._refresh()
+            if self._ticks is None:
+                self.misses += len(digests)
+                return [None] * len(digests)
+            
+            results = [self._read(digest) for digest in digests]
+            if any(vector is None for vector in results):
+                # Other processes may have cached them meanwhile
+                self._refresh()
+                results = [vector if vector is not None else self._read(digest) for digest, vector in zip(digests, results)]
+            
+            found = sum(1 for vector in results if vector is not None)
+            self.hits += found
+            self.misses += len(results) - found
+            return results
+    
+    def put_many(self, digests: list[bytes], vectors: np.ndarray) -> None:
+        """Store embeddings for the given text digests."""
+        if len(digests) == 0:
+            return
+        
+        vectors = np.asarray(vectors, dtype=np.float32)
+        
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self._dim is None:
+                self._open(vectors.shape[1], min(self.max_entries, max(INITIAL_CAPACITY, len(digests))))
+                self._write_meta()
+            elif vectors.shape[1] != self._dim:
+                logger.warning(f"Embedding dimension changed ({self._dim} -> {vectors.shape[1]}), not caching")
+                return
+            
+            tick = int(self._ticks.max())
+            
+            # Stamp the rows read since the last write as recently used
+            for row, digest in self._touched.items():
+                if self._ticks[row] != 0 and bytes(self._keys[row]) == digest:
+                    tick += 1
+                    self._ticks[row] = tick
+            self._touched = {}
+            
+            new_items = {}
+            for digest, vector in zip(digests, vectors):
+                row = self._rows.get(digest)
+                if row is None or self._ticks[row] == 0 or bytes(self._keys[row]) != digest:
+                    new_items[digest] = vector
+            
+            # Never try to hold more than the bound in one batch
+            new_items = dict(list(new_items.items())[-self.max_entries:])
+            rows = self._allocate(len(new_items))
+            
+            for (digest, vector), row in zip(new_items.items(), rows):
+                row = int(row)
+                self._ticks[row] = 0
+                self._vectors[row] = vector
+                self._keys[row] = np.frombuffer(digest, dtype=np.uint8)
+                tick += 1
+                self._ticks[row] = tick
+                self._rows[digest] = row
+            self._synced_tick = tick
+            
+            self._vectors.flush()
+            self._keys.flush()
+            self._ticks.flush()
+    
+    def get_stats(self) -> dict:
+        """Get cache size and hit/miss counters."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": int(np.count_nonzero(self._ticks)) if self._ticks is not None else 0,
+                "capacity": self._capacity,
+                "max_entries": self.max_entries,
+                "size_bytes": self._capacity * ((self._dim or 0) * 4 + DIGEST_SIZE + 8),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated document texts from an EmbeddingCache."""
+    
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+    
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed documents, only encoding texts that are not cached yet."""
+        digests = [text_digest(text) for text in texts]
+        cached = self.cache.get_many(digests)
+        
+        # Encode each distinct missing text once
+        missing: dict[bytes, str] = {}
+        for digest, text, vector in zip(digests, texts, cached):
+            if vector is None and digest not in missing:
+                missing[digest] = text
+        
+        computed: dict[bytes, np.ndarray] = {}
+        if missing:
+            vectors = np.asarray(self.embeddings.embed_documents(list(missing.values())), dtype=np.float32)
+            missing_digests = list(missing.keys())
+            self.cache.put_many(missing_digests, vectors)
+            computed = dict(zip(missing_digests, vectors))
+        
+        return [
+            (vector if vector is not None else computed[digest]).tolist()
+            for digest, vector in zip(digests, cached)
+        ]
+    
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query with the model; queries are one-off and would only evict chunks."""
+        return self.embeddings.embed_query(text)
+
+
+def get_cache_namespace(model_name: str, normalize: bool) -> str:
+    """Folder name separating caches of different models and normalization settings."""
+    return hashlib.sha256(f"{model_name}|normalize={normalize}".encode("utf-8")).hexdigest()[:16]
@@ -1,6 +1,7 @@
 """Conversation history management for RAG context window."""
 
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
@@ -15,6 +16,8 @@ class ConversationHistory:
     def __init__(self):
         self.settings = get_settings()
         self.history_file = Path(self.settings.data_folder) / "history.txt"
+        # Serializes appends against tail reads so readers only ever see whole entries
+        self._lock = threading.Lock()
         self._ensure_history_file()
     
     def _ensure_history_file(self):
@@ -46,13 +49,47 @@ Assistant: {llm_response}
 """
             
             # Append to the history file
-            with open(self.history_file, "a", encoding="utf-8") as f:
-                f.write(entry)
+            with self._lock:
+                with open(self.history_file, "a", encoding="utf-8") as f:
+                    f.write(entry)
             
             logger.info(f"Appended conversation to history: {len(user_prompt)} chars (user) + {len(llm_response)} chars (assistant)")
             
         except Exception as e:
             logger.error(f"Failed to append conversation to history: {str(e)}")
+    
+    def read_since(self, offset: int) -> tuple[str, int, int]:
+        """
+        Read the conversation entries appended after a byte offset.
+        
+        Appends are written whole under the same lock, so the returned text
+        always ends on an entry boundary.
+        
+        Args:
+            offset: Byte offset up to which the history has already been consumed
+        
+        Returns:
+            Tuple of (text, start_offset, end_offset). start_offset is 0 instead of
+            offset when the file is shorter than offset (history was truncated or
+            rewritten) and has to be consumed from the beginning again.
+        """
+        with self._lock:
+            if not self.history_file.exists():
+                return "", 0, 0
+            
+            size = self.history_file.stat().st_size
+            if offset > size:
+                logger.warning(f"History file shrank below cursor ({size} < {offset} bytes), reading from start")
+                offset = 0
+            
+            if offset == size:
+                return "", offset, size
+            
+            with open(self.history_file, "rb") as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+        
+        return data.decode("utf-8", errors="replace"), offset, size
 
 
 # Singleton instance
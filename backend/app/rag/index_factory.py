@@ -0,0 +1,200 @@
+"""Construction, training and search parameters for the supported FAISS index types."""
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from app.config import Settings
+from app.utils.logger import logger
+
+
+# Stored next to index.faiss; indexes without it are legacy positional flat indexes
+INDEX_CONFIG_FILE = "index_config.json"
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# k-means wants a few dozen training points per centroid to produce useful lists
+MIN_POINTS_PER_CENTROID = 39
+
+
+def resolve_index_config(settings: Settings, n_vectors: int, dim: int) -> dict:
+    """
+    Decide the concrete index layout for a corpus of the given size.
+    
+    Index types that need training fall back to a simpler type when the corpus
+    is too small to train them meaningfully.
+    
+    Args:
+        settings: Application settings with the faiss_* options
+        n_vectors: Number of vectors the index is built from
+        dim: Embedding dimension
+    
+    Returns:
+        Index config dictionary, persisted as index_config.json
+    """
+    index_type = settings.faiss_index_type.lower()
+    if index_type not in INDEX_TYPES:
+        logger.warning(f"Unknown FAISS index type '{settings.faiss_index_type}', using flat")
+        index_type = "flat"
+    
+    nlist = settings.faiss_ivf_nlist or int(4 * math.sqrt(max(n_vectors, 1)))
+    nlist = max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+    
+    if index_type == "ivf_pq":
+        pq_m = settings.faiss_pq_m
+        if dim % pq_m != 0:
+            logger.warning(f"faiss_pq_m={pq_m} does not divide dimension {dim}, using ivf_flat")
+            index_type = "ivf_flat"
+        elif n_vectors < (2 ** settings.faiss_pq_nbits) * MIN_POINTS_PER_CENTROID // 4:
+            logger.warning(f"Too few vectors ({n_vectors}) to train PQ codebooks, using ivf_flat")
+            index_type = "ivf_flat"
+    
+    if index_type in ("ivf_flat", "ivf_pq") and nlist < 2:
+        logger.warning(f"Too few vectors ({n_vectors}) to train IVF centroids, using flat")
+        index_type = "flat"
+    
+    if index_type == "flat":
+        description = "IDMap2,Flat"
+    elif index_type == "ivf_flat":
+        description = f"IVF{nlist},Flat"
+    elif index_type == "ivf_pq":
+        description = f"IVF{nlist},PQ{settings.faiss_pq_m}x{settings.faiss_pq_nbits}"
+    else:
+        description = f"IDMap2,HNSW{settings.faiss_hnsw_m}"
+    
+    return {
+        "type": index_type,
+        "description": description,
+        "dim": dim,
+        "nlist": nlist if index_type in ("ivf_flat", "ivf_pq") else None,
+        "hnsw_ef_construction": settings.faiss_hnsw_ef_construction if index_type == "hnsw" else None,
+        "trained_on": 0
+    }
+
+
+class TrainingSample:
+    """
+    Uniform random sample of a stream of vectors (reservoir sampling).
+    
+    Every vector seen so far is in the sample with the same probability,
+    wherever it appears in the stream, so training isn't skewed towards the
+    files that happen to be scanned first. Seeded, so rebuilding the same
+    corpus trains on the same sample.
+    """
+    
+    def __init__(self, size: int, seed: int = 0):
+        self.size = max(1, size)
+        self.seen = 0
+        self._rng = np.random.default_rng(seed)
+        self._vectors: Optional[np.ndarray] = None
+        self._filled = 0
+    
+    def add(self, vectors: np.ndarray) -> None:
+        """Offer the next vectors of the stream to the sample."""
+        if self._vectors is None:
+            self._vectors = np.empty((self.size, vectors.shape[1]), dtype=np.float32)
+        
+        fill = min(self.size - self._filled, len(vectors))
+        self._vectors[self._filled:self._filled + fill] = vectors[:fill]
+        self._filled += fill
+        
+        # Once full, the vector at stream position i replaces a random slot
+        # with probability size / (i + 1)
+        rest = vectors[fill:]
+        positions = self.seen + fill + np.arange(len(rest))
+        slots = self._rng.integers(0, positions + 1)
+        rows = np.flatnonzero(slots < self.size)
+        
+        # Of several vectors drawn into the same slot, the last one stays
+        _, last = np.unique(slots[rows][::-1], return_index=True)
+        rows = rows[len(rows) - 1 - last]
+        self._vectors[slots[rows]] = rest[rows]
+        self.seen += len(vectors)
+    
+    @property
+    def vectors(self) -> np.ndarray:
+        """The sampled vectors."""
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[:self._filled]
+
+
+def requires_training(settings: Settings) -> bool:
+    """Check whether the configured index type must be trained before vectors are added."""
+    return settings.faiss_index_type.lower() in ("ivf_flat", "ivf_pq")
+
+
+def create_index(config: dict, vectors: np.ndarray, train_sample: int) -> faiss.Index:
+    """
+    Create an empty index from its config and train it on a sample of the vectors.
+    
+    All created indexes address vectors by explicit int64 IDs (add_with_ids),
+    so IDs stay stable when other vectors are removed.
+    """
+    index = faiss.index_factory(config["dim"], config["description"], faiss.METRIC_L2)
+    
+    if config["type"] == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efConstruction = config["hnsw_ef_construction"]
+    
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > train_sample:
+            rows = np.random.default_rng(0).choice(len(vectors), size=train_sample, replace=False)
+            sample = vectors[rows]
+        logger.info(f"Training {config['type']} index on {len(sample)} vectors")
+        index.train(sample)
+        config["trained_on"] = len(sample)
+    
+    return index
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Check whether vectors can be physically removed from the index (HNSW can't)."""
+    inner = index.index if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    return not isinstance(faiss.downcast_index(inner), faiss.IndexHNSW)
+
+
+def make_search_params(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> Optional[faiss.SearchParameters]:
+    """
+    Build per-query search parameters for the index type.
+    
+    Passing parameters per search (instead of setting them on the index) keeps
+    concurrent searches with different knobs from interfering.
+    """
+    if faiss.try_extract_index_ivf(index) is not None:
+        return faiss.SearchParametersIVF(nprobe=nprobe) if nprobe else None
+    
+    if not supports_removal(index):
+        return faiss.SearchParametersHNSW(efSearch=ef_search) if ef_search else None
+    
+    return None
+
+
+def load_index_config(folder_path: str) -> Optional[dict]:
+    """Load the persisted index config, or None for legacy indexes."""
+    config_file = Path(folder_path) / INDEX_CONFIG_FILE
+    if not config_file.exists():
+        return None
+    
+    try:
+        with open(config_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Failed to read index config: {str(e)}")
+        return None
+
+
+def save_index_config(folder_path: str, config: dict) -> None:
+    """Persist the index config next to index.faiss."""
+    os.makedirs(folder_path, exist_ok=True)
+    with open(Path(folder_path) / INDEX_CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump(config, f)
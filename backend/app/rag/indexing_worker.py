@@ -0,0 +1,243 @@
+"""Single background worker that applies index updates in coalesced batches."""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.config import get_settings
+from app.rag.ingestion import get_document_ingestion
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+
+class IndexingWorker:
+    """
+    Long-lived indexing thread fed by a coalescing queue.
+    
+    Every chat only marks the history as dirty; a burst of chats therefore
+    results in one history increment covering all of them. Updates wait for a
+    quiet period (debounce) but never longer than the max delay, and step back
+    while foreground query embedding is running.
+    """
+    
+    def __init__(self):
+        self.settings = get_settings()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        
+        # Pending work: a history flag plus per-file actions keyed by path, so
+        # repeated requests for the same item collapse into one
+        self._history_pending = False
+        self._pending_files: dict[str, str] = {}
+        self._pending_requests = 0
+        self._first_pending_at: Optional[float] = None
+        self._last_request_at: Optional[float] = None
+        
+        # Foreground queries currently embedding/searching
+        self._foreground_active = 0
+        
+        self._batches = 0
+        self._requests_received = 0
+        self._last_batch_at: Optional[float] = None
+        self._last_batch_duration = 0.0
+        self._last_error: Optional[str] = None
+        self._busy = False
+    
+    def start(self) -> None:
+        """Start the worker thread if it isn't running yet."""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="indexing-worker", daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush pending work and stop the worker thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        
+        if thread is not None:
+            thread.join(timeout)
+    
+    def submit_history(self) -> None:
+        """Request indexing of newly appended conversation history."""
+        with self._condition:
+            self._history_pending = True
+            self._enqueue_locked()
+        self.start()
+    
+    def submit_file(self, file_path: str, action: str = "index") -> None:
+        """
+        Request (re-)indexing or removal of a single data file.
+        
+        Args:
+            file_path: Path to the file
+            action: "index" to add/replace its chunks, "remove" to drop them
+        """
+        with self._condition:
+            self._pending_files[file_path] = action
+            self._enqueue_locked()
+        self.start()
+    
+    def _enqueue_locked(self) -> None:
+        """Update queue bookkeeping for a new request; caller holds the condition."""
+        now = time.monotonic()
+        if self._first_pending_at is None:
+            self._first_pending_at = now
+        self._last_request_at = now
+        self._pending_requests += 1
+        self._requests_received += 1
+        self._condition.notify_all()
+    
+    @contextmanager
+    def foreground(self) -> Iterator[None]:
+        """Mark a latency-sensitive query as running so the worker holds back."""
+        with self._condition:
+            self._foreground_active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._foreground_active -= 1
+                self._condition.notify_all()
+    
+    def _has_pending_locked(self) -> bool:
+        """Check for pending work; caller holds the condition."""
+        return self._history_pending or bool(self._pending_files)
+    
+    def _wait_for_batch_locked(self) -> bool:
+        """
+        Block until a batch is due; caller holds the condition.
+        
+        Returns:
+            False if the worker should exit without waiting for more work
+        """
+        debounce = self.settings.index_worker_debounce_ms / 1000
+        max_delay = self.settings.index_worker_max_delay_ms / 1000
+        
+        while not self._has_pending_locked():
+            if self._stopping:
+                return False
+            self._condition.wait()
+        
+        while not self._stopping:
+            now = time.monotonic()
+            deadline = self._first_pending_at + max_delay
+            if now >= deadline:
+                break
+            
+            quiet_until = self._last_request_at + debounce
+            if now >= quiet_until and self._foreground_active == 0:
+                break
+            
+            # Either still inside the debounce window or foreground queries are
+            # embedding; re-check when something changes or the deadline passes
+            wait_until = deadline if now >= quiet_until else min(quiet_until, deadline)
+            self._condition.wait(max(wait_until - now, 0.001))
+        
+        return True
+    
+    def _lower_priority(self) -> None:
+        """Lower the OS scheduling priority of this thread (best effort, Linux only)."""
+        nice = self.settings.index_worker_nice
+        if nice <= 0 or not hasattr(os, "setpriority"):
+            return
+        try:
+            # On Linux every thread is its own scheduling entity with a native ID
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Could not lower indexing worker priority: {str(e)}")
+    
+    def _run(self) -> None:
+        """Worker loop: wait for a batch, take everything pending, apply it."""
+        self._lower_priority()
+        
+        while True:
+            with self._condition:
+                if not self._wait_for_batch_locked():
+                    return
+                
+                history_pending = self._history_pending
+                pending_files = self._pending_files
+                coalesced = self._pending_requests
+                
+                self._history_pending = False
+                self._pending_files = {}
+                self._pending_requests = 0
+                self._first_pending_at = None
+                self._last_request_at = None
+                self._busy = True
+            
+            started = time.monotonic()
+            try:
+                self._apply_batch(history_pending, pending_files)
+                self._last_error = None
+            except Exception as e:
+                self._last_error = str(e)
+                logger.warning(f"Background indexing batch failed: {str(e)}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._batches += 1
+                    self._last_batch_at = time.time()
+                    self._last_batch_duration = time.monotonic() - started
+            
+            get_metrics().indexing_seconds.observe(self._last_batch_duration, kind="background")
+            logger.info(
+                f"Background indexing batch applied {coalesced} request(s) "
+                f"in {self._last_batch_duration:.2f}s"
+            )
+    
+    def _apply_batch(self, history_pending: bool, pending_files: dict[str, str]) -> None:
+        """Apply one coalesced batch of index updates."""
+        ingestion = get_document_ingestion()
+        
+        for file_path, action in pending_files.items():
+            try:
+                if action == "remove":
+                    ingestion.remove_file(file_path)
+                else:
+                    ingestion.index_single_file(file_path)
+            except Exception as e:
+                logger.warning(f"Failed to update index for {file_path}: {str(e)}")
+        
+        if history_pending:
+            ingestion.index_history_increment()
+    
+    def get_stats(self) -> dict:
+        """Get queue depth, lag and batch statistics."""
+        with self._condition:
+            lag = time.monotonic() - self._first_pending_at if self._first_pending_at is not None else 0.0
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "busy": self._busy,
+                "queue_depth": self._pending_requests,
+                "pending_items": len(self._pending_files) + (1 if self._history_pending else 0),
+                "lag_seconds": round(lag, 3),
+                "requests_received": self._requests_received,
+                "batches": self._batches,
+                "last_batch_at": (
+                    time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._last_batch_at))
+                    if self._last_batch_at else None
+                ),
+                "last_batch_duration_seconds": round(self._last_batch_duration, 3),
+                "last_error": self._last_error
+            }
+
+
+# Singleton instance
+_worker_instance: Optional[IndexingWorker] = None
+
+
+def get_indexing_worker() -> IndexingWorker:
+    """Get the singleton IndexingWorker instance."""
+    global _worker_instance
+    if _worker_instance is None:
+        _worker_instance = IndexingWorker()
+    return _worker_instance
@@ -1,10 +1,15 @@
 """Document loading, chunking, and embedding ingestion."""
 
+import functools
+import multiprocessing
 import os
 import traceback
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, Optional
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
@@ -12,13 +17,29 @@ from langchain_community.document_loaders import (
     TextLoader,
     UnstructuredWordDocumentLoader,
 )
-from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 
 from app.config import get_settings
+from app.rag.history import get_conversation_history
+from app.rag.registry import SourceRegistry, compute_file_hash
 from app.rag.vectorstore import get_vectorstore_manager
 from app.utils.logger import logger
 
 
+def _serialized(method):
+    """Run an ingestion method under the vectorstore mutation lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.vectorstore_manager.mutation():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _load_and_split_in_worker(file_path: str) -> tuple[Optional[dict], int, list]:
+    """Process pool entry point: load, split and fingerprint one file."""
+    return get_document_ingestion()._load_and_split(file_path)
+
+
 class DocumentIngestion:
     """Handles document loading, chunking, and vector store ingestion."""
     
@@ -33,7 +54,9 @@ class DocumentIngestion:
             chunk_size=self.settings.chunk_size,
             chunk_overlap=self.settings.chunk_overlap,
             length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            separators=["\n\n", "\n", " ", ""],
+            # Lets the context builder merge overlapping neighbors
+            add_start_index=True
         )
     
     def _load_pdf(self, file_path: str) -> list:
@@ -121,6 +144,121 @@ class DocumentIngestion:
             logger.error(f"Text loading traceback: {traceback.format_exc()}")
             return []
     
+    def _load_file(self, file_path: str) -> list:
+        """Load a document with the loader matching its extension."""
+        suffix = Path(file_path).suffix.lower()
+        
+        if suffix == ".pdf":
+            return self._load_pdf(file_path)
+        elif suffix == ".md":
+            return self._load_markdown(file_path)
+        elif suffix == ".txt":
+            return self._load_text(file_path)
+        elif suffix in [".docx", ".doc"]:
+            return self._load_docx(file_path)
+        return []
+    
+    def _load_and_split(self, file_path: str) -> tuple[Optional[dict], int, list]:
+        """
+        Fingerprint, load and split a single file.
+        
+        Returns:
+            Tuple of (manifest signature or None if the file can't be hashed,
+            number of loaded documents/pages, chunks)
+        """
+        signature = None
+        try:
+            signature = self._get_file_signature(file_path)
+        except OSError as e:
+            logger.warning(f"Failed to hash {os.path.basename(file_path)}: {str(e)}")
+        
+        docs = self._load_file(file_path)
+        chunks = self.text_splitter.split_documents(docs) if docs else []
+        return signature, len(docs), chunks
+    
+    def _get_ingestion_workers(self, file_count: int) -> int:
+        """Number of loader processes to use for a batch of files."""
+        workers = self.settings.ingestion_workers or os.cpu_count() or 1
+        return max(1, min(workers, file_count))
+    
+    def _iter_load_and_split(self, file_paths: list[str]) -> Iterator[tuple[Optional[dict], int, list]]:
+        """
+        Load and split many files, spreading the work across a process pool.
+        
+        PDF and DOCX parsing are CPU-bound pure Python, so threads would just
+        queue on the GIL. Results are yielded in the order of `file_paths`,
+        which keeps chunk order (and thus the built index) deterministic. At
+        most two files per worker are in flight, so a slow consumer (embedding)
+        never lets parsed files pile up in memory. Falls back to loading
+        in-process when the pool can't be used.
+        
+        Args:
+            file_paths: Files to load
+        
+        Yields:
+            One _load_and_split result per file
+        """
+        done = 0
+        workers = self._get_ingestion_workers(len(file_paths))
+        if workers > 1:
+            try:
+                # Spawn instead of fork: the server process runs threads
+                # (indexing worker, query batcher) that must not be forked mid-lock
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    logger.info(f"Loading {len(file_paths)} files with {workers} worker processes")
+                    in_flight: deque[Future] = deque()
+                    submitted = 0
+                    while done < len(file_paths):
+                        while submitted < len(file_paths) and len(in_flight) < workers * 2:
+                            in_flight.append(pool.submit(_load_and_split_in_worker, file_paths[submitted]))
+                            submitted += 1
+                        result = in_flight.popleft().result()
+                        done += 1
+                        yield result
+                return
+            except Exception as e:
+                logger.warning(f"Parallel loading failed ({str(e)}), loading remaining files in-process")
+        
+        for file_path in file_paths[done:]:
+            yield self._load_and_split(file_path)
+    
+    def _get_file_signature(self, file_path: str) -> dict:
+        """Get the (size, mtime, sha256) manifest entry for a file."""
+        stat = os.stat(file_path)
+        return {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": compute_file_hash(file_path)
+        }
+    
+    def _is_history_file(self, file_path: str) -> bool:
+        """Check whether a path points to the conversation history file."""
+        history_file = get_conversation_history().history_file
+        return Path(file_path).resolve() == history_file.resolve()
+    
+    def _load_history_since(self, offset: int) -> tuple[list, int, int]:
+        """
+        Load the conversation entries appended to history.txt after a byte offset.
+        
+        Args:
+            offset: Byte offset of the last indexed position
+        
+        Returns:
+            Tuple of (documents, start_offset, end_offset)
+        """
+        history = get_conversation_history()
+        text, start_offset, end_offset = history.read_since(offset)
+        
+        if not text.strip():
+            return [], start_offset, end_offset
+        
+        document = Document(
+            page_content=text,
+            metadata={"source": history.history_file.name, "file_type": "text"}
+        )
+        return [document], start_offset, end_offset
+    
     def scan_data_folder(self) -> list[dict]:
         """Scan the data folder for documents."""
         data_path = Path(self.settings.data_folder)
@@ -163,10 +301,15 @@ class DocumentIngestion:
         
         return found_files
     
-    def load_or_create_index(self) -> tuple[int, int]:
+    def load_or_create_index(self, index_only: bool = False) -> tuple[int, int]:
         """
         Load existing FAISS index or create a new one if it doesn't exist.
         
+        Args:
+            index_only: Only load an existing index: skip the data folder scan
+                (the document count comes from the source registry) and don't
+                build an index if none can be loaded
+        
         Returns:
             Tuple of (documents_count, chunks_count)
         """
@@ -185,6 +328,12 @@ class DocumentIngestion:
                     stats = self.vectorstore_manager.get_collection_stats()
                     chunks_count = stats.get("total_chunks", 0)
                     
+                    if index_only:
+                        # Files in the data folder as of the last indexing run
+                        self._documents_count = len(self.vectorstore_manager.get_registry().sources())
+                        logger.info(f"Loaded existing index: {self._documents_count} files, {chunks_count} chunks")
+                        return self._documents_count, chunks_count
+                    
                     # Count documents in data folder by type
                     files = self.scan_data_folder()
                     self._documents_count = len(files)
@@ -218,14 +367,26 @@ class DocumentIngestion:
             except Exception as e:
                 logger.warning(f"Failed to load existing index: {str(e)}. Will create new index.")
         
+        if index_only:
+            return 0, 0
+        
         # No existing index or loading failed, create new index
         logger.info("No existing index found, creating new index from documents...")
         return self.index_documents()
     
-    def index_documents(self) -> tuple[int, int]:
+    @_serialized
+    def index_documents(self, progress: Optional[Callable[[dict], None]] = None) -> tuple[int, int]:
         """
         Index all documents from the data folder.
         
+        Files stream through load -> split -> embed -> add in bounded batches
+        (ingestion_batch_size chunks), so peak memory is set by the batch size
+        and the index itself rather than by the raw corpus.
+        
+        Args:
+            progress: Optional callback receiving a progress dictionary
+                (phase, files_done, files_total, chunks_indexed) as work advances
+        
         Returns:
             Tuple of (documents_count, chunks_count)
         """
@@ -244,33 +405,82 @@ class DocumentIngestion:
                         "text": {"total": 0, "loaded": 0, "failed": 0},
                         "docx": {"total": 0, "loaded": 0, "failed": 0}}
         
-        # Load all documents
-        all_documents = []
-        
         for file_info in files:
             logger.log_document_found(file_info["name"], file_info["type"])
-            file_type = file_info["type"]
-            
-            if file_type in stats_by_type:
-                stats_by_type[file_type]["total"] += 1
-            
-            if file_info["type"] == "pdf":
-                docs = self._load_pdf(file_info["path"])
-            elif file_info["type"] == "markdown":
-                docs = self._load_markdown(file_info["path"])
-            elif file_info["type"] == "text":
-                docs = self._load_text(file_info["path"])
-            elif file_info["type"] == "docx":
-                docs = self._load_docx(file_info["path"])
-            else:
-                continue
+        
+        state = {
+            "phase": "indexing",
+            "files_done": 0,
+            "files_total": len(files),
+            "chunks_indexed": 0
+        }
+        documents_count = 0
+        history_offset = 0
+        file_signatures = {}
+        
+        # Chunk IDs are recorded under their source file as they stream past
+        registry = SourceRegistry(self.settings.faiss_index_path, load=False)
+        
+        def report() -> None:
+            if progress is not None:
+                progress(dict(state))
+        
+        def on_batch(added: int) -> None:
+            state["chunks_indexed"] += added
+            report()
+        
+        def iter_file_chunks() -> Iterator[list]:
+            """Yield the chunks of each file in scan order, updating stats as files complete."""
+            nonlocal documents_count, history_offset
             
-            if docs and file_type in stats_by_type:
-                stats_by_type[file_type]["loaded"] += 1
-            elif file_type in stats_by_type:
-                stats_by_type[file_type]["failed"] += 1
+            # Data files are loaded in parallel; history is read in this process
+            # through its lock so the cursor matches exactly what was indexed
+            data_paths = [f["path"] for f in files if not self._is_history_file(f["path"])]
+            loaded = self._iter_load_and_split(data_paths)
             
-            all_documents.extend(docs)
+            for file_info in files:
+                file_type = file_info["type"]
+                if file_type in stats_by_type:
+                    stats_by_type[file_type]["total"] += 1
+                
+                if self._is_history_file(file_info["path"]):
+                    docs, _, history_offset = self._load_history_since(0)
+                    docs_loaded, file_chunks = len(docs), self.text_splitter.split_documents(docs)
+                    if file_type in stats_by_type:
+                        stats_by_type[file_type]["loaded"] += 1
+                else:
+                    signature, docs_loaded, file_chunks = next(loaded)
+                    if signature is not None:
+                        file_signatures[file_info["name"]] = signature
+                    if docs_loaded and file_type in stats_by_type:
+                        stats_by_type[file_type]["loaded"] += 1
+                    elif file_type in stats_by_type:
+                        stats_by_type[file_type]["failed"] += 1
+                
+                documents_count += docs_loaded
+                state["files_done"] += 1
+                report()
+                yield file_chunks
+        
+        def iter_batches() -> Iterator[tuple[list, list[str]]]:
+            """Regroup the per-file chunk stream into fixed-size embedding batches."""
+            batch_size = max(1, self.settings.ingestion_batch_size)
+            batch, batch_ids = [], []
+            for file_chunks in iter_file_chunks():
+                for chunk in file_chunks:
+                    doc_id = str(uuid.uuid4())
+                    registry.extend(chunk.metadata.get("source", "unknown"), [doc_id])
+                    batch.append(chunk)
+                    batch_ids.append(doc_id)
+                    if len(batch) == batch_size:
+                        yield batch, batch_ids
+                        batch, batch_ids = [], []
+            if batch:
+                yield batch, batch_ids
+        
+        # Build the new FAISS index off to the side; searches keep using the
+        # previous index until it is swapped in
+        built = self.vectorstore_manager.build_vectorstore(iter_batches(), on_batch=on_batch)
         
         # Log loading statistics
         logger.info("")
@@ -282,7 +492,7 @@ class DocumentIngestion:
                     logger.warning(f"  ⚠️  {stats['failed']} {doc_type.upper()} file(s) failed to load - check error messages above")
         logger.info("")
         
-        if not all_documents:
+        if built is None:
             logger.error("❌ CRITICAL: No documents could be loaded! Check error messages above.")
             logger.error("Common issues:")
             logger.error("  - PDF files might be corrupted or password-protected")
@@ -290,33 +500,37 @@ class DocumentIngestion:
             logger.error("  - Missing required dependencies (pypdf, python-docx, etc.)")
             return 0, 0
         
-        # Split documents into chunks
-        chunks = self.text_splitter.split_documents(all_documents)
-        
-        logger.info(f"Split {len(all_documents)} documents into {len(chunks)} chunks")
-        
-        # Reset the vector store and create new FAISS index
-        self.vectorstore_manager.reset_vectorstore()
-        
-        # Create FAISS vectorstore from documents
-        embeddings = self.vectorstore_manager.get_embeddings()
-        vectorstore = FAISS.from_documents(chunks, embeddings)
-        
-        # Save the index to disk
-        os.makedirs(self.settings.faiss_index_path, exist_ok=True)
-        vectorstore.save_local(self.settings.faiss_index_path)
-        
-        # Update the cached vectorstore
-        self.vectorstore_manager.set_vectorstore(vectorstore)
+        vectorstore, index_config, keyword_index = built
+        chunks_count = state["chunks_indexed"]
+        logger.info(f"Split {documents_count} documents into {chunks_count} chunks")
+        
+        # Files that produced no chunks are registered too, so an unchanged
+        # broken file is not re-parsed on every differential reindex
+        for source, signature in file_signatures.items():
+            registry.update(source, **signature)
+        
+        # Swap in the new index and save it with its registry and history cursor
+        state["phase"] = "saving"
+        report()
+        self.vectorstore_manager.replace_vectorstore(
+            vectorstore,
+            registry,
+            history_offset,
+            index_config,
+            keyword_index
+        )
         
         # Update tracking
         self._documents_count = len(files)
         self._last_indexed = datetime.now()
         
-        logger.log_indexing_complete(len(files), len(chunks))
+        state["phase"] = "complete"
+        report()
+        logger.log_indexing_complete(len(files), chunks_count)
         
-        return len(files), len(chunks)
+        return len(files), chunks_count
     
+    @_serialized
     def index_single_file(self, file_path: str) -> tuple[int, int]:
         """
         Incrementally index a single file by adding it to existing index.
@@ -340,47 +554,308 @@ class DocumentIngestion:
             logger.warning("No existing index found, performing full index")
             return self.index_documents()
         
-        # Load the single file
+        if self._is_history_file(file_path):
+            return self.index_history_increment()
+        
         file_name = os.path.basename(file_path)
-        suffix = Path(file_path).suffix.lower()
         
-        docs = []
-        if suffix == ".pdf":
-            docs = self._load_pdf(file_path)
-        elif suffix == ".md":
-            docs = self._load_markdown(file_path)
-        elif suffix == ".txt":
-            docs = self._load_text(file_path)
-        elif suffix in [".docx", ".doc"]:
-            docs = self._load_docx(file_path)
+        # Skip files whose content hasn't changed since they were indexed
+        signature = self._get_file_signature(file_path)
+        entry = self.vectorstore_manager.get_registry().get(file_name)
+        if entry is not None and entry.get("sha256") == signature["sha256"]:
+            logger.info(f"{file_name} is unchanged since last indexing, skipping")
+            return self._documents_count, self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
+        
+        added, removed = self._replace_file_chunks(file_path, signature)
+        if added == 0:
+            return self._documents_count, self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
+        
+        # Save the updated index and registry
+        self.vectorstore_manager.save()
+        
+        # Get updated stats
+        stats = self.vectorstore_manager.get_collection_stats()
+        total_chunks = stats.get("total_chunks", 0)
+        
+        logger.info(f"Incremental indexing complete: added {added} chunks, total now {total_chunks}")
+        
+        return self._documents_count, total_chunks
+    
+    def _replace_file_chunks(self, file_path: str, signature: dict) -> tuple[int, int]:
+        """
+        Load, split and embed a file, replacing its previous chunks in the vectorstore.
+        
+        Must run under the vectorstore mutation lock; the caller is responsible
+        for saving the vectorstore afterwards.
+        
+        Args:
+            file_path: Path to the file to index
+            signature: Manifest entry of the file from _get_file_signature
+        
+        Returns:
+            Tuple of (chunks_added, chunks_removed)
+        """
+        file_name = os.path.basename(file_path)
+        registry = self.vectorstore_manager.get_registry()
+        
+        # Load the single file
+        docs = self._load_file(file_path)
         
         if not docs:
             logger.warning(f"No content loaded from {file_path}")
-            return self._documents_count, self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
+            return 0, 0
         
         # Split into chunks
         chunks = self.text_splitter.split_documents(docs)
         
         if not chunks:
             logger.warning(f"No chunks created from {file_path}")
+            return 0, 0
+        
+        # Add the new chunks before dropping the old ones so a failed embedding
+        # never leaves the file missing from the index
+        old_ids = registry.get_ids(file_name)
+        ids = [str(uuid.uuid4()) for _ in chunks]
+        self.vectorstore_manager.add_documents(chunks, ids)
+        removed = self.vectorstore_manager.delete_documents(old_ids)
+        self.vectorstore_manager.mark_corpus_changed()
+        registry.set(file_name, ids, **signature)
+        
+        logger.info(f"Replaced {removed} old chunks of {file_name} with {len(chunks)} new chunks")
+        
+        return len(chunks), removed
+    
+    @_serialized
+    def remove_file(self, file_path: str) -> tuple[int, int]:
+        """
+        Drop all chunks of a source file from the index, e.g. after it was deleted.
+        
+        Args:
+            file_path: Path (or name) of the file to remove
+        
+        Returns:
+            Tuple of (documents_count, chunks_count)
+        """
+        file_name = os.path.basename(file_path)
+        vectorstore = self.vectorstore_manager.get_vectorstore()
+        
+        if vectorstore is None:
+            return self._documents_count, 0
+        
+        registry = self.vectorstore_manager.get_registry()
+        if registry.get(file_name) is None:
+            # Never indexed (e.g. a watcher event for an unsupported temp file)
             return self._documents_count, self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
         
-        logger.info(f"Adding {len(chunks)} chunks from {file_name} to existing index")
+        old_ids = registry.remove(file_name)
+        removed = self.vectorstore_manager.delete_documents(old_ids)
+        self.vectorstore_manager.mark_corpus_changed()
+        self.vectorstore_manager.save()
         
-        # Add new chunks to existing vectorstore
-        vectorstore.add_documents(chunks)
+        total_chunks = self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
+        logger.info(f"Removed {removed} chunks of {file_name} from index, total now {total_chunks}")
         
-        # Save the updated index
-        vectorstore.save_local(self.settings.faiss_index_path)
+        return self._documents_count, total_chunks
+    
+    @_serialized
+    def reindex_changed(self, progress: Optional[Callable[[dict], None]] = None) -> dict:
+        """
+        Re-index only the files that changed since the last indexing run.
         
-        # Update the cached vectorstore
-        self.vectorstore_manager.set_vectorstore(vectorstore)
+        The data folder is diffed against the (size, mtime, sha256) manifest kept in
+        the source registry. Files whose size and mtime match are assumed unchanged
+        without reading them; otherwise the content hash decides. Falls back to a
+        full rebuild when there is no index or no registry yet.
         
-        # Get updated stats
-        stats = self.vectorstore_manager.get_collection_stats()
-        total_chunks = stats.get("total_chunks", 0)
+        If the progress callback raises (e.g. to cancel), the files processed so
+        far stay applied and are saved; the rest is picked up by the next run.
+        
+        Args:
+            progress: Optional callback receiving a progress dictionary
+                (phase, files_done, files_total, chunks_indexed) as work advances
+        
+        Returns:
+            Dictionary describing what was done: mode, added, modified, removed,
+            unchanged, chunks_added, chunks_removed, documents and chunks
+        """
+        vectorstore = self.vectorstore_manager.get_vectorstore()
+        registry = self.vectorstore_manager.get_registry()
+        
+        if vectorstore is None or not registry.exists():
+            logger.info("No index or source registry found, performing full reindex")
+            docs, chunks = self.index_documents(progress=progress)
+            return {
+                "mode": "full",
+                "added": docs,
+                "modified": 0,
+                "removed": 0,
+                "unchanged": 0,
+                "chunks_added": chunks,
+                "chunks_removed": 0,
+                "documents": docs,
+                "chunks": chunks
+            }
+        
+        all_files = self.scan_data_folder()
+        files = [f for f in all_files if not self._is_history_file(f["path"])]
+        history_name = get_conversation_history().history_file.name
+        
+        added, modified, unchanged = [], [], []
+        signatures = {}
+        manifest_changed = False
+        
+        for file_info in files:
+            entry = registry.get(file_info["name"])
+            stat = os.stat(file_info["path"])
+            
+            if entry is not None and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+                unchanged.append(file_info)
+                continue
+            
+            signature = self._get_file_signature(file_info["path"])
+            if entry is not None and entry.get("sha256") == signature["sha256"]:
+                # Touched but identical content: refresh the manifest only
+                registry.set(file_info["name"], entry.get("ids", []), **signature)
+                unchanged.append(file_info)
+                manifest_changed = True
+                continue
+            
+            signatures[file_info["name"]] = signature
+            (modified if entry is not None else added).append(file_info)
+        
+        current_names = {f["name"] for f in files}
+        removed = [name for name in registry.sources() if name != history_name and name not in current_names]
+        
+        chunks_added = 0
+        chunks_removed = 0
+        state = {
+            "phase": "indexing",
+            "files_done": 0,
+            "files_total": len(removed) + len(added) + len(modified),
+            "chunks_indexed": 0
+        }
+        
+        def report() -> None:
+            if progress is not None:
+                progress(dict(state))
+        
+        try:
+            report()
+            
+            for name in removed:
+                chunks_removed += self.vectorstore_manager.delete_documents(registry.remove(name))
+                self.vectorstore_manager.mark_corpus_changed()
+                logger.info(f"  Removed: {name}")
+                state["files_done"] += 1
+                report()
+            
+            for file_info in added + modified:
+                logger.log_document_found(file_info["name"], file_info["type"])
+                signature = signatures[file_info["name"]]
+                new_chunks, old_chunks = self._replace_file_chunks(file_info["path"], signature)
+                if new_chunks == 0:
+                    # Remember the failed file so it is only retried once it changes
+                    registry.set(file_info["name"], registry.get_ids(file_info["name"]), **signature)
+                chunks_added += new_chunks
+                chunks_removed += old_chunks
+                state["files_done"] += 1
+                state["chunks_indexed"] = chunks_added
+                report()
+            
+            state["phase"] = "saving"
+            report()
+        finally:
+            # Saving also persists manifest refreshes of touched-but-unchanged
+            # files; a no-op reindex never rewrites the index
+            if state["files_done"] or manifest_changed:
+                self.vectorstore_manager.save()
+        
+        # Pick up any conversation history not yet indexed
+        self.index_history_increment()
+        
+        self._documents_count = len(all_files)
+        if added or modified or removed:
+            self._last_indexed = datetime.now()
+        
+        total_chunks = self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
+        logger.info(
+            f"Differential reindex complete: {len(added)} added, {len(modified)} modified, "
+            f"{len(removed)} removed, {len(unchanged)} unchanged "
+            f"(+{chunks_added}/-{chunks_removed} chunks, total now {total_chunks})"
+        )
+        
+        state["phase"] = "complete"
+        report()
+        
+        return {
+            "mode": "incremental",
+            "added": len(added),
+            "modified": len(modified),
+            "removed": len(removed),
+            "unchanged": len(unchanged),
+            "chunks_added": chunks_added,
+            "chunks_removed": chunks_removed,
+            "documents": self._documents_count,
+            "chunks": total_chunks
+        }
+    
+    @_serialized
+    def index_history_increment(self) -> tuple[int, int]:
+        """
+        Index only the conversation entries appended to history.txt since the last run.
+        
+        A byte-offset cursor persisted next to the FAISS index records how much of
+        the history is already embedded, so each call costs O(new entries) rather
+        than O(history size).
+        
+        Returns:
+            Tuple of (documents_count, chunks_count)
+        """
+        vectorstore = self.vectorstore_manager.get_vectorstore()
+        
+        if vectorstore is None:
+            logger.warning("No existing index found, performing full index")
+            return self.index_documents()
+        
+        offset = self.vectorstore_manager.get_history_offset()
+        if offset is None:
+            # Index predates the cursor and already holds the history written so far
+            offset = get_conversation_history().history_file.stat().st_size
+            self.vectorstore_manager.set_history_offset(offset)
+            self.vectorstore_manager.save()
+            logger.info(f"Initialized history cursor at {offset} bytes")
+        
+        docs, start_offset, end_offset = self._load_history_since(offset)
+        registry = self.vectorstore_manager.get_registry()
+        history_name = get_conversation_history().history_file.name
+        
+        if start_offset < offset:
+            # History was rewritten, so everything indexed from it is stale,
+            # even when nothing is left to index (truncated or cleared file)
+            stale_ids = registry.remove(history_name)
+            removed = self.vectorstore_manager.delete_documents(stale_ids)
+            logger.info(f"Dropped {removed} stale history chunks")
+        
+        if not docs:
+            if end_offset != offset:
+                self.vectorstore_manager.set_history_offset(end_offset)
+                self.vectorstore_manager.save()
+            return self._documents_count, self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
+        
+        chunks = self.text_splitter.split_documents(docs)
+        
+        if chunks:
+            logger.info(f"Adding {len(chunks)} chunks from {end_offset - start_offset} new history bytes to existing index")
+            ids = [str(uuid.uuid4()) for _ in chunks]
+            self.vectorstore_manager.add_documents(chunks, ids)
+            registry.extend(history_name, ids)
+        
+        # The cursor is saved together with the index, so the two never disagree
+        self.vectorstore_manager.set_history_offset(end_offset)
+        self.vectorstore_manager.save()
         
-        logger.info(f"Incremental indexing complete: added {len(chunks)} chunks, total now {total_chunks}")
+        total_chunks = self.vectorstore_manager.get_collection_stats().get("total_chunks", 0)
+        logger.info(f"History indexing complete: added {len(chunks)} chunks, total now {total_chunks}")
         
         return self._documents_count, total_chunks
     
@@ -410,7 +885,8 @@ class DocumentIngestion:
             "total_chunks": collection_stats.get("total_chunks", 0),
             "vector_db_size": size_str,
             "last_indexed": self._last_indexed.isoformat() if self._last_indexed else "Never",
-            "files_by_type": file_types
+            "files_by_type": file_types,
+            "index_type": collection_stats.get("index_type")
         }
 
 
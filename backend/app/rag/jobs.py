@@ -0,0 +1,208 @@
+"""Background reindex jobs with progress reporting and cancellation."""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from app.rag.ingestion import get_document_ingestion
+from app.utils.logger import logger
+from app.utils.metrics import get_metrics
+
+
+# Finished jobs kept around so clients can still fetch their final status
+MAX_FINISHED_JOBS = 20
+
+
+class ReindexCancelled(Exception):
+    """Raised from the progress callback to abort a cancelled reindex job."""
+
+
+class ReindexJob:
+    """State of a single reindex run."""
+    
+    def __init__(self, full: bool):
+        self.job_id = uuid.uuid4().hex
+        self.full = full
+        self.status = "queued"
+        self.phase = "queued"
+        self.files_done = 0
+        self.files_total = 0
+        self.chunks_embedded = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = threading.Event()
+    
+    @property
+    def finished(self) -> bool:
+        """Whether the job has reached a final state."""
+        return self.status in ("completed", "failed", "cancelled")
+    
+    def update(self, progress: dict) -> None:
+        """
+        Progress callback handed to the ingestion methods.
+        
+        Raises:
+            ReindexCancelled: If cancellation was requested before the new
+                index was swapped in
+        """
+        self.phase = progress.get("phase", self.phase)
+        self.files_done = progress.get("files_done", self.files_done)
+        self.files_total = progress.get("files_total", self.files_total)
+        self.chunks_embedded = progress.get("chunks_indexed", self.chunks_embedded)
+        
+        if self.cancel_requested.is_set() and self.phase != "complete":
+            raise ReindexCancelled()
+    
+    def to_dict(self) -> dict:
+        """Snapshot of the job status with derived throughput and ETA."""
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        
+        throughput = self.chunks_embedded / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == "running" and self.files_done and self.files_total > self.files_done:
+            eta = elapsed / self.files_done * (self.files_total - self.files_done)
+        
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "phase": self.phase,
+            "mode": "full" if self.full else "incremental",
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "chunks_embedded": self.chunks_embedded,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_chunks_per_second": round(throughput, 2),
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "created_at": self.created_at.isoformat(),
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class ReindexJobManager:
+    """
+    Runs reindexing in background threads, one job at a time.
+    
+    Full rebuilds are built off to the side and only swapped in at the end, so
+    queries keep being served from the previous index while a job runs, and a
+    cancelled full job leaves the previous index untouched.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, ReindexJob]" = OrderedDict()
+        self._active: Optional[ReindexJob] = None
+    
+    def start(self, full: bool = False) -> tuple[ReindexJob, bool]:
+        """
+        Start a reindex job unless one is already running.
+        
+        Args:
+            full: Rebuild the whole index instead of a differential reindex
+        
+        Returns:
+            Tuple of (job, created); created is False if the already running
+            job was returned instead
+        """
+        with self._lock:
+            if self._active is not None and not self._active.finished:
+                return self._active, False
+            
+            job = ReindexJob(full)
+            self._jobs[job.job_id] = job
+            self._active = job
+            self._prune_locked()
+        
+        thread = threading.Thread(target=self._run, args=(job,), name=f"reindex-{job.job_id[:8]}", daemon=True)
+        thread.start()
+        return job, True
+    
+    def get(self, job_id: str) -> Optional[ReindexJob]:
+        """Look up a job by ID."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def cancel(self, job_id: str) -> Optional[ReindexJob]:
+        """
+        Request cancellation of a job.
+        
+        The job stops at its next progress report (after the current file or
+        embedding batch). Returns None if the job is unknown.
+        """
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_requested.set()
+            logger.info(f"Cancellation requested for reindex job {job_id}")
+        return job
+    
+    def _prune_locked(self) -> None:
+        """Forget the oldest finished jobs beyond the retention limit; caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+    
+    def _run(self, job: ReindexJob) -> None:
+        """Job thread: run the ingestion method and record its outcome."""
+        ingestion = get_document_ingestion()
+        job.status = "running"
+        job.started_at = time.monotonic()
+        
+        try:
+            if job.full:
+                docs, chunks = ingestion.index_documents(progress=job.update)
+                job.result = {
+                    "mode": "full",
+                    "added": docs,
+                    "modified": 0,
+                    "removed": 0,
+                    "unchanged": 0,
+                    "chunks_added": chunks,
+                    "chunks_removed": 0,
+                    "documents": docs,
+                    "chunks": chunks
+                }
+            else:
+                job.result = ingestion.reindex_changed(progress=job.update)
+            job.phase = "complete"
+            status = "completed"
+        except ReindexCancelled:
+            status = "cancelled"
+            logger.info(f"Reindex job {job.job_id} cancelled during {job.phase}")
+        except Exception as e:
+            status = "failed"
+            job.error = str(e)
+            logger.log_error(str(e), f"Reindex job {job.job_id}")
+        
+        # Timestamp first so a finished job never reports a still-growing elapsed time
+        job.finished_at = time.monotonic()
+        job.status = status
+        
+        if status == "completed":
+            self._record_metrics(job)
+    
+    def _record_metrics(self, job: ReindexJob) -> None:
+        """Record the duration, chunks added and throughput of a completed job."""
+        data = job.to_dict()
+        metrics = get_metrics()
+        metrics.indexing_seconds.observe(job.finished_at - job.started_at, kind=data["mode"])
+        metrics.chunks_indexed.inc(job.result["chunks_added"], kind=data["mode"])
+        metrics.indexing_throughput.set(data["throughput_chunks_per_second"], kind=data["mode"])
+
+
+# Singleton instance
+_job_manager_instance: Optional[ReindexJobManager] = None
+
+
+def get_reindex_job_manager() -> ReindexJobManager:
+    """Get the singleton ReindexJobManager instance."""
+    global _job_manager_instance
+    if _job_manager_instance is None:
+        _job_manager_instance = ReindexJobManager()
+    return _job_manager_instance
@@ -0,0 +1,72 @@
+"""Bounded exact-match LRU caches for query embeddings and retrieval results."""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace so trivially different spellings of a query share a cache entry."""
+    return " ".join(text.split())
+
+
+class LRUCache:
+    """
+    Thread-safe LRU mapping with hit/miss counters and an approximate size.
+    
+    `sizeof` estimates the memory held by a value; the total is tracked
+    incrementally so the footprint can be reported without walking the cache.
+    """
+    
+    def __init__(self, max_entries: int, sizeof: Callable[[object], int] = sys.getsizeof):
+        self.max_entries = max(1, max_entries)
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, tuple[object, int]]" = OrderedDict()
+        self._bytes = 0
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[object]:
+        """Get a value and mark it most recently used, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: Hashable, value: object) -> None:
+        """Insert or replace a value, evicting the least recently used entries when full."""
+        key_size = sum(map(sys.getsizeof, key)) if isinstance(key, tuple) else sys.getsizeof(key)
+        size = self._sizeof(value) + key_size
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            
+            self._entries[key] = (value, size)
+            self._bytes += size
+            
+            while len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    
+    def get_stats(self) -> dict:
+        """Get size, memory footprint and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "approx_bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions
+        }
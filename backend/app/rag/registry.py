@@ -0,0 +1,141 @@
+"""Persistent registry of which chunks in the FAISS index belong to which source file."""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app.utils.logger import logger
+
+
+# Stored next to index.faiss so it is always reset together with the index
+REGISTRY_FILE = "registry.json"
+
+
+def compute_file_hash(file_path: str) -> str:
+    """Compute the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SourceRegistry:
+    """Maps each indexed source file to its docstore IDs and content hash."""
+    
+    def __init__(self, index_path: str, load: bool = True):
+        self.index_path = Path(index_path)
+        self._lock = threading.Lock()
+        self._sources: dict[str, dict] = {}
+        if load:
+            self.load()
+    
+    @property
+    def registry_file(self) -> Path:
+        """Path of the registry file inside the index folder."""
+        return self.index_path / REGISTRY_FILE
+    
+    def load(self) -> None:
+        """Load the registry from disk, starting empty if it doesn't exist."""
+        with self._lock:
+            self._sources = {}
+            if not self.registry_file.exists():
+                return
+            
+            try:
+                with open(self.registry_file, "r", encoding="utf-8") as f:
+                    self._sources = json.load(f).get("sources", {})
+            except Exception as e:
+                logger.warning(f"Failed to load source registry: {str(e)}. Starting with an empty registry.")
+                self._sources = {}
+    
+    def save(self, folder_path: Optional[str] = None) -> None:
+        """
+        Persist the registry next to the FAISS index.
+        
+        Args:
+            folder_path: Folder to write to instead of the index folder, e.g. the
+                temp directory of an atomic index save
+        """
+        target = Path(folder_path) if folder_path else self.index_path
+        
+        with self._lock:
+            os.makedirs(target, exist_ok=True)
+            
+            # Write to a temp file first so a crash never leaves a truncated registry
+            tmp_file = target / f"{REGISTRY_FILE}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"sources": self._sources}, f)
+            os.replace(tmp_file, target / REGISTRY_FILE)
+    
+    def exists(self) -> bool:
+        """Check whether a registry has been persisted for the current index."""
+        return self.registry_file.exists()
+    
+    def get(self, source: str) -> Optional[dict]:
+        """Get the registry entry for a source, if it is indexed."""
+        with self._lock:
+            entry = self._sources.get(source)
+            return dict(entry) if entry is not None else None
+    
+    def get_ids(self, source: str) -> list[str]:
+        """Get the docstore IDs of all chunks belonging to a source."""
+        with self._lock:
+            entry = self._sources.get(source)
+            return list(entry["ids"]) if entry is not None else []
+    
+    def sources(self) -> list[str]:
+        """List all registered source names."""
+        with self._lock:
+            return list(self._sources.keys())
+    
+    def set(self, source: str, ids: list[str], sha256: Optional[str] = None, **extra) -> None:
+        """
+        Register (or replace) the chunks for a source.
+        
+        Args:
+            source: Source name as stored in chunk metadata
+            ids: Docstore IDs of the source's chunks
+            sha256: Content hash of the source file
+            **extra: Additional JSON-serializable attributes to keep for the source
+        """
+        with self._lock:
+            self._sources[source] = {
+                "ids": list(ids),
+                "sha256": sha256,
+                "indexed_at": datetime.now().isoformat(),
+                **extra
+            }
+    
+    def extend(self, source: str, ids: list[str]) -> None:
+        """Append chunk IDs to a source without touching its other attributes."""
+        with self._lock:
+            entry = self._sources.setdefault(source, {"ids": [], "sha256": None})
+            entry["ids"].extend(ids)
+            entry["indexed_at"] = datetime.now().isoformat()
+    
+    def update(self, source: str, sha256: Optional[str] = None, **extra) -> None:
+        """Set the attributes of a source, registering it without chunks if it is new."""
+        with self._lock:
+            entry = self._sources.setdefault(source, {"ids": []})
+            entry.update(sha256=sha256, indexed_at=datetime.now().isoformat(), **extra)
+    
+    def remove(self, source: str) -> list[str]:
+        """
+        Drop a source from the registry.
+        
+        Returns:
+            Docstore IDs that belonged to the source
+        """
+        with self._lock:
+            entry = self._sources.pop(source, None)
+            return list(entry["ids"]) if entry is not None else []
+    
+    def clear(self) -> None:
+        """Remove all sources from the registry."""
+        with self._lock:
+            self._sources = {}
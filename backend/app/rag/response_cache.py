@@ -0,0 +1,154 @@
+"""Semantic cache of chat responses keyed by query embedding similarity."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.models import ChatResponse
+
+
+class SemanticResponseCache:
+    """
+    Bounded in-memory cache of answered queries.
+    
+    A lookup returns the cached response of the most similar earlier query if
+    the cosine similarity of their embeddings reaches `threshold`, so repeated
+    and reworded questions skip retrieval and the LLM call. Normalized query
+    embeddings are kept in a preallocated matrix and matched with one
+    matrix-vector product. Entries expire after `ttl_seconds`, the least
+    recently used one is evicted when full, and everything is dropped when the
+    corpus version changes.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(self.max_entries, dtype=bool)
+        # Row -> (response, search params, expiry time), in LRU order
+        self._entries: "OrderedDict[int, tuple[ChatResponse, tuple, float]]" = OrderedDict()
+        self._free_rows = list(range(self.max_entries - 1, -1, -1))
+        self._version: Optional[int] = None
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        """Scale an embedding to unit length so dot products are cosine similarities."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+    
+    def _drop_row(self, row: int) -> None:
+        """Free a row; caller holds the lock."""
+        del self._entries[row]
+        self._valid[row] = False
+        self._free_rows.append(row)
+    
+    def _sync_version(self, version: int) -> None:
+        """Drop all entries if the corpus changed since they were cached; caller holds the lock."""
+        if self._version == version:
+            return
+        if self._entries:
+            self.invalidations += 1
+            for row in list(self._entries):
+                self._drop_row(row)
+        self._version = version
+    
+    def lookup(self, embedding: list[float], params: tuple, version: int) -> Optional[ChatResponse]:
+        """
+        Find the cached response of a sufficiently similar query.
+        
+        Args:
+            embedding: Query embedding
+            params: Search parameters the response must have been produced with
+            version: Current corpus version
+        
+        Returns:
+            Copy of the cached ChatResponse, or None on a miss
+        """
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        
+        with self._lock:
+            self._sync_version(version)
+            
+            if self._vectors is None or not self._entries or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            
+            similarities = self._vectors @ query
+            similarities[~self._valid] = -np.inf
+            
+            # Best matches first; skip expired ones and ones searched with other knobs
+            for row in np.argsort(-similarities):
+                row = int(row)
+                if similarities[row] < self.threshold:
+                    break
+                response, entry_params, expires_at = self._entries[row]
+                if expires_at <= now:
+                    self._drop_row(row)
+                    continue
+                if entry_params != params:
+                    continue
+                self._entries.move_to_end(row)
+                self.hits += 1
+                return response.model_copy(deep=True)
+            
+            self.misses += 1
+            return None
+    
+    def store(self, embedding: list[float], params: tuple, version: int, response: ChatResponse) -> None:
+        """
+        Cache a response for a query.
+        
+        Args:
+            embedding: Query embedding
+            params: Search parameters the response was produced with
+            version: Corpus version the response was produced against; a
+                response computed against an older corpus is not cached
+            response: Response to return for similar queries
+        """
+        vector = self._normalize(embedding)
+        
+        with self._lock:
+            if self._version is not None and version < self._version:
+                return
+            self._sync_version(version)
+            
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                for row in list(self._entries):
+                    self._drop_row(row)
+            
+            if not self._free_rows:
+                oldest = next(iter(self._entries))
+                self._drop_row(oldest)
+                self.evictions += 1
+            
+            row = self._free_rows.pop()
+            self._vectors[row] = vector
+            self._valid[row] = True
+            self._entries[row] = (response.model_copy(deep=True), params, time.monotonic() + self.ttl)
+    
+    def get_stats(self) -> dict:
+        """Get size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
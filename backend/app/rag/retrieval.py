@@ -1,16 +1,53 @@
 """RAG query logic and document retrieval."""
 
+import asyncio
+import sys
 import time
-import threading
-from typing import Optional
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional
+
+import numpy as np
 
 from app.config import get_settings
 from app.llm.longcat_client import get_longcat_client
 from app.models import ChatResponse, Source, TokenUsage
+from app.rag.context_builder import ContextBuilder
 from app.rag.history import get_conversation_history
-from app.rag.ingestion import get_document_ingestion
+from app.rag.indexing_worker import get_indexing_worker
+from app.rag.query_cache import LRUCache, normalize_query
+from app.rag.response_cache import SemanticResponseCache
 from app.rag.vectorstore import get_vectorstore_manager
 from app.utils.logger import logger
+from app.utils.metrics import StageTimings, get_metrics
+
+
+def _reciprocal_rank_fusion(
+    rankings: list[tuple[list, float]],
+    rrf_k: int
+) -> list[tuple[object, float]]:
+    """
+    Fuse ranked result lists with weighted reciprocal rank fusion.
+    
+    Each document scores sum(weight / (rrf_k + rank)) over the lists it
+    appears in. Only ranks are used, so BM25 scores and L2 distances don't need
+    to be on a common scale.
+    
+    Args:
+        rankings: (ranked list of (document, raw score), weight) pairs
+        rrf_k: Rank damping constant; larger values flatten the rank curve
+    
+    Returns:
+        List of (document, fused score) tuples, best first
+    """
+    fused: dict[object, list] = {}
+    for results, weight in rankings:
+        for rank, (doc, _) in enumerate(results, 1):
+            key = doc.id or (doc.metadata.get("source"), doc.page_content)
+            entry = fused.setdefault(key, [doc, 0.0])
+            entry[1] += weight / (rrf_k + rank)
+    
+    return sorted(((doc, score) for doc, score in fused.values()), key=lambda item: item[1], reverse=True)
 
 
 class RAGRetrieval:
@@ -20,33 +57,60 @@ class RAGRetrieval:
         self.settings = get_settings()
         self.vectorstore_manager = get_vectorstore_manager()
         self.llm_client = get_longcat_client()
-    
-    def _reindex_history_background(self, history_file_path: str):
-        """
-        Background thread function to re-index the history file incrementally.
+        self.context_builder = ContextBuilder()
         
-        Args:
-            history_file_path: Path to the history.txt file
-        """
-        try:
-            ingestion = get_document_ingestion()
-            ingestion.index_single_file(history_file_path)
-            logger.info("Re-indexed conversation history incrementally")
-        except Exception as e:
-            logger.warning(f"Failed to re-index history file: {str(e)}")
+        # Bounded pool for the CPU-bound parts of async queries (embedding, FAISS
+        # search, context building, history append) so they never run on the
+        # event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.settings.query_executor_workers,
+            thread_name_prefix="rag-query"
+        )
+        
+        self._result_cache: Optional[LRUCache] = None
+        if self.settings.query_cache_enabled:
+            self._result_cache = LRUCache(
+                self.settings.retrieval_cache_max_entries,
+                sizeof=lambda chunks: sum(sys.getsizeof(chunk["content"]) + 256 for chunk in chunks)
+            )
+        
+        self.response_cache: Optional[SemanticResponseCache] = None
+        if self.settings.response_cache_enabled:
+            self.response_cache = SemanticResponseCache(
+                max_entries=self.settings.response_cache_max_entries,
+                ttl_seconds=self.settings.response_cache_ttl_seconds,
+                threshold=self.settings.response_cache_similarity_threshold
+            )
     
-    def retrieve_relevant_chunks(self, query: str, k: Optional[int] = None) -> list[dict]:
+    def retrieve_relevant_chunks(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        embedding: Optional[list[float]] = None,
+        timings: Optional[StageTimings] = None
+    ) -> list[dict]:
         """
         Retrieve the most relevant document chunks for a query.
         
+        With hybrid search enabled, candidates from the vector index and the
+        BM25 keyword index are fused with reciprocal rank fusion, so exact
+        identifiers and rare terms are found even when embeddings miss them.
+        
         Args:
             query: User query string
             k: Number of chunks to retrieve (defaults to settings.similarity_k)
+            nprobe: IVF lists to visit (defaults to settings.faiss_nprobe)
+            ef_search: HNSW search breadth (defaults to settings.faiss_ef_search)
+            embedding: Precomputed query embedding, if the caller already has one
+            timings: Stage timings of the request, to record embed and search in
         
         Returns:
             List of dictionaries containing chunk content and metadata
         """
         k = k or self.settings.similarity_k
+        timings = timings or StageTimings()
         
         vectorstore = self.vectorstore_manager.get_vectorstore()
         
@@ -54,83 +118,469 @@ class RAGRetrieval:
             logger.warning("Vector store is not initialized. No documents indexed.")
             return []
         
-        # Perform similarity search with scores
-        results = vectorstore.similarity_search_with_score(query, k=k)
+        if embedding is None:
+            with timings.stage("embed"), get_indexing_worker().foreground():
+                embedding = self.vectorstore_manager.embed_query(query)
         
-        chunks = []
-        for doc, score in results:
+        # Identical queries against an unchanged index return the cached chunks;
+        # the text is part of the key because the keyword side searches it
+        cache_key = None
+        if self._result_cache is not None:
+            cache_key = (
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                normalize_query(query),
+                k,
+                nprobe,
+                ef_search,
+                self.vectorstore_manager.get_index_version()
+            )
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                return [dict(chunk) for chunk in cached]
+        
+        hybrid = self.settings.hybrid_search_enabled
+        candidates = max(k, self.settings.hybrid_candidates) if hybrid else k
+        
+        # Perform similarity search with scores on the current index snapshot;
+        # background indexing holds back while this runs
+        with timings.stage("search"), get_indexing_worker().foreground():
+            results = self.vectorstore_manager.similarity_search_with_score(
+                query,
+                k=candidates,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                embedding=embedding
+            )
+            keyword_results = self.vectorstore_manager.keyword_search(query, candidates) if hybrid else []
+        
+        if keyword_results:
+            dense_weight = self.settings.hybrid_dense_weight
+            sparse_weight = self.settings.hybrid_sparse_weight
+            rrf_k = self.settings.hybrid_rrf_k
+            fused = _reciprocal_rank_fusion(
+                [(results, dense_weight), (keyword_results, sparse_weight)],
+                rrf_k
+            )
+            # Normalize by the score of a chunk ranked first in both lists
+            best_possible = (dense_weight + sparse_weight) / (rrf_k + 1)
+            scored = [(doc, score / best_possible) for doc, score in fused[:k]]
+        else:
             # FAISS returns L2 distance - lower is better
             # Convert to a similarity score (inverse of distance, normalized)
             # For L2 distance, we use 1/(1+distance+epsilon) for numerical stability
-            similarity = 1 / (1 + score + 1e-8)
-            
+            scored = [(doc, 1 / (1 + score + 1e-8)) for doc, score in results[:k]]
+        
+        chunks = []
+        for doc, similarity in scored:
             chunk_info = {
                 "content": doc.page_content,
                 "source": doc.metadata.get("source", "unknown"),
                 "page": doc.metadata.get("page", None),
+                "start_index": doc.metadata.get("start_index"),
                 "score": similarity
             }
             chunks.append(chunk_info)
         
+        if cache_key is not None:
+            self._result_cache.put(cache_key, [dict(chunk) for chunk in chunks])
+        
         return chunks
     
     def build_context(self, chunks: list[dict]) -> str:
-        """Build context string from retrieved chunks."""
-        context_parts = []
-        for i, chunk in enumerate(chunks, 1):
-            source = chunk.get("source", "unknown")
-            page = chunk.get("page", None)
-            page_info = f" (page {page})" if page is not None else ""
-            
-            context_parts.append(
-                f"[Document {i} - {source}{page_info}]\n{chunk['content']}"
+        """Build context string from retrieved chunks, merged, deduplicated and fitted to the token budget."""
+        return self.context_builder.build(chunks)
+    
+    def query(
+        self,
+        user_input: str,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        include_timings: bool = False
+    ) -> ChatResponse:
+        """
+        Process a user query through the RAG pipeline.
+        
+        Args:
+            user_input: User's question or query
+            nprobe: Optional IVF nprobe override for this query
+            ef_search: Optional HNSW efSearch override for this query
+            include_timings: Attach per-stage timings to the response
+        
+        Returns:
+            ChatResponse containing the answer and metadata
+        """
+        start_time = time.time()
+        timings = StageTimings()
+        
+        # Log query start
+        sampled = logger.log_query_start(user_input)
+        
+        cache_key, cached = self._check_response_cache(user_input, nprobe, ef_search, timings)
+        if cached is not None:
+            response_obj = self._serve_cached(user_input, cached, timings)
+            return self._record_query(response_obj, timings, "chat", include_timings)
+        
+        # Step 1: Retrieve relevant chunks
+        chunks = self.retrieve_relevant_chunks(
+            user_input,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            embedding=cache_key[0] if cache_key else None,
+            timings=timings
+        )
+        
+        # Log retrieval process
+        logger.log_retrieval_process(
+            k=self.settings.similarity_k,
+            chunks_retrieved=len(chunks),
+            results=chunks,
+            sampled=sampled
+        )
+        
+        # Step 2: Build context
+        with timings.stage("context"):
+            context = self.build_context(chunks)
+        
+        # Step 3: Build prompt
+        system_prompt = self.settings.system_prompt
+        
+        # Log the prompt
+        logger.log_prompt(system_prompt, context, user_input, sampled=sampled)
+        
+        # Step 4: Get LLM response
+        with timings.stage("llm"):
+            llm_response = self.llm_client.generate_response(
+                system_prompt=system_prompt,
+                context=context,
+                user_question=user_input
             )
         
-        return "\n\n".join(context_parts)
+        response_obj = self._finalize_response(
+            user_input,
+            chunks,
+            llm_response,
+            time.time() - start_time,
+            cache_key,
+            timings,
+            sampled
+        )
+        return self._record_query(response_obj, timings, "chat", include_timings)
     
-    def query(self, user_input: str) -> ChatResponse:
+    async def aquery(
+        self,
+        user_input: str,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        include_timings: bool = False
+    ) -> ChatResponse:
         """
-        Process a user query through the RAG pipeline.
+        Process a user query through the RAG pipeline without blocking the event loop.
+        
+        Embedding and FAISS search run in the bounded query executor and the LLM
+        call goes through the async client, so concurrent chats overlap their
+        network wait instead of queueing behind each other.
         
         Args:
             user_input: User's question or query
+            nprobe: Optional IVF nprobe override for this query
+            ef_search: Optional HNSW efSearch override for this query
+            include_timings: Attach per-stage timings to the response
         
         Returns:
             ChatResponse containing the answer and metadata
         """
+        loop = asyncio.get_running_loop()
         start_time = time.time()
+        timings = StageTimings()
         
         # Log query start
-        logger.log_query_start(user_input)
+        sampled = logger.log_query_start(user_input)
+        
+        cache_key, cached = await loop.run_in_executor(
+            self._executor,
+            self._check_response_cache,
+            user_input,
+            nprobe,
+            ef_search,
+            timings
+        )
+        if cached is not None:
+            response_obj = await loop.run_in_executor(self._executor, self._serve_cached, user_input, cached, timings)
+            return self._record_query(response_obj, timings, "chat", include_timings)
         
         # Step 1: Retrieve relevant chunks
-        chunks = self.retrieve_relevant_chunks(user_input)
+        chunks = await loop.run_in_executor(
+            self._executor,
+            partial(
+                self.retrieve_relevant_chunks,
+                user_input,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                embedding=cache_key[0] if cache_key else None,
+                timings=timings
+            )
+        )
         
         # Log retrieval process
         logger.log_retrieval_process(
             k=self.settings.similarity_k,
             chunks_retrieved=len(chunks),
-            results=chunks
+            results=chunks,
+            sampled=sampled
         )
         
         # Step 2: Build context
-        context = self.build_context(chunks)
+        with timings.stage("context"):
+            context = await loop.run_in_executor(self._executor, self.build_context, chunks)
         
         # Step 3: Build prompt
         system_prompt = self.settings.system_prompt
         
         # Log the prompt
-        logger.log_prompt(system_prompt, context, user_input)
+        logger.log_prompt(system_prompt, context, user_input, sampled=sampled)
         
         # Step 4: Get LLM response
-        llm_response = self.llm_client.generate_response(
+        with timings.stage("llm"):
+            llm_response = await self.llm_client.agenerate_response(
+                system_prompt=system_prompt,
+                context=context,
+                user_question=user_input
+            )
+        
+        response_obj = await loop.run_in_executor(
+            self._executor,
+            self._finalize_response,
+            user_input,
+            chunks,
+            llm_response,
+            time.time() - start_time,
+            cache_key,
+            timings,
+            sampled
+        )
+        return self._record_query(response_obj, timings, "chat", include_timings)
+    
+    async def astream_query(
+        self,
+        user_input: str,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        include_timings: bool = False
+    ) -> AsyncIterator[dict]:
+        """
+        Process a user query through the RAG pipeline, streaming the answer.
+        
+        Sources are emitted before the LLM is called. Token usage logging, the
+        history append and history indexing happen once the stream has finished;
+        a stream abandoned by the client is not recorded in the history.
+        
+        Args:
+            user_input: User's question or query
+            nprobe: Optional IVF nprobe override for this query
+            ef_search: Optional HNSW efSearch override for this query
+            include_timings: Attach per-stage timings to the final response
+        
+        Yields:
+            Events as {"event": name, "data": dict}: one "sources" event, a
+            "token" event per content delta and a final "done" event carrying
+            the complete ChatResponse
+        """
+        loop = asyncio.get_running_loop()
+        start_time = time.time()
+        timings = StageTimings()
+        
+        # Log query start
+        sampled = logger.log_query_start(user_input)
+        
+        cache_key, cached = await loop.run_in_executor(
+            self._executor,
+            self._check_response_cache,
+            user_input,
+            nprobe,
+            ef_search,
+            timings
+        )
+        if cached is not None:
+            response_obj = await loop.run_in_executor(self._executor, self._serve_cached, user_input, cached, timings)
+            response_obj = self._record_query(response_obj, timings, "stream", include_timings)
+            yield {
+                "event": "sources",
+                "data": {"sources": [source.model_dump() for source in response_obj.sources]}
+            }
+            yield {"event": "token", "data": {"content": response_obj.response}}
+            yield {"event": "done", "data": response_obj.model_dump()}
+            return
+        
+        # Step 1: Retrieve relevant chunks
+        chunks = await loop.run_in_executor(
+            self._executor,
+            partial(
+                self.retrieve_relevant_chunks,
+                user_input,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                embedding=cache_key[0] if cache_key else None,
+                timings=timings
+            )
+        )
+        
+        # Log retrieval process
+        logger.log_retrieval_process(
+            k=self.settings.similarity_k,
+            chunks_retrieved=len(chunks),
+            results=chunks,
+            sampled=sampled
+        )
+        
+        yield {
+            "event": "sources",
+            "data": {"sources": [self._to_source(chunk).model_dump() for chunk in chunks]}
+        }
+        
+        # Step 2: Build context
+        with timings.stage("context"):
+            context = await loop.run_in_executor(self._executor, self.build_context, chunks)
+        
+        # Step 3: Build prompt
+        system_prompt = self.settings.system_prompt
+        
+        # Log the prompt
+        logger.log_prompt(system_prompt, context, user_input, sampled=sampled)
+        
+        # Step 4: Stream LLM response
+        content_parts = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        llm_started = time.perf_counter()
+        
+        async for item in self.llm_client.astream_response(
             system_prompt=system_prompt,
             context=context,
             user_question=user_input
+        ):
+            if item["type"] == "token":
+                if not content_parts:
+                    timings.record("llm_first_token", time.perf_counter() - llm_started)
+                content_parts.append(item["content"])
+                yield {"event": "token", "data": {"content": item["content"]}}
+            elif item["type"] == "usage":
+                usage = item["usage"]
+        
+        timings.record("llm", time.perf_counter() - llm_started)
+        llm_response = {"content": "".join(content_parts), "usage": usage}
+        
+        response_obj = await loop.run_in_executor(
+            self._executor,
+            self._finalize_response,
+            user_input,
+            chunks,
+            llm_response,
+            time.time() - start_time,
+            cache_key,
+            timings,
+            sampled
         )
+        response_obj = self._record_query(response_obj, timings, "stream", include_timings)
+        
+        yield {"event": "done", "data": response_obj.model_dump()}
+    
+    def _check_response_cache(
+        self,
+        user_input: str,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        timings: StageTimings
+    ) -> tuple[Optional[tuple], Optional[ChatResponse]]:
+        """
+        Embed the query and look for a cached answer to a similar query.
+        
+        Returns:
+            Tuple of (cache key to store the new response under, or None if the
+            cache is disabled; cached response, or None on a miss)
+        """
+        if self.response_cache is None:
+            return None, None
+        
+        with timings.stage("embed"):
+            embedding = self.vectorstore_manager.embed_query(user_input)
+        cache_key = (embedding, (nprobe, ef_search), self.vectorstore_manager.get_corpus_version())
+        with timings.stage("response_cache"):
+            cached = self.response_cache.lookup(*cache_key)
+        return cache_key, cached
+    
+    def _serve_cached(self, user_input: str, response_obj: ChatResponse, timings: StageTimings) -> ChatResponse:
+        """Record a conversation answered from the response cache and mark the response as cached."""
+        logger.info("Response cache hit, skipping retrieval and LLM call")
         
-        response_time = time.time() - start_time
+        with timings.stage("history"):
+            conversation_history = get_conversation_history()
+            conversation_history.append_conversation(user_input, response_obj.response)
+        self._schedule_history_reindex()
         
+        response_obj.cached = True
+        return response_obj
+    
+    def _record_query(
+        self,
+        response_obj: ChatResponse,
+        timings: StageTimings,
+        mode: str,
+        include_timings: bool
+    ) -> ChatResponse:
+        """Count the answered query, record its total time and attach the stage timings if requested."""
+        timings.finish()
+        get_metrics().queries.inc(mode=mode, cached=str(response_obj.cached).lower())
+        if include_timings:
+            response_obj.timings = timings.to_dict()
+        return response_obj
+    
+    def get_query_cache_stats(self) -> Optional[dict]:
+        """Get exact-match embedding and retrieval result cache statistics, or None if disabled."""
+        if self._result_cache is None:
+            return None
+        return {
+            "embeddings": self.vectorstore_manager.get_query_embedding_cache_stats(),
+            "results": self._result_cache.get_stats()
+        }
+    
+    def get_response_cache_stats(self) -> Optional[dict]:
+        """Get response cache statistics, or None if the cache is disabled."""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get_stats()
+    
+    def _to_source(self, chunk: dict) -> Source:
+        """Convert a retrieved chunk to its API source representation."""
+        return Source(
+            source=chunk["source"],
+            page=chunk.get("page"),
+            score=chunk["score"]
+        )
+    
+    def _finalize_response(
+        self,
+        user_input: str,
+        chunks: list[dict],
+        llm_response: dict,
+        response_time: float,
+        cache_key: Optional[tuple] = None,
+        timings: Optional[StageTimings] = None,
+        sampled: bool = True
+    ) -> ChatResponse:
+        """
+        Log the LLM response, record the conversation and build the API response.
+        
+        Args:
+            user_input: User's question or query
+            chunks: Retrieved chunks used as context
+            llm_response: Content and usage returned by the LLM client
+            response_time: Seconds spent answering the query
+            cache_key: Response cache key from _check_response_cache, if caching
+            timings: Stage timings of the request, to record the history append in
+            sampled: Whether this query's detail logs are emitted (see log_query_start)
+        
+        Returns:
+            ChatResponse containing the answer and metadata
+        """
         # Log the response
         logger.log_response(
             response=llm_response["content"],
@@ -140,22 +590,22 @@ class RAGRetrieval:
             model=self.settings.llm_model,
             temperature=self.settings.llm_temperature,
             max_tokens=self.settings.llm_max_tokens,
-            response_time=response_time
+            response_time=response_time,
+            sampled=sampled
         )
         
+        usage = llm_response["usage"]
+        metrics = get_metrics()
+        metrics.tokens.inc(usage["prompt_tokens"], kind="prompt")
+        metrics.tokens.inc(usage["completion_tokens"], kind="completion")
+        
         # Step 5: Append conversation to history file
-        conversation_history = get_conversation_history()
-        conversation_history.append_conversation(user_input, llm_response["content"])
+        with (timings or StageTimings()).stage("history"):
+            conversation_history = get_conversation_history()
+            conversation_history.append_conversation(user_input, llm_response["content"])
         
         # Build response
-        sources = [
-            Source(
-                source=chunk["source"],
-                page=chunk.get("page"),
-                score=chunk["score"]
-            )
-            for chunk in chunks
-        ]
+        sources = [self._to_source(chunk) for chunk in chunks]
         
         tokens = TokenUsage(
             prompt=llm_response["usage"]["prompt_tokens"],
@@ -169,30 +619,24 @@ class RAGRetrieval:
             tokens=tokens
         )
         
-        # Step 6: Trigger background re-indexing of history file only
-        # NOTE: Re-indexing is now done asynchronously after returning the response
-        # to avoid blocking the API response. Only the history.txt file is re-indexed
-        # incrementally for better performance.
-        #
-        # Using daemon thread: The thread will terminate when the main program exits.
-        # This is acceptable because:
-        # - History updates are not critical (next conversation will re-index)
-        # - Non-daemon threads would delay application shutdown
-        # - User experience (immediate response) is prioritized over ensuring
-        #   every history update completes before shutdown
+        if cache_key is not None:
+            self.response_cache.store(*cache_key, response_obj)
+        
+        self._schedule_history_reindex()
+        
+        return response_obj
+    
+    def _schedule_history_reindex(self) -> None:
+        """Queue indexing of the conversation just appended to history.txt."""
+        # Step 6: Trigger background indexing of the new history entries only
+        # NOTE: Indexing happens on the single background indexing worker after
+        # the response is returned. Requests from a burst of chats are coalesced
+        # into one batch, and only the bytes appended to history.txt since the
+        # last run are chunked and embedded.
         try:
-            history_file_path = conversation_history.history_file
-            # Start background thread for re-indexing
-            thread = threading.Thread(
-                target=self._reindex_history_background,
-                args=(str(history_file_path),),
-                daemon=True
-            )
-            thread.start()
+            get_indexing_worker().submit_history()
         except Exception as e:
             logger.warning(f"Failed to schedule background re-indexing: {str(e)}")
-        
-        return response_obj
 
 
 # Singleton instance
@@ -1,25 +1,103 @@
 """FAISS vector store initialization and management."""
 
+import json
 import os
 import shutil
-from typing import Optional
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, Optional
 
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 
 from app.config import get_settings
+from app.rag.bm25 import BM25Index
+from app.rag.chunk_store import ChunkStore, has_chunk_store, remove_stale_spill_files
+from app.rag.embedding_batcher import QueryEmbeddingBatcher
+from app.rag.embedding_cache import CachedEmbeddings, EmbeddingCache, get_cache_namespace
+from app.rag.query_cache import LRUCache, normalize_query
+from app.rag.index_factory import (
+    TrainingSample,
+    create_index,
+    load_index_config,
+    make_search_params,
+    requires_training,
+    resolve_index_config,
+    save_index_config,
+    supports_removal,
+)
+from app.rag.registry import SourceRegistry
 from app.utils.logger import logger
+from app.utils.rwlock import ReadWriteLock
+
+
+# Byte offset into history.txt up to which conversations are already indexed,
+# saved together with the index so the two can never disagree
+HISTORY_CURSOR_FILE = "history_cursor.json"
 
 
 class VectorStoreManager:
-    """Manages the FAISS vector store for document embeddings."""
+    """
+    Manages the FAISS vector store for document embeddings.
+    
+    Concurrency model: searches hold the read side of a readers-writer lock and
+    only exclude the short in-place add/delete steps. Writers are serialized by
+    a separate mutation lock, do their slow work (loading, embedding) outside
+    the readers-writer lock, and full rebuilds are built off to the side and
+    swapped in atomically. Saves go to a temp directory that replaces the index
+    directory by rename, so readers never see a half-written index on disk.
+    
+    Indexes carry an index config and address vectors by explicit int64 IDs,
+    which keeps IDs stable across removals for every index type. Chunk texts
+    live in a ChunkStore addressed by the same IDs. Indexes saved with a
+    pickled docstore (including legacy positional flat indexes without a
+    config) are converted once when loaded.
+    
+    When hybrid search is enabled, a BM25 keyword index over the same chunks
+    is maintained next to the FAISS index under the same locks and saved with it.
+    """
     
     _instance: Optional["VectorStoreManager"] = None
     
     def __init__(self):
         self.settings = get_settings()
-        self._embeddings: Optional[HuggingFaceEmbeddings] = None
+        self._embeddings: Optional[Embeddings] = None
+        self._embedding_cache: Optional[EmbeddingCache] = None
+        self._query_batcher: Optional[QueryEmbeddingBatcher] = None
         self._vectorstore: Optional[FAISS] = None
+        self._registry: Optional[SourceRegistry] = None
+        self._history_offset: Optional[int] = None
+        self._index_config: Optional[dict] = None
+        self._keyword_index: Optional[BM25Index] = None
+        
+        # True while the FAISS index and chunk store are memory-mapped views
+        # of the files on disk (read-only until the first update)
+        self._mapped = False
+        
+        # Bumped whenever document content changes; the conversation history
+        # growing does not count (see mark_corpus_changed)
+        self._corpus_version = 0
+        
+        # Bumped on every change to the searchable content, history included
+        self._index_version = 0
+        
+        self._query_embedding_cache: Optional[LRUCache] = None
+        if self.settings.query_cache_enabled:
+            self._query_embedding_cache = LRUCache(
+                self.settings.query_cache_max_entries,
+                sizeof=lambda vector: vector.nbytes
+            )
+        
+        self._embeddings_lock = threading.Lock()
+        self._index_lock = ReadWriteLock()
+        self._mutation_lock = threading.RLock()
     
     @classmethod
     def get_instance(cls) -> "VectorStoreManager":
@@ -28,25 +106,537 @@ class VectorStoreManager:
             cls._instance = cls()
         return cls._instance
     
-    def _get_embeddings(self) -> HuggingFaceEmbeddings:
-        """Get or create HuggingFace embeddings instance."""
-        if self._embeddings is None:
-            # Using all-MiniLM-L6-v2 - a lightweight, fast, and free model
+    def _get_embeddings(self) -> Embeddings:
+        """Get or create HuggingFace embeddings instance, wrapped in the embedding cache."""
+        if self._embeddings is not None:
+            return self._embeddings
+        
+        # Startup warmup and the first requests may race to load the model
+        with self._embeddings_lock:
+            if self._embeddings is not None:
+                return self._embeddings
+            
+            # Default all-MiniLM-L6-v2 - a lightweight, fast, and free model
             # 384 dimensions, good quality for semantic search
-            self._embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
+            embeddings = HuggingFaceEmbeddings(
+                model_name=self.settings.embedding_model,
                 model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
+                encode_kwargs={'normalize_embeddings': self.settings.embedding_normalize}
             )
+            
+            if self.settings.embedding_cache_enabled:
+                # Identical chunk text is then only encoded once across reindexes and restarts
+                namespace = get_cache_namespace(self.settings.embedding_model, self.settings.embedding_normalize)
+                self._embedding_cache = EmbeddingCache(
+                    str(Path(self.settings.embedding_cache_path) / namespace),
+                    self.settings.embedding_cache_max_entries
+                )
+                embeddings = CachedEmbeddings(embeddings, self._embedding_cache)
+            
+            self._embeddings = embeddings
         return self._embeddings
     
-    def get_embeddings(self) -> HuggingFaceEmbeddings:
+    def get_embedding_cache_stats(self) -> Optional[dict]:
+        """Get embedding cache statistics, or None if the cache is disabled or not loaded yet."""
+        if self._embedding_cache is None:
+            return None
+        return self._embedding_cache.get_stats()
+    
+    def get_embeddings(self) -> Embeddings:
         """Get the embeddings function for public access."""
         return self._get_embeddings()
     
-    def set_vectorstore(self, vectorstore: FAISS) -> None:
-        """Set the cached vectorstore instance."""
-        self._vectorstore = vectorstore
+    def _get_model(self) -> Embeddings:
+        """Get the embedding model itself, without the persistent embedding cache."""
+        embeddings = self._get_embeddings()
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings = embeddings.embeddings
+        return embeddings
+    
+    def get_tokenizer(self) -> Optional[Any]:
+        """Get the embedding model's Hugging Face tokenizer, or None if it doesn't expose one."""
+        return getattr(getattr(self._get_model(), "client", None), "tokenizer", None)
+    
+    def embed_query(self, query: str) -> list[float]:
+        """
+        Embed a search query.
+        
+        With query batching enabled, concurrent queries are micro-batched into a
+        single forward pass of the embedding model. Repeated query strings are
+        served from an exact-match LRU cache of embeddings. Queries bypass the
+        persistent embedding cache: it is shared with other processes through a
+        file lock and bounded, and is meant for chunk texts that get re-embedded
+        on reindex, not for one-off queries.
+        """
+        cache = self._query_embedding_cache
+        if cache is not None:
+            key = normalize_query(query)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached.tolist()
+        
+        if not self.settings.query_batch_enabled:
+            embedding = self._get_model().embed_query(query)
+        else:
+            if self._query_batcher is None:
+                self._query_batcher = QueryEmbeddingBatcher(
+                    self._get_model(),
+                    max_batch_size=self.settings.query_batch_max_size,
+                    max_wait_ms=self.settings.query_batch_wait_ms
+                )
+            embedding = self._query_batcher.embed(query)
+        
+        if cache is not None:
+            cache.put(key, np.asarray(embedding, dtype=np.float32))
+        return embedding
+    
+    def get_query_embedding_cache_stats(self) -> Optional[dict]:
+        """Get query embedding cache statistics, or None if the cache is disabled."""
+        if self._query_embedding_cache is None:
+            return None
+        return self._query_embedding_cache.get_stats()
+    
+    def get_query_batcher_stats(self) -> Optional[dict]:
+        """Get query batching statistics, or None if batching hasn't been used."""
+        if self._query_batcher is None:
+            return None
+        return self._query_batcher.get_stats()
+    
+    def get_registry(self) -> SourceRegistry:
+        """Get the source registry persisted alongside the index."""
+        self.get_vectorstore()
+        if self._registry is None:
+            self._registry = SourceRegistry(self.settings.faiss_index_path)
+        return self._registry
+    
+    def get_history_offset(self) -> Optional[int]:
+        """Get the history byte offset covered by the index, or None if unknown."""
+        self.get_vectorstore()
+        return self._history_offset
+    
+    def set_history_offset(self, offset: int) -> None:
+        """Record the history byte offset covered by the index; persisted on the next save."""
+        self._history_offset = offset
+    
+    def get_corpus_version(self) -> int:
+        """Get the counter identifying the current document content of the index."""
+        return self._corpus_version
+    
+    def get_index_version(self) -> int:
+        """Get the counter bumped by every change to the searchable content of the index."""
+        return self._index_version
+    
+    def mark_corpus_changed(self) -> None:
+        """
+        Record that indexed document content changed.
+        
+        Called for data file changes only: appended conversation history adds
+        chunks but doesn't change what earlier answers were based on, so
+        responses cached against the documents stay valid.
+        """
+        self._corpus_version += 1
+    
+    @contextmanager
+    def mutation(self) -> Iterator[None]:
+        """
+        Serialize a multi-step index update against other writers.
+        
+        Searches are not blocked; they only wait for the individual in-place
+        add/delete steps.
+        """
+        with self._mutation_lock:
+            yield
+    
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        embedding: Optional[list[float]] = None
+    ) -> list[tuple[Document, float]]:
+        """
+        Search the current index snapshot.
+        
+        The query is embedded before taking the read lock so writers are only
+        held back for the FAISS search itself.
+        
+        Args:
+            query: Query text
+            k: Number of chunks to return
+            nprobe: IVF lists to visit (defaults to settings.faiss_nprobe)
+            ef_search: HNSW candidate list size (defaults to settings.faiss_ef_search)
+            embedding: Precomputed query embedding, embedded from query if omitted
+        
+        Returns:
+            List of (document, L2 distance) tuples, empty if no index exists
+        """
+        vectorstore = self.get_vectorstore()
+        if vectorstore is None:
+            return []
+        
+        if embedding is None:
+            embedding = self.embed_query(query)
+        
+        with self._index_lock.read_lock():
+            # Re-read the reference: a full rebuild may have been swapped in meanwhile
+            vectorstore = self._vectorstore or vectorstore
+            index = vectorstore.index
+            params = make_search_params(
+                index,
+                nprobe=nprobe or self.settings.faiss_nprobe,
+                ef_search=ef_search or self.settings.faiss_ef_search
+            )
+            
+            # HNSW keeps removed vectors as unmapped tombstones; fetch enough
+            # extra candidates that k live chunks can still be returned
+            tombstones = max(index.ntotal - len(vectorstore.index_to_docstore_id), 0)
+            fetch_k = min(k + tombstones, index.ntotal)
+            if fetch_k == 0:
+                return []
+            
+            query_vector = np.asarray([embedding], dtype=np.float32)
+            distances, labels = index.search(query_vector, fetch_k, params=params)
+            
+            results = []
+            for distance, label in zip(distances[0], labels[0]):
+                doc = vectorstore.docstore.get(int(label))
+                if doc is not None:
+                    results.append((doc, float(distance)))
+                if len(results) == k:
+                    break
+            return results
+    
+    def keyword_search(self, query: str, k: int) -> list[tuple[Document, float]]:
+        """
+        Search the BM25 keyword index of the current snapshot.
+        
+        Returns:
+            List of (document, BM25 score) tuples, empty if hybrid search is
+            disabled or no index exists
+        """
+        if self.get_vectorstore() is None:
+            return []
+        
+        with self._index_lock.read_lock():
+            vectorstore = self._vectorstore
+            keyword_index = self._keyword_index
+            if vectorstore is None or keyword_index is None:
+                return []
+            
+            results = []
+            for doc_id, score in keyword_index.search(query, k):
+                doc = vectorstore.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    results.append((doc, score))
+            return results
+    
+    def _new_keyword_index(self) -> Optional[BM25Index]:
+        """Create an empty keyword index if hybrid search is enabled."""
+        if not self.settings.hybrid_search_enabled:
+            return None
+        return BM25Index(k1=self.settings.bm25_k1, b=self.settings.bm25_b)
+    
+    def add_documents(self, documents: list[Document], ids: list[str]) -> None:
+        """
+        Embed documents and add them to the current index in place.
+        
+        Must be called inside mutation(). Embedding happens before the write
+        lock is taken, so searches keep running while the model encodes.
+        """
+        vectorstore = self.get_vectorstore()
+        if vectorstore is None:
+            raise RuntimeError("No index exists yet")
+        
+        texts = [doc.page_content for doc in documents]
+        vectors = self._get_embeddings().embed_documents(texts)
+        
+        with self._index_lock.write_lock():
+            self._index_version += 1
+            if self._keyword_index is not None:
+                self._keyword_index.add(ids, texts)
+            
+            # Explicit-ID index: new vectors get fresh IDs that are never reused,
+            # not even those of HNSW tombstones
+            self._make_writable(vectorstore)
+            next_id = self._index_config.get("next_id", 0)
+            labels = np.arange(next_id, next_id + len(ids), dtype=np.int64)
+            vectorstore.index.add_with_ids(np.asarray(vectors, dtype=np.float32), labels)
+            vectorstore.docstore.add(labels.tolist(), ids, documents)
+            self._index_config["next_id"] = next_id + len(ids)
+    
+    def delete_documents(self, ids: list[str]) -> int:
+        """
+        Remove chunks from the current index by docstore ID.
+        
+        Must be called inside mutation(). IDs that are no longer present in the
+        index are skipped instead of failing the whole delete.
+        
+        Returns:
+            Number of chunks removed
+        """
+        vectorstore = self.get_vectorstore()
+        if vectorstore is None:
+            return 0
+        
+        with self._index_lock.write_lock():
+            store = vectorstore.docstore
+            to_delete = [doc_id for doc_id in ids if store.label_of(doc_id) is not None]
+            if to_delete:
+                self._index_version += 1
+            
+            if self._keyword_index is not None:
+                self._keyword_index.remove(to_delete)
+            
+            if to_delete:
+                self._make_writable(vectorstore)
+                self._delete_by_label(vectorstore, [store.label_of(doc_id) for doc_id in to_delete])
+        
+        return len(to_delete)
+    
+    def _make_writable(self, vectorstore: FAISS) -> None:
+        """
+        Copy a memory-mapped FAISS index into process memory before its first update.
+        
+        Mapped FAISS storage can't grow or shrink, and the mapped file is
+        shared with other processes, so updates work on a private copy from
+        here on; caller holds the write lock. The chunk store needs no copy:
+        it buffers changes until the next save.
+        """
+        if not self._mapped:
+            return
+        
+        logger.info("Copying memory-mapped index into memory for update")
+        vectorstore.index = faiss.deserialize_index(faiss.serialize_index(vectorstore.index))
+        self._mapped = False
+    
+    def _delete_by_label(self, vectorstore: FAISS, labels: list[int]) -> None:
+        """
+        Remove chunks from an explicit-ID index; caller holds the write lock.
+        
+        Index types that can't remove vectors (HNSW) keep them as tombstones:
+        only the chunk store entry is dropped, and searches skip the orphaned
+        labels. A full reindex reclaims the space.
+        """
+        if supports_removal(vectorstore.index):
+            vectorstore.index.remove_ids(np.asarray(labels, dtype=np.int64))
+        
+        vectorstore.docstore.delete_labels(labels)
+    
+    def build_vectorstore(
+        self,
+        batches: Iterable[tuple[list[Document], list[str]]],
+        on_batch: Optional[Callable[[int], None]] = None
+    ) -> Optional[tuple[FAISS, dict, Optional[BM25Index]]]:
+        """
+        Build a new index of the configured type from a stream of chunk batches.
+        
+        Each batch is embedded and added before the next one is pulled, and
+        its chunk records are written to the chunk store's spill file, so
+        only the index itself and per-chunk table rows grow in memory with
+        the corpus. Trainable index types (IVF, PQ) are trained once the
+        stream ends, on a uniform sample of all its vectors, which are
+        buffered in a temp file until then.
+        
+        Args:
+            batches: Iterable of (chunks, docstore IDs) batches
+            on_batch: Called with the number of vectors added after each batch
+        
+        Returns:
+            Tuple of (vectorstore, index config, keyword index or None) for
+            replace_vectorstore, or None if the stream contained no chunks
+        """
+        embeddings = self._get_embeddings()
+        train_sample = self.settings.faiss_train_sample
+        
+        index = None
+        config: Optional[dict] = None
+        store = ChunkStore(use_mmap=self.settings.index_mmap, spill_prefix=self.settings.faiss_index_path)
+        keyword_index = self._new_keyword_index()
+        next_id = 0
+        
+        sample, buffered = None, None
+        if requires_training(self.settings):
+            sample = TrainingSample(train_sample)
+            index_dir = Path(self.settings.faiss_index_path).parent
+            index_dir.mkdir(parents=True, exist_ok=True)
+            buffered = tempfile.TemporaryFile(dir=index_dir)
+        
+        try:
+            for documents, ids in batches:
+                if not documents:
+                    continue
+                
+                vectors = np.asarray(
+                    embeddings.embed_documents([doc.page_content for doc in documents]),
+                    dtype=np.float32
+                )
+                labels = np.arange(next_id, next_id + len(ids), dtype=np.int64)
+                next_id += len(ids)
+                
+                store.add(labels.tolist(), ids, documents)
+                if keyword_index is not None:
+                    keyword_index.add(ids, [doc.page_content for doc in documents])
+                
+                if sample is not None:
+                    sample.add(vectors)
+                    vectors.tofile(buffered)
+                else:
+                    if index is None:
+                        config = resolve_index_config(self.settings, len(vectors), vectors.shape[1])
+                        index = create_index(config, vectors, train_sample)
+                    index.add_with_ids(vectors, labels)
+                
+                if on_batch is not None:
+                    on_batch(len(ids))
+            
+            if sample is not None and next_id:
+                index, config = self._train_index(sample, buffered, next_id)
+        finally:
+            if buffered is not None:
+                buffered.close()
+        
+        if index is None:
+            return None
+        
+        config["next_id"] = next_id
+        vectorstore = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=store,
+            index_to_docstore_id=store.label_map()
+        )
+        
+        logger.info(f"Built {config['description']} index with {next_id} vectors")
+        return vectorstore, config, keyword_index
+    
+    def _train_index(self, sample: TrainingSample, buffered: BinaryIO, count: int) -> tuple[faiss.Index, dict]:
+        """
+        Create and train the index for the streamed corpus and add the buffered vectors.
+        
+        Args:
+            sample: Uniform sample of the streamed vectors
+            buffered: File holding all `count` vectors in label order
+            count: Number of vectors streamed
+        """
+        dim = sample.vectors.shape[1]
+        config = resolve_index_config(self.settings, count, dim)
+        index = create_index(config, sample.vectors, self.settings.faiss_train_sample)
+        
+        buffered.seek(0)
+        batch_size = max(1, self.settings.ingestion_batch_size)
+        for start in range(0, count, batch_size):
+            rows = min(batch_size, count - start)
+            vectors = np.fromfile(buffered, dtype=np.float32, count=rows * dim).reshape(rows, dim)
+            index.add_with_ids(vectors, np.arange(start, start + rows, dtype=np.int64))
+        return index, config
+    
+    def replace_vectorstore(
+        self,
+        vectorstore: FAISS,
+        registry: SourceRegistry,
+        history_offset: int,
+        index_config: Optional[dict] = None,
+        keyword_index: Optional[BM25Index] = None
+    ) -> None:
+        """
+        Atomically swap in a freshly built index and persist it.
+        
+        Searches in flight finish on the previous snapshot; new searches see the
+        new one as soon as the reference is swapped.
+        """
+        with self._mutation_lock:
+            with self._index_lock.write_lock():
+                self._vectorstore = vectorstore
+                self._registry = registry
+                self._history_offset = history_offset
+                self._index_config = index_config
+                self._keyword_index = keyword_index
+                self._mapped = False
+                self._index_version += 1
+            self.mark_corpus_changed()
+            self.save()
+    
+    def save(self) -> None:
+        """
+        Save the current index with its registry and history cursor.
+        
+        Everything is written to a temp directory first, which then replaces the
+        index directory by rename, so a crash or a concurrent load never sees a
+        partially written index.
+        """
+        with self._mutation_lock:
+            vectorstore = self._vectorstore
+            if vectorstore is None:
+                return
+            
+            index_path = Path(self.settings.faiss_index_path)
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = index_path.with_name(f"{index_path.name}.tmp-{uuid.uuid4().hex[:8]}")
+            old_path = index_path.with_name(f"{index_path.name}.old-{uuid.uuid4().hex[:8]}")
+            
+            try:
+                # Writing the files only reads the in-memory index and chunk
+                # store, which in-place writers can't change while the
+                # mutation lock is held, so searches keep running meanwhile
+                tmp_path.mkdir()
+                faiss.write_index(vectorstore.index, str(tmp_path / "index.faiss"))
+                # Links the previous chunk files and appends only the changes;
+                # the keyword index below does the same with its postings
+                vectorstore.docstore.save(str(tmp_path))
+                self.get_registry().save(str(tmp_path))
+                with open(tmp_path / HISTORY_CURSOR_FILE, "w", encoding="utf-8") as f:
+                    json.dump({"offset": self._history_offset or 0}, f)
+                save_index_config(str(tmp_path), self._index_config)
+                if self._keyword_index is not None:
+                    self._keyword_index.save(str(tmp_path))
+                
+                if index_path.exists():
+                    os.rename(index_path, old_path)
+                os.rename(tmp_path, index_path)
+            except Exception:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                if old_path.exists() and not index_path.exists():
+                    os.rename(old_path, index_path)
+                raise
+            
+            # Switching the chunk store over to the saved files replaces the
+            # table and data that searches read, so it excludes them
+            with self._index_lock.write_lock():
+                vectorstore.docstore.saved(str(index_path))
+            if self._keyword_index is not None:
+                self._keyword_index.saved(str(index_path))
+            shutil.rmtree(old_path, ignore_errors=True)
+    
+    def _recover_index_dir(self) -> None:
+        """Restore the previous index directory if a save was interrupted mid-swap."""
+        index_path = Path(self.settings.faiss_index_path)
+        if index_path.exists():
+            return
+        
+        candidates = sorted(
+            index_path.parent.glob(f"{index_path.name}.old-*"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        for candidate in candidates:
+            if (candidate / "index.faiss").exists():
+                os.rename(candidate, index_path)
+                logger.warning(f"Recovered FAISS index from interrupted save: {candidate}")
+                return
+    
+    def _load_history_offset(self) -> Optional[int]:
+        """Read the persisted history cursor of the index on disk."""
+        cursor_file = Path(self.settings.faiss_index_path) / HISTORY_CURSOR_FILE
+        if not cursor_file.exists():
+            return None
+        
+        try:
+            with open(cursor_file, "r", encoding="utf-8") as f:
+                return int(json.load(f).get("offset", 0))
+        except Exception as e:
+            logger.warning(f"Failed to read history cursor: {str(e)}")
+            return None
     
     def get_vectorstore(self) -> Optional[FAISS]:
         """
@@ -55,41 +645,169 @@ class VectorStoreManager:
         Returns:
             FAISS vectorstore if it exists, None if no index has been created yet.
         """
-        if self._vectorstore is None:
-            embeddings = self._get_embeddings()
-            index_path = self.settings.faiss_index_path
-            
-            # Try to load existing index
-            if os.path.exists(index_path) and os.path.exists(os.path.join(index_path, "index.faiss")):
-                try:
-                    self._vectorstore = FAISS.load_local(
-                        index_path,
-                        embeddings,
-                        allow_dangerous_deserialization=True
-                    )
-                    logger.info(f"Loaded existing FAISS index from {index_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to load existing index: {e}. Creating new index.")
-                    self._vectorstore = None
-            
-            # If no existing index or loading failed, vectorstore remains None
-            # It will be created during document indexing
+        # Never block on a writer here: while a long index build holds the
+        # mutation lock, searches simply see no index (or the previous one)
+        if self._vectorstore is None and self._mutation_lock.acquire(blocking=False):
+            try:
+                if self._vectorstore is None:
+                    self._load_vectorstore()
+            finally:
+                self._mutation_lock.release()
         
         return self._vectorstore
     
+    def _load_vectorstore(self) -> None:
+        """Load the index, registry and history cursor from disk."""
+        embeddings = self._get_embeddings()
+        index_path = self.settings.faiss_index_path
+        self._recover_index_dir()
+        remove_stale_spill_files(index_path)
+        
+        # Try to load existing index
+        if os.path.exists(index_path) and os.path.exists(os.path.join(index_path, "index.faiss")):
+            try:
+                self._index_config = load_index_config(index_path)
+                self._vectorstore = self._read_vectorstore(index_path, embeddings)
+                self._registry = SourceRegistry(index_path)
+                self._history_offset = self._load_history_offset()
+                self._keyword_index = self._load_keyword_index(index_path)
+                self._index_version += 1
+                logger.info(f"Loaded existing FAISS index from {index_path}")
+                
+                if not has_chunk_store(index_path):
+                    logger.info("Converting pickled docstore to the chunk store format")
+                    self.save()
+            except Exception as e:
+                logger.warning(f"Failed to load existing index: {e}. Creating new index.")
+                self._vectorstore = None
+        
+        # If no existing index or loading failed, vectorstore remains None
+        # It will be created during document indexing
+    
+    def _read_vectorstore(self, index_path: str, embeddings: Embeddings) -> FAISS:
+        """
+        Read the FAISS index and its chunks from disk.
+        
+        Indexes saved with a chunk store are assembled directly; with
+        index_mmap both are memory-mapped, so processes serving the same index
+        share its pages. Indexes with a pickled docstore (legacy indexes and
+        ones saved before the chunk store existed) are converted instead.
+        """
+        self._mapped = False
+        if not has_chunk_store(index_path):
+            return self._convert_pickled(index_path, embeddings)
+        
+        index_file = os.path.join(index_path, "index.faiss")
+        mapped = self.settings.index_mmap
+        index = None
+        if mapped and not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+            # Older faiss releases can't map flat codes; a silent fallback
+            # would leave every worker with its own copy
+            logger.warning(
+                f"faiss {faiss.__version__} can't memory-map index.faiss (no IO_FLAG_MMAP_IFC), "
+                "reading it into memory"
+            )
+            mapped = False
+        if mapped:
+            try:
+                index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP_IFC)
+            except RuntimeError as e:
+                logger.warning(f"Memory-mapped index load failed ({str(e)}), reading it into memory")
+                mapped = False
+        if index is None:
+            index = faiss.read_index(index_file)
+        
+        store = ChunkStore.open(index_path, use_mmap=self.settings.index_mmap, spill_prefix=index_path)
+        self._mapped = mapped
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=store,
+            index_to_docstore_id=store.label_map()
+        )
+    
+    def _convert_pickled(self, index_path: str, embeddings: Embeddings) -> FAISS:
+        """
+        Load an index saved with a pickled docstore and move its chunks into a chunk store.
+        
+        Legacy positional flat indexes are rebuilt as an IDMap2,Flat index whose
+        IDs are the old positions, so the ID mapping carries over unchanged.
+        The caller saves the result once in the new format.
+        """
+        legacy = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+        index = legacy.index
+        
+        if self._index_config is None:
+            vectors = index.reconstruct_n(0, index.ntotal)
+            index = faiss.index_factory(index.d, "IDMap2,Flat", faiss.METRIC_L2)
+            index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+            self._index_config = {
+                "type": "flat",
+                "description": "IDMap2,Flat",
+                "dim": index.d,
+                "nlist": None,
+                "hnsw_ef_construction": None,
+                "trained_on": 0,
+                "next_id": index.ntotal
+            }
+        
+        store = ChunkStore.from_docstore(
+            legacy.docstore,
+            legacy.index_to_docstore_id,
+            use_mmap=self.settings.index_mmap,
+            spill_prefix=index_path
+        )
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=store,
+            index_to_docstore_id=store.label_map()
+        )
+    
+    def _load_keyword_index(self, index_path: str) -> Optional[BM25Index]:
+        """Load the keyword index, building it from the docstore if it is missing."""
+        if not self.settings.hybrid_search_enabled:
+            return None
+        
+        keyword_index = BM25Index.load(index_path, k1=self.settings.bm25_k1, b=self.settings.bm25_b)
+        if keyword_index is not None:
+            return keyword_index
+        
+        # Index saved before hybrid search was enabled: build it once from the
+        # stored chunk texts; it is persisted on the next save
+        keyword_index = self._new_keyword_index()
+        ids, texts = [], []
+        for doc_id in self._vectorstore.index_to_docstore_id.values():
+            doc = self._vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                ids.append(doc_id)
+                texts.append(doc.page_content)
+        keyword_index.add(ids, texts)
+        logger.info(f"Built BM25 keyword index for {len(ids)} chunks")
+        return keyword_index
+    
     def reset_vectorstore(self) -> None:
         """Reset the vector store by clearing the index."""
         try:
-            # Reset the cached vectorstore
-            self._vectorstore = None
-            
-            # Remove existing index files if they exist
-            index_path = self.settings.faiss_index_path
-            if os.path.exists(index_path):
-                shutil.rmtree(index_path)
+            with self._mutation_lock:
+                with self._index_lock.write_lock():
+                    # Reset the cached vectorstore, its registry and history cursor
+                    self._vectorstore = None
+                    self._registry = None
+                    self._history_offset = None
+                    self._index_config = None
+                    self._keyword_index = None
+                    self._mapped = False
+                    self._index_version += 1
+                    self.mark_corpus_changed()
+                
+                # Remove existing index files if they exist
+                index_path = self.settings.faiss_index_path
+                if os.path.exists(index_path):
+                    shutil.rmtree(index_path)
             
             logger.info(f"Vector store index has been reset")
-            
+        
         except Exception as e:
             logger.error(f"Failed to reset vector store: {str(e)}")
             raise
@@ -102,15 +820,16 @@ class VectorStoreManager:
             if vectorstore is None:
                 count = 0
             else:
-                # Use FAISS index to get document count with proper error handling
-                try:
-                    count = vectorstore.index.ntotal if hasattr(vectorstore, 'index') and vectorstore.index is not None else 0
-                except (AttributeError, Exception):
-                    count = 0
+                # Count mapped chunks: HNSW tombstones stay in index.ntotal
+                count = len(vectorstore.index_to_docstore_id)
             
+            index_config = self._index_config
             return {
                 "total_chunks": count,
-                "faiss_index_path": self.settings.faiss_index_path
+                "faiss_index_path": self.settings.faiss_index_path,
+                "index_type": index_config["type"] if index_config else "flat",
+                "memory_mapped": self._mapped,
+                "chunk_store": vectorstore.docstore.get_stats() if vectorstore is not None else None
             }
         except Exception as e:
             logger.error(f"Failed to get collection stats: {str(e)}")
@@ -120,14 +839,13 @@ class VectorStoreManager:
                 "error": str(e)
             }
     
+    def warm_up(self) -> None:
+        """Load the embedding model and run one encode so the first query doesn't pay for it."""
+        self._get_model().embed_query("warmup")
+    
     def is_connected(self) -> bool:
-        """Check if the vector store is operational."""
-        try:
-            # For FAISS, we just check if embeddings can be created
-            self._get_embeddings()
-            return True
-        except Exception:
-            return False
+        """Check if the vector store is operational, i.e. the embedding model is loaded."""
+        return self._embeddings is not None
 
 
 # Convenience function to get the vector store manager
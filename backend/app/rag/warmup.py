@@ -0,0 +1,88 @@
+"""Startup warmup: embedding model load and index load, optionally in the background."""
+
+import threading
+import time
+from typing import Optional
+
+from app.config import get_settings
+from app.rag.ingestion import get_document_ingestion
+from app.rag.jobs import get_reindex_job_manager
+from app.rag.vectorstore import get_vectorstore_manager
+from app.rag.watcher import get_data_folder_watcher
+from app.utils.logger import logger
+
+
+class StartupWarmup:
+    """
+    Brings the server from "starting" to "ready".
+    
+    Warmup loads the embedding model, loads (or builds) the index and starts
+    the data folder watcher. With fast_startup it runs in a background thread
+    so the server accepts connections at once and reports readiness on
+    /health; the data folder scan is skipped, and if there is no index to load
+    a full reindex job builds one while the server is already ready.
+    """
+    
+    def __init__(self):
+        self.settings = get_settings()
+        self.status = "starting"
+        self.error: Optional[str] = None
+        self.documents = 0
+        self.chunks = 0
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def ready(self) -> bool:
+        """Whether warmup has finished."""
+        return self.status == "ready"
+    
+    def start(self) -> None:
+        """Run warmup in a background thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, name="startup-warmup", daemon=True)
+        self._thread.start()
+    
+    def run(self) -> None:
+        """Warm the embedding model, load the index and start the watcher."""
+        started_at = time.monotonic()
+        fast = self.settings.fast_startup
+        
+        try:
+            get_vectorstore_manager().warm_up()
+            logger.info(f"Embedding model loaded in {time.monotonic() - started_at:.2f}s")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Failed to load embedding model: {str(e)}")
+        
+        # Load existing index or create new one on startup
+        try:
+            ingestion = get_document_ingestion()
+            self.documents, self.chunks = ingestion.load_or_create_index(index_only=fast)
+            if fast and get_vectorstore_manager().get_vectorstore() is None:
+                logger.info("No index to load, building one in a background reindex job")
+                get_reindex_job_manager().start(full=True)
+            logger.info(f"Startup complete: {self.documents} documents, {self.chunks} chunks")
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Startup failed: {str(e)}")
+            logger.warning("Server starting without indexed documents. Call /reindex to index manually.")
+        
+        # Optionally index files dropped into the data folder automatically
+        if self.settings.watch_data_folder:
+            get_data_folder_watcher().start()
+        
+        self.status = "ready"
+        logger.info(f"Ready to serve after {time.monotonic() - started_at:.2f}s")
+
+
+# Singleton instance
+_warmup_instance: Optional[StartupWarmup] = None
+
+
+def get_startup_warmup() -> StartupWarmup:
+    """Get the singleton StartupWarmup instance."""
+    global _warmup_instance
+    if _warmup_instance is None:
+        _warmup_instance = StartupWarmup()
+    return _warmup_instance
@@ -0,0 +1,277 @@
+"""Filesystem watcher feeding data folder changes into incremental indexing."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import get_settings
+from app.rag.history import get_conversation_history
+from app.rag.indexing_worker import get_indexing_worker
+from app.rag.jobs import get_reindex_job_manager
+from app.utils.logger import logger
+
+
+# Extensions picked up by DocumentIngestion.scan_data_folder
+WATCHED_SUFFIXES = {".pdf", ".md", ".txt", ".docx", ".doc"}
+
+# inotify event masks (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyUnavailable(Exception):
+    """Raised when inotify can't be used and the watcher must poll instead."""
+
+
+class _Inotify:
+    """Minimal ctypes binding to Linux inotify for a single directory."""
+    
+    def __init__(self, folder: str):
+        if not hasattr(os, "O_NONBLOCK"):
+            raise InotifyUnavailable("not a POSIX platform")
+        
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            init = libc.inotify_init1
+            add_watch = libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise InotifyUnavailable(str(e))
+        
+        add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        
+        self.fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise InotifyUnavailable(os.strerror(ctypes.get_errno()))
+        
+        if add_watch(self.fd, os.fsencode(folder), WATCH_MASK) < 0:
+            error = os.strerror(ctypes.get_errno())
+            os.close(self.fd)
+            raise InotifyUnavailable(error)
+    
+    def read_events(self, timeout: float) -> list[tuple[int, str]]:
+        """Wait up to `timeout` seconds and return (mask, file name) events."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            events.append((mask, os.fsdecode(name)))
+        return events
+    
+    def close(self) -> None:
+        """Release the inotify file descriptor."""
+        os.close(self.fd)
+
+
+class DataFolderWatcher:
+    """
+    Watches the data folder and queues changed files for incremental indexing.
+    
+    Uses inotify where available and falls back to polling (size, mtime) of
+    the folder otherwise. Events for a file are debounced until it has been
+    quiet for `watch_debounce_ms`, so a file being copied in is indexed once,
+    after it is complete. The file's existence at that point decides between
+    (re-)indexing and removal. Changes are handed to the background indexing
+    worker, which coalesces them with other pending updates.
+    """
+    
+    def __init__(self):
+        self.settings = get_settings()
+        self.folder = Path(self.settings.data_folder)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        
+        # File name -> time of the last event seen for it
+        self._pending: dict[str, float] = {}
+        self._snapshot: dict[str, tuple[int, int]] = {}
+        
+        self.backend: Optional[str] = None
+        self._events = 0
+        self._files_submitted = 0
+        self._overflows = 0
+    
+    def start(self) -> None:
+        """Start watching in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="data-folder-watcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop watching; pending changes are flushed to the indexing worker."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _is_watched(self, name: str) -> bool:
+        """Check whether a file name is a document the ingestion would pick up."""
+        if name.startswith(".") or name.startswith("~$"):
+            return False
+        if name == get_conversation_history().history_file.name:
+            # History is indexed through its own append hook
+            return False
+        return Path(name).suffix.lower() in WATCHED_SUFFIXES
+    
+    def _mark(self, name: str) -> None:
+        """Record an event for a file, restarting its debounce window."""
+        if self._is_watched(name):
+            self._events += 1
+            self._pending[name] = time.monotonic()
+    
+    def _flush(self, force: bool = False) -> None:
+        """Submit files whose debounce window has passed to the indexing worker."""
+        debounce = self.settings.watch_debounce_ms / 1000
+        now = time.monotonic()
+        worker = get_indexing_worker()
+        
+        for name, last_event in list(self._pending.items()):
+            if not force and now - last_event < debounce:
+                continue
+            del self._pending[name]
+            
+            path = self.folder / name
+            action = "index" if path.is_file() else "remove"
+            worker.submit_file(str(path), action=action)
+            self._files_submitted += 1
+            logger.info(f"Watcher queued {name} for {'indexing' if action == 'index' else 'removal'}")
+    
+    def _take_snapshot(self) -> dict[str, tuple[int, int]]:
+        """Get (size, mtime_ns) of every watched file in the folder."""
+        snapshot = {}
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._is_watched(entry.name):
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            pass
+        return snapshot
+    
+    def _poll(self) -> None:
+        """Diff the folder against the previous snapshot and mark changed files."""
+        snapshot = self._take_snapshot()
+        for name in set(snapshot) | set(self._snapshot):
+            if snapshot.get(name) != self._snapshot.get(name):
+                self._mark(name)
+        self._snapshot = snapshot
+    
+    def _catch_up(self) -> None:
+        """Run a differential reindex to pick up changes the watcher may have missed."""
+        get_reindex_job_manager().start(full=False)
+    
+    def _watch_inotify(self, inotify: _Inotify) -> bool:
+        """
+        Event loop on inotify.
+        
+        Returns:
+            False if the watch was lost (folder moved or deleted) and the
+            watcher should fall back to polling
+        """
+        while not self._stop.is_set():
+            timeout = min(0.5, self.settings.watch_debounce_ms / 1000) if self._pending else 0.5
+            for mask, name in inotify.read_events(timeout):
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: let a differential reindex sort it out
+                    self._overflows += 1
+                    logger.warning("Watcher event queue overflowed, running a differential reindex")
+                    self._catch_up()
+                elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    logger.warning(f"Data folder {self.folder} was moved or deleted, switching to polling")
+                    return False
+                elif name and not mask & IN_ISDIR:
+                    self._mark(name)
+            self._flush()
+        return True
+    
+    def _watch_polling(self) -> None:
+        """Event loop polling the folder."""
+        interval = max(self.settings.watch_poll_interval_ms, 50) / 1000
+        self._snapshot = self._take_snapshot()
+        while not self._stop.wait(interval):
+            self._poll()
+            self._flush()
+    
+    def _run(self) -> None:
+        """Watcher thread: pick a backend, watch until stopped, flush on exit."""
+        os.makedirs(self.folder, exist_ok=True)
+        
+        # Changes made while the server was down are not seen as events
+        self._catch_up()
+        
+        try:
+            inotify = None
+            if self.settings.watch_backend != "polling":
+                try:
+                    inotify = _Inotify(str(self.folder))
+                except InotifyUnavailable as e:
+                    logger.warning(f"inotify unavailable ({str(e)}), watching {self.folder} by polling")
+            
+            if inotify is not None:
+                self.backend = "inotify"
+                logger.info(f"Watching {self.folder} for changes (inotify)")
+                try:
+                    if self._watch_inotify(inotify):
+                        return
+                finally:
+                    inotify.close()
+            
+            self.backend = "polling"
+            logger.info(f"Watching {self.folder} for changes (polling)")
+            self._watch_polling()
+        except Exception as e:
+            logger.error(f"Data folder watcher stopped: {str(e)}")
+        finally:
+            self._flush(force=True)
+    
+    def get_stats(self) -> dict:
+        """Get watcher backend and event counters."""
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "backend": self.backend,
+            "events": self._events,
+            "pending_files": len(self._pending),
+            "files_submitted": self._files_submitted,
+            "overflows": self._overflows
+        }
+
+
+# Singleton instance
+_watcher_instance: Optional[DataFolderWatcher] = None
+
+
+def get_data_folder_watcher() -> DataFolderWatcher:
+    """Get the singleton DataFolderWatcher instance."""
+    global _watcher_instance
+    if _watcher_instance is None:
+        _watcher_instance = DataFolderWatcher()
+    return _watcher_instance
@@ -1,30 +1,107 @@
 """Rich logging utilities for comprehensive server logging."""
 
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
+from app.config import get_settings
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name
+        }
+        event = getattr(record, "event", None)
+        if event is not None:
+            entry["event"] = event
+            entry.update(record.fields)
+        else:
+            entry["message"] = record.getMessage()
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
 class RichLogger:
-    """Custom logger for rich, formatted console output."""
+    """
+    Custom logger for rich, formatted console output.
+    
+    With log_async (the default) callers only put records on a bounded queue
+    and a listener thread writes them to stdout, so a slow or blocked stdout
+    never stalls a request; records are dropped (and counted) when the queue
+    is full. With log_format=json every record is a JSON line and the
+    per-query blocks become single structured events. The per-query blocks
+    are logged for a log_query_sample_rate share of queries and are only
+    built when INFO is enabled.
+    """
     
     def __init__(self, name: str = "RAGbot"):
+        self.settings = get_settings()
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.INFO)
+        self.logger.setLevel(getattr(logging, self.settings.log_level.upper(), logging.INFO))
+        self.logger.propagate = False
+        self._json = self.settings.log_format.lower() == "json"
         
         # Clear existing handlers
         self.logger.handlers.clear()
         
         # Create console handler with formatting
         handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.INFO)
         
         # Simple format - rich formatting is done through log methods
-        formatter = logging.Formatter('%(message)s')
-        handler.setFormatter(formatter)
+        handler.setFormatter(JsonFormatter() if self._json else logging.Formatter('%(message)s'))
         
-        self.logger.addHandler(handler)
+        self._queue_handler: Optional[DroppingQueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+        if self.settings.log_async:
+            log_queue: queue.Queue = queue.Queue(maxsize=self.settings.log_queue_size)
+            self._queue_handler = DroppingQueueHandler(log_queue)
+            self._listener = QueueListener(log_queue, handler)
+            self._listener.start()
+            self.logger.addHandler(self._queue_handler)
+            atexit.register(self.shutdown)
+        else:
+            self.logger.addHandler(handler)
+    
+    def shutdown(self) -> None:
+        """Write out queued records and stop the listener thread."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+    
+    def get_stats(self) -> dict:
+        """Get logging mode, queue depth and dropped record count."""
+        return {
+            "format": "json" if self._json else "text",
+            "level": logging.getLevelName(self.logger.level),
+            "async": self._queue_handler is not None,
+            "queue_depth": self._queue_handler.queue.qsize() if self._queue_handler else 0,
+            "dropped": self._queue_handler.dropped if self._queue_handler else 0,
+            "query_sample_rate": self.settings.log_query_sample_rate
+        }
     
     def _get_timestamp(self) -> str:
         """Get formatted timestamp."""
@@ -34,29 +111,74 @@ class RichLogger:
         """Create separator line."""
         return char * length
     
-    def log_query_start(self, user_input: str) -> None:
-        """Log the start of a new query."""
-        self.logger.info("")
-        self.logger.info(self._separator("="))
-        self.logger.info(f"[{self._get_timestamp()}] NEW QUERY RECEIVED")
-        self.logger.info(self._separator("="))
-        self.logger.info(f'USER INPUT: "{user_input}"')
-        self.logger.info("")
+    def _event(self, level: int, event: str, **fields) -> None:
+        """Emit a structured event (JSON mode)."""
+        self.logger.log(level, event, extra={"event": event, "fields": fields})
+    
+    def _block(self, lines: list[str]) -> None:
+        """Emit a multi-line block as a single record."""
+        self.logger.info("\n".join(lines))
+    
+    def log_query_start(self, user_input: str) -> bool:
+        """
+        Log the start of a new query.
+        
+        Returns:
+            Whether the query's detail logs (retrieval, prompt, response) are
+            emitted; pass it on as `sampled`
+        """
+        if not self.logger.isEnabledFor(logging.INFO):
+            return False
+        if random.random() >= self.settings.log_query_sample_rate:
+            return False
+        
+        if self._json:
+            self._event(logging.INFO, "query_start", user_input=user_input)
+            return True
+        
+        self._block([
+            "",
+            self._separator("="),
+            f"[{self._get_timestamp()}] NEW QUERY RECEIVED",
+            self._separator("="),
+            f'USER INPUT: "{user_input}"',
+            ""
+        ])
+        return True
     
     def log_retrieval_process(
-        self, 
-        k: int, 
+        self,
+        k: int,
         chunks_retrieved: int,
-        results: list[dict]
+        results: list[dict],
+        sampled: bool = True
     ) -> None:
         """Log the RAG retrieval process."""
-        self.logger.info(self._separator("-"))
-        self.logger.info("RAG RETRIEVAL PROCESS")
-        self.logger.info(self._separator("-"))
-        self.logger.info(f"Similarity Search: k={k}")
-        self.logger.info(f"Retrieved Chunks: {chunks_retrieved}")
-        self.logger.info("")
-        self.logger.info("Similarity Scores:")
+        if not sampled or not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        if self._json:
+            self._event(
+                logging.INFO,
+                "retrieval",
+                k=k,
+                chunks_retrieved=chunks_retrieved,
+                results=[
+                    {"source": result.get('source', 'unknown'), "page": result.get('page'), "score": result.get('score', 0.0)}
+                    for result in results
+                ]
+            )
+            return
+        
+        lines = [
+            self._separator("-"),
+            "RAG RETRIEVAL PROCESS",
+            self._separator("-"),
+            f"Similarity Search: k={k}",
+            f"Retrieved Chunks: {chunks_retrieved}",
+            "",
+            "Similarity Scores:"
+        ]
         
         for i, result in enumerate(results, 1):
             source = result.get('source', 'unknown')
@@ -64,107 +186,178 @@ class RichLogger:
             score = result.get('score', 0.0)
             
             page_info = f" (page {page})" if page is not None else ""
-            self.logger.info(f"  {i}. Score: {score:.4f} | Source: {source}{page_info}")
+            lines.append(f"  {i}. Score: {score:.4f} | Source: {source}{page_info}")
         
-        self.logger.info("")
-        self.logger.info("Chunk Previews:")
+        lines.append("")
+        lines.append("Chunk Previews:")
         
         for i, result in enumerate(results, 1):
             content = result.get('content', '')[:100]
-            self.logger.info(f'  [{i}] "{content}..."')
+            lines.append(f'  [{i}] "{content}..."')
         
-        self.logger.info("")
+        lines.append("")
+        self._block(lines)
     
-    def log_prompt(self, system_prompt: str, context: str, user_question: str) -> None:
+    def log_prompt(self, system_prompt: str, context: str, user_question: str, sampled: bool = True) -> None:
         """Log the final prompt sent to LLM."""
-        self.logger.info(self._separator("-"))
-        self.logger.info("FINAL PROMPT SENT TO LLM")
-        self.logger.info(self._separator("-"))
-        self.logger.info(f"System: {system_prompt}")
-        self.logger.info("")
-        self.logger.info("Context:")
-        
-        # Log context with document markers
-        context_parts = context.split("\n\n")
-        for i, part in enumerate(context_parts[:5], 1):  # Limit to first 5
-            preview = part[:150]
-            self.logger.info(f"[Document {i}] {preview}...")
-        
-        self.logger.info("")
-        self.logger.info(f"User Question: {user_question}")
-        self.logger.info("")
+        if not sampled or not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        if self._json:
+            self._event(logging.INFO, "prompt", context_chars=len(context), user_question=user_question)
+            return
+        
+        lines = [
+            self._separator("-"),
+            "FINAL PROMPT SENT TO LLM",
+            self._separator("-"),
+            f"System: {system_prompt}",
+            "",
+            "Context:"
+        ]
+        
+        # Log context with document markers; only the first 5 parts are
+        # located instead of splitting the whole context
+        start = 0
+        for i in range(1, 6):
+            if start > len(context):
+                break
+            end = context.find("\n\n", start)
+            part_end = end if end != -1 else len(context)
+            preview = context[start:min(part_end, start + 150)]
+            lines.append(f"[Document {i}] {preview}...")
+            if end == -1:
+                break
+            start = end + 2
+        
+        lines.append("")
+        lines.append(f"User Question: {user_question}")
+        lines.append("")
+        self._block(lines)
     
     def log_response(
-        self, 
-        response: str, 
+        self,
+        response: str,
         prompt_tokens: int,
         completion_tokens: int,
         total_tokens: int,
         model: str,
         temperature: float,
         max_tokens: int,
-        response_time: float
+        response_time: float,
+        sampled: bool = True
     ) -> None:
         """Log the LLM response."""
-        self.logger.info(self._separator("-"))
-        self.logger.info("LLM RESPONSE")
-        self.logger.info(self._separator("-"))
-        self.logger.info(f'Response: "{response[:200]}..."' if len(response) > 200 else f'Response: "{response}"')
-        self.logger.info("")
-        self.logger.info("Token Usage:")
-        self.logger.info(f"  - Prompt Tokens: {prompt_tokens}")
-        self.logger.info(f"  - Completion Tokens: {completion_tokens}")
-        self.logger.info(f"  - Total Tokens: {total_tokens}")
-        self.logger.info("")
-        self.logger.info(f"Model: {model}")
-        self.logger.info(f"Temperature: {temperature}")
-        self.logger.info(f"Max Tokens: {max_tokens}")
-        self.logger.info("")
-        self.logger.info(f"Response Time: {response_time:.2f}s")
-        self.logger.info(self._separator("="))
-        self.logger.info("")
+        if not sampled or not self.logger.isEnabledFor(logging.INFO):
+            return
+        
+        if self._json:
+            self._event(
+                logging.INFO,
+                "response",
+                response_chars=len(response),
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=total_tokens,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_time=round(response_time, 3)
+            )
+            return
+        
+        self._block([
+            self._separator("-"),
+            "LLM RESPONSE",
+            self._separator("-"),
+            f'Response: "{response[:200]}..."' if len(response) > 200 else f'Response: "{response}"',
+            "",
+            "Token Usage:",
+            f"  - Prompt Tokens: {prompt_tokens}",
+            f"  - Completion Tokens: {completion_tokens}",
+            f"  - Total Tokens: {total_tokens}",
+            "",
+            f"Model: {model}",
+            f"Temperature: {temperature}",
+            f"Max Tokens: {max_tokens}",
+            "",
+            f"Response Time: {response_time:.2f}s",
+            self._separator("="),
+            ""
+        ])
     
     def log_indexing_start(self, folder: str) -> None:
         """Log document indexing start."""
-        self.logger.info("")
-        self.logger.info(self._separator("="))
-        self.logger.info(f"[{self._get_timestamp()}] DOCUMENT INDEXING")
-        self.logger.info(self._separator("="))
-        self.logger.info(f"Scanning folder: {folder}")
+        if self._json:
+            self._event(logging.INFO, "indexing_start", folder=folder)
+            return
+        
+        self._block([
+            "",
+            self._separator("="),
+            f"[{self._get_timestamp()}] DOCUMENT INDEXING",
+            self._separator("="),
+            f"Scanning folder: {folder}"
+        ])
     
     def log_document_found(self, filename: str, doc_type: str) -> None:
         """Log found document."""
+        if self._json:
+            self._event(logging.INFO, "document_found", filename=filename, doc_type=doc_type)
+            return
         self.logger.info(f"  Found: {filename} ({doc_type})")
     
     def log_indexing_complete(self, documents: int, chunks: int) -> None:
         """Log indexing completion."""
-        self.logger.info("")
-        self.logger.info(f"Indexed {documents} documents into {chunks} chunks")
-        self.logger.info(self._separator("="))
-        self.logger.info("")
+        if self._json:
+            self._event(logging.INFO, "indexing_complete", documents=documents, chunks=chunks)
+            return
+        
+        self._block([
+            "",
+            f"Indexed {documents} documents into {chunks} chunks",
+            self._separator("="),
+            ""
+        ])
     
     def log_error(self, error: str, context: Optional[str] = None) -> None:
         """Log error with optional context."""
-        self.logger.error("")
-        self.logger.error(self._separator("!"))
-        self.logger.error(f"[{self._get_timestamp()}] ERROR")
+        if self._json:
+            self._event(logging.ERROR, "error", error=error, context=context)
+            return
+        
+        lines = [
+            "",
+            self._separator("!"),
+            f"[{self._get_timestamp()}] ERROR"
+        ]
         if context:
-            self.logger.error(f"Context: {context}")
-        self.logger.error(f"Error: {error}")
-        self.logger.error(self._separator("!"))
-        self.logger.error("")
+            lines.append(f"Context: {context}")
+        lines.append(f"Error: {error}")
+        lines.append(self._separator("!"))
+        lines.append("")
+        self.logger.error("\n".join(lines))
     
     def info(self, message: str) -> None:
         """Log info message."""
-        self.logger.info(f"[{self._get_timestamp()}] {message}")
+        if self._json:
+            self.logger.info(message)
+        elif self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(f"[{self._get_timestamp()}] {message}")
     
     def warning(self, message: str) -> None:
         """Log warning message."""
-        self.logger.warning(f"[{self._get_timestamp()}] WARNING: {message}")
+        if self._json:
+            self.logger.warning(message)
+        elif self.logger.isEnabledFor(logging.WARNING):
+            self.logger.warning(f"[{self._get_timestamp()}] WARNING: {message}")
     
     def error(self, message: str) -> None:
         """Log error message."""
-        self.logger.error(f"[{self._get_timestamp()}] ERROR: {message}")
+        if self._json:
+            self.logger.error(message)
+        else:
+            self.logger.error(f"[{self._get_timestamp()}] ERROR: {message}")
 
 
 # Global logger instance
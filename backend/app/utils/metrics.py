@@ -0,0 +1,339 @@
+"""In-process metrics: counters, gauges and latency histograms in Prometheus text format."""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+# Request stage latencies: sub-millisecond cache lookups up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Indexing runs: a history increment takes milliseconds, a full rebuild minutes
+INDEXING_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# Quantiles reported over the most recent observations of each histogram
+QUANTILES = (0.5, 0.95, 0.99)
+QUANTILE_WINDOW = 1024
+
+
+def _format_labels(labels: dict) -> str:
+    """Render a label set as {name="value",...} with Prometheus escaping."""
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value the way Prometheus expects."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Metric family: a name, help text and one series per label set."""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._series: dict[tuple, object] = {}
+    
+    def _key(self, labels: dict) -> tuple:
+        """Label values in declaration order."""
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+    
+    def _labels(self, key: tuple) -> dict:
+        """Label set of a series key."""
+        return dict(zip(self.label_names, key))
+    
+    def render(self) -> list[str]:
+        """Render the family as Prometheus exposition lines."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in series:
+            lines.append(f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing total."""
+    
+    kind = "counter"
+    
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Add to the total of a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+    
+    def set(self, value: float, **labels) -> None:
+        """Mirror a running total kept by another component (e.g. a cache's hit count)."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = float(value)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    
+    kind = "gauge"
+    
+    def set(self, value: float, **labels) -> None:
+        """Set the current value of a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = float(value)
+
+
+class _HistogramSeries:
+    """Bucket counts, sum and a window of recent observations for one label set."""
+    
+    def __init__(self, bucket_count: int):
+        self.buckets = [0] * bucket_count
+        self.count = 0
+        self.sum = 0.0
+        self.recent: deque = deque(maxlen=QUANTILE_WINDOW)
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values.
+    
+    Cumulative buckets are exposed as a Prometheus histogram, so quantiles can
+    be computed across instances with histogram_quantile(). Each series also
+    keeps its last QUANTILE_WINDOW observations, from which p50/p95/p99 are
+    reported directly as a companion summary (`<name>_recent`).
+    """
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help_text, label_names)
+        self.bounds = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.bounds))
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    series.buckets[i] += 1
+                    break
+            series.count += 1
+            series.sum += value
+            series.recent.append(value)
+    
+    def quantiles(self, **labels) -> Optional[dict[str, float]]:
+        """Get p50/p95/p99 of the recent observations of a label set, or None if there are none."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            recent = sorted(series.recent) if series is not None else []
+        if not recent:
+            return None
+        return {f"p{int(q * 100)}": self._quantile(recent, q) for q in QUANTILES}
+    
+    @staticmethod
+    def _quantile(ordered: list[float], q: float) -> float:
+        """Nearest-rank quantile of a sorted list."""
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+    
+    def render(self) -> list[str]:
+        """Render buckets, sum and count, followed by the recent-window quantiles."""
+        with self._lock:
+            series = [
+                (key, list(s.buckets), s.count, s.sum, sorted(s.recent))
+                for key, s in self._series.items()
+            ]
+        
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, buckets, count, total, _ in series:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket in zip(self.bounds, buckets):
+                cumulative += bucket
+                lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        
+        summary = f"{self.name}_recent"
+        lines.append(f"# HELP {summary} {self.help} (last {QUANTILE_WINDOW} observations)")
+        lines.append(f"# TYPE {summary} summary")
+        for key, _, _, _, recent in series:
+            labels = self._labels(key)
+            for q in QUANTILES:
+                value = self._quantile(recent, q) if recent else float("nan")
+                lines.append(f"{summary}{_format_labels({**labels, 'quantile': str(q)})} {_format_value(value)}")
+            lines.append(f"{summary}_sum{_format_labels(labels)} {_format_value(sum(recent))}")
+            lines.append(f"{summary}_count{_format_labels(labels)} {len(recent)}")
+        return lines
+
+
+class Metrics:
+    """
+    Registry of the application's metrics.
+    
+    Request stages are timed with StageTimings; indexing code records its
+    runs directly. Totals already kept by other components (cache hit counts,
+    indexing queue depth) are copied in when /metrics is scraped.
+    """
+    
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "rag_stage_duration_seconds",
+            "Time spent in each stage of the chat pipeline",
+            ("stage",)
+        )
+        self.queries = Counter(
+            "rag_queries_total",
+            "Chat queries answered",
+            ("mode", "cached")
+        )
+        self.tokens = Counter(
+            "rag_llm_tokens_total",
+            "LLM tokens used",
+            ("kind",)
+        )
+        self.llm_retries = Counter(
+            "rag_llm_retries_total",
+            "LLM requests retried after a rate limit, server or connection error",
+            ("reason",)
+        )
+        self.llm_hedges = Counter(
+            "rag_llm_hedged_requests_total",
+            "Hedged LLM requests sent, and how many of them answered first",
+            ("outcome",)
+        )
+        self.context_chunks = Counter(
+            "rag_context_chunks_total",
+            "Retrieved chunks merged into a neighbor, dropped as duplicates, truncated or dropped for the token budget",
+            ("outcome",)
+        )
+        self.cache_hits = Counter(
+            "rag_cache_hits_total",
+            "Cache lookups that found an entry",
+            ("cache",)
+        )
+        self.cache_misses = Counter(
+            "rag_cache_misses_total",
+            "Cache lookups that found no entry",
+            ("cache",)
+        )
+        self.indexing_seconds = Histogram(
+            "rag_indexing_duration_seconds",
+            "Duration of reindex jobs and background indexing batches",
+            ("kind",),
+            buckets=INDEXING_BUCKETS
+        )
+        self.chunks_indexed = Counter(
+            "rag_chunks_indexed_total",
+            "Chunks embedded and added to the index",
+            ("kind",)
+        )
+        self.indexing_throughput = Gauge(
+            "rag_indexing_throughput_chunks_per_second",
+            "Embedding throughput of the last reindex job",
+            ("kind",)
+        )
+        self.indexing_queue_depth = Gauge(
+            "rag_indexing_queue_depth",
+            "Index update requests waiting for the background worker"
+        )
+        self.indexed_chunks = Gauge(
+            "rag_indexed_chunks",
+            "Chunks in the current index"
+        )
+        self._metrics = [
+            self.stage_seconds,
+            self.queries,
+            self.tokens,
+            self.llm_retries,
+            self.llm_hedges,
+            self.context_chunks,
+            self.cache_hits,
+            self.cache_misses,
+            self.indexing_seconds,
+            self.chunks_indexed,
+            self.indexing_throughput,
+            self.indexing_queue_depth,
+            self.indexed_chunks
+        ]
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class StageTimings:
+    """
+    Durations of the stages of one chat request.
+    
+    Every timed stage is also recorded in the stage histogram. A stage entered
+    more than once accumulates; finish() records the whole request as "total".
+    """
+    
+    def __init__(self):
+        self.stages: dict[str, float] = {}
+        self._started = time.perf_counter()
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as a pipeline stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+    
+    def record(self, name: str, seconds: float) -> None:
+        """Record a stage duration measured elsewhere."""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        get_metrics().stage_seconds.observe(seconds, stage=name)
+    
+    def finish(self) -> None:
+        """Record the time since the request started as the "total" stage."""
+        self.record("total", time.perf_counter() - self._started)
+    
+    def to_dict(self) -> dict[str, float]:
+        """Stage durations in milliseconds."""
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
+
+
+# Singleton instance
+_metrics_instance: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """Get the singleton Metrics instance."""
+    global _metrics_instance
+    if _metrics_instance is None:
+        _metrics_instance = Metrics()
+    return _metrics_instance
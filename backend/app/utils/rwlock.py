@@ -0,0 +1,69 @@
+"""Readers-writer lock for sharing the vector index between searches and updates."""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class ReadWriteLock:
+    """
+    Lock allowing many concurrent readers or a single writer.
+    
+    Writers are preferred: once a writer is waiting, new readers block until it
+    has finished, so a steady stream of searches cannot starve index updates.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer_active = False
+        self._writers_waiting = 0
+    
+    def acquire_read(self) -> None:
+        """Acquire the lock for reading."""
+        with self._condition:
+            while self._writer_active or self._writers_waiting > 0:
+                self._condition.wait()
+            self._readers += 1
+    
+    def release_read(self) -> None:
+        """Release a read acquisition."""
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+    
+    def acquire_write(self) -> None:
+        """Acquire the lock for writing."""
+        with self._condition:
+            self._writers_waiting += 1
+            try:
+                while self._writer_active or self._readers > 0:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer_active = True
+    
+    def release_write(self) -> None:
+        """Release a write acquisition."""
+        with self._condition:
+            self._writer_active = False
+            self._condition.notify_all()
+    
+    @contextmanager
+    def read_lock(self) -> Iterator[None]:
+        """Context manager holding the lock for reading."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """Context manager holding the lock for writing."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
@@ -0,0 +1 @@
+"""Benchmark suite: synthetic corpora, a mock LLM server and the benchmark runner."""
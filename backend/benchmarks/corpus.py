@@ -0,0 +1,230 @@
+"""Synthetic corpus generator: PDF, Markdown, text and Word files of configurable size."""
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+FORMATS = ("txt", "md", "pdf", "docx")
+
+# Characters per PDF line and lines per page of the generated PDFs
+PDF_LINE_CHARS = 90
+PDF_PAGE_LINES = 60
+
+
+class CorpusGenerator:
+    """
+    Generates reproducible synthetic documents.
+    
+    Text is drawn from a Zipf-distributed vocabulary of pseudo-words, which
+    gives BM25 and the embedding model a realistic mix of frequent and rare
+    terms. Every document also mentions a few unique identifiers (e.g.
+    "ERR-00042") that make good exact-match queries.
+    """
+    
+    def __init__(self, seed: int = 0, vocabulary_size: int = 20000):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        syllables = ["ka", "lo", "mi", "ne", "ra", "su", "ti", "vo", "ze", "an", "el", "or", "un", "is", "et"]
+        words = set()
+        while len(words) < vocabulary_size:
+            words.add("".join(rng.choice(syllables, size=rng.integers(2, 5))))
+        # Shuffled so word frequency (Zipf rank) is unrelated to spelling
+        self.vocabulary = [str(word) for word in rng.permutation(sorted(words))]
+        
+        ranks = np.arange(1, vocabulary_size + 1)
+        self._weights = 1.0 / ranks
+        self._weights /= self._weights.sum()
+    
+    def _sentences(self, rng: np.random.Generator, n_words: int, markers: list[str]) -> list[str]:
+        """Generate sentences totalling about n_words words, with the markers mixed in."""
+        words = list(rng.choice(self.vocabulary, size=n_words, p=self._weights))
+        for marker in markers:
+            words.insert(int(rng.integers(0, len(words) + 1)), marker)
+        
+        sentences = []
+        i = 0
+        while i < len(words):
+            length = int(rng.integers(8, 20))
+            sentence = " ".join(words[i:i + length])
+            sentences.append(sentence[0].upper() + sentence[1:] + ".")
+            i += length
+        return sentences
+    
+    def _paragraphs(self, rng: np.random.Generator, n_words: int, markers: list[str]) -> list[str]:
+        """Group generated sentences into paragraphs of 3-7 sentences."""
+        sentences = self._sentences(rng, n_words, markers)
+        paragraphs = []
+        i = 0
+        while i < len(sentences):
+            length = int(rng.integers(3, 8))
+            paragraphs.append(" ".join(sentences[i:i + length]))
+            i += length
+        return paragraphs
+    
+    def generate(
+        self,
+        folder: str,
+        n_files: int,
+        words_per_file: int = 800,
+        formats: tuple[str, ...] = FORMATS
+    ) -> dict:
+        """
+        Write a corpus into a folder.
+        
+        Files cycle through the given formats. Files that already exist are
+        kept, so a folder is only filled once per corpus configuration.
+        
+        Args:
+            folder: Target folder (created if missing)
+            n_files: Number of files
+            words_per_file: Approximate words per file
+            formats: File formats to cycle through (txt, md, pdf, docx)
+        
+        Returns:
+            Dictionary with file count, total bytes and count per format
+        """
+        target = Path(folder)
+        target.mkdir(parents=True, exist_ok=True)
+        
+        unknown = set(formats) - set(FORMATS)
+        if unknown:
+            raise ValueError(f"Unsupported corpus formats: {sorted(unknown)}")
+        
+        counts = {fmt: 0 for fmt in formats}
+        total_bytes = 0
+        for i in range(n_files):
+            fmt = formats[i % len(formats)]
+            path = target / f"doc_{i:06d}.{fmt}"
+            if not path.exists():
+                rng = np.random.default_rng([self.seed, i])
+                paragraphs = self._paragraphs(rng, words_per_file, self.markers(i))
+                title = f"Document {i}: {' '.join(rng.choice(self.vocabulary[:500], size=3))}"
+                WRITERS[fmt](path, title, paragraphs)
+            counts[fmt] += 1
+            total_bytes += path.stat().st_size
+        
+        return {"files": n_files, "bytes": total_bytes, "formats": counts}
+    
+    @staticmethod
+    def markers(index: int) -> list[str]:
+        """Unique identifiers mentioned in the document with the given index."""
+        return [f"ERR-{index:05d}", f"REF{index:05d}Q"]
+    
+    def queries(self, n: int, n_files: int, seed: Optional[int] = None) -> list[str]:
+        """
+        Generate benchmark queries for a corpus of n_files documents.
+        
+        Half are natural-language-like word sequences, half ask for a
+        document's unique identifier (an exact-match keyword query).
+        """
+        rng = np.random.default_rng(self.seed + 1 if seed is None else seed)
+        queries = []
+        for i in range(n):
+            if i % 2:
+                marker = self.markers(int(rng.integers(0, max(n_files, 1))))[0]
+                queries.append(f"What does {marker} mean?")
+            else:
+                words = rng.choice(self.vocabulary[:5000], size=int(rng.integers(4, 10)))
+                queries.append(" ".join(words))
+        return queries
+
+
+def _write_txt(path: Path, title: str, paragraphs: list[str]) -> None:
+    """Write a plain text file."""
+    path.write_text(title + "\n\n" + "\n\n".join(paragraphs) + "\n", encoding="utf-8")
+
+
+def _write_md(path: Path, title: str, paragraphs: list[str]) -> None:
+    """Write a Markdown file with a section heading every few paragraphs."""
+    parts = [f"# {title}"]
+    for i, paragraph in enumerate(paragraphs):
+        if i % 4 == 0:
+            parts.append(f"## Section {i // 4 + 1}")
+        parts.append(paragraph)
+    path.write_text("\n\n".join(parts) + "\n", encoding="utf-8")
+
+
+def _pdf_escape(text: str) -> str:
+    """Escape a string for a PDF literal string."""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int) -> list[str]:
+    """Greedy word wrap."""
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _write_pdf(path: Path, title: str, paragraphs: list[str]) -> None:
+    """
+    Write a minimal text PDF (Helvetica, one text object per page).
+    
+    Written by hand so generating PDFs needs no extra dependency; pypdf
+    extracts the text like any other simple PDF.
+    """
+    lines = [title, ""]
+    for paragraph in paragraphs:
+        lines.extend(_wrap(paragraph, PDF_LINE_CHARS))
+        lines.append("")
+    pages = [lines[i:i + PDF_PAGE_LINES] for i in range(0, len(lines), PDF_PAGE_LINES)]
+    
+    # Object numbers: 1 catalog, 2 page tree, 3 font, then a page and its
+    # content stream per page
+    objects: dict[int, bytes] = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    }
+    kids = []
+    for n, page_lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * n, 5 + 2 * n
+        kids.append(f"{page_id} 0 R")
+        text = "".join(f"({_pdf_escape(line)}) Tj T*\n" for line in page_lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text}ET".encode("latin-1", errors="replace")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode("ascii")
+        objects[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode("ascii")
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for obj_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    path.write_bytes(bytes(out))
+
+
+def _write_docx(path: Path, title: str, paragraphs: list[str]) -> None:
+    """Write a Word document with python-docx."""
+    from docx import Document as WordDocument
+    
+    document = WordDocument()
+    document.add_heading(title, level=1)
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(str(path))
+
+
+WRITERS = {
+    "txt": _write_txt,
+    "md": _write_md,
+    "pdf": _write_pdf,
+    "docx": _write_docx
+}
@@ -0,0 +1,113 @@
+"""
+Local OpenAI-compatible stand-in for the LongCat API.
+
+Answers /v1/chat/completions (plain and streaming) after a configurable
+latency, emitting tokens at a configurable rate, so /chat can be load tested
+without network access or API costs. Point the backend at it with
+LONGCAT_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python -m benchmarks.mock_llm --port 8100 --latency-ms 300 --tokens-per-second 80
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def create_app(latency_ms: float, tokens_per_second: float, completion_tokens: int) -> FastAPI:
+    """
+    Create the mock server.
+    
+    Args:
+        latency_ms: Time to first token
+        tokens_per_second: Generation rate after the first token (0 = instant)
+        completion_tokens: Tokens per answer
+    """
+    app = FastAPI(title="Mock LLM")
+    token_delay = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+    
+    def usage(messages: list[dict]) -> dict:
+        # Roughly 4 characters per token, like English text
+        prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        messages = body.get("messages", [])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        
+        await asyncio.sleep(latency_ms / 1000)
+        
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * max(completion_tokens - 1, 0))
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(["token"] * completion_tokens)},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage(messages)
+            })
+        
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+        
+        def chunk(delta: dict, finish_reason=None, chunk_usage=None) -> str:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                "usage": chunk_usage
+            }
+            return f"data: {json.dumps(data)}\n\n"
+        
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for i in range(completion_tokens):
+                if i:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": "token" if i == 0 else " token"})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk(None, chunk_usage=usage(messages))
+            yield "data: [DONE]\n\n"
+        
+        return StreamingResponse(stream(), media_type="text/event-stream")
+    
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Generation rate (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=64, help="Tokens per answer")
+    args = parser.parse_args()
+    
+    app = create_app(args.latency_ms, args.tokens_per_second, args.completion_tokens)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
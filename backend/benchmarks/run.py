@@ -0,0 +1,562 @@
+"""
+Benchmark runner: ingestion throughput, retrieval latency/QPS and /chat load.
+
+Run from the backend folder:
+    python -m benchmarks.run --sizes 100,1000 --index-types flat,hnsw --output bench.json
+    python -m benchmarks.run --suites chat --concurrency 1,8,32
+    python -m benchmarks.run --compare baseline.json --output current.json
+
+Ingestion and retrieval cases each run in a fresh process, because settings
+and the index singletons are read once per process; the peak RSS reported
+for a case is therefore its own. The chat suite starts the backend with
+uvicorn against a local mock LLM (benchmarks.mock_llm) and drives /chat and
+/chat/stream concurrently. Results are written as JSON; --compare reports
+metrics that got worse than a baseline file by more than --threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.corpus import FORMATS, CorpusGenerator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Metrics compared against a baseline: (suite, path into the result, higher is better)
+COMPARED_METRICS = [
+    ("ingest", ("chunks_per_second",), True),
+    ("ingest", ("peak_rss_mb",), False),
+    ("retrieval", ("latency_ms", "p95"), False),
+    ("retrieval", ("qps",), True),
+    ("retrieval", ("concurrent", "qps"), True),
+    ("chat", ("latency_ms", "p95"), False),
+    ("chat", ("qps",), True)
+]
+
+
+def _percentiles(values: list[float]) -> dict:
+    """Summarize latencies (in seconds) as milliseconds."""
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ms = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "mean": round(float(ms.mean()), 3),
+        "max": round(float(ms.max()), 3)
+    }
+
+
+def _peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its (ingestion worker) children."""
+    if resource is None:
+        return {"self": None, "children": None}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+
+def _free_port() -> int:
+    """Pick a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _app_env(workdir: Path, corpus_dir: Path, index_name: str, **overrides) -> dict[str, str]:
+    """Settings for a backend instance that only touches the benchmark workdir."""
+    env = {
+        "DATA_FOLDER": str(corpus_dir),
+        "FAISS_INDEX_PATH": str(workdir / "indexes" / index_name),
+        "EMBEDDING_CACHE_PATH": str(workdir / "embedding_cache"),
+        "LOG_LEVEL": "WARNING"
+    }
+    env.update({key.upper(): str(value) for key, value in overrides.items()})
+    return env
+
+
+def _case_entry(target: Callable, env: dict, args: tuple, results) -> None:
+    """Subprocess entry point: apply the settings, run the case, send back its result."""
+    os.environ.update(env)
+    try:
+        results.put(("ok", target(*args)))
+    except Exception:
+        results.put(("error", traceback.format_exc()))
+
+
+def _run_case(target: Callable, env: dict, *args) -> dict:
+    """Run a benchmark case in a fresh process with the given settings."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_case_entry, args=(target, env, args, results))
+    process.start()
+    try:
+        while True:
+            try:
+                status, value = results.get(timeout=1)
+                break
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError(f"Benchmark process exited with code {process.exitcode}")
+    finally:
+        process.join()
+    
+    if status == "error":
+        raise RuntimeError(f"Benchmark case failed:\n{value}")
+    return value
+
+
+def _ingest_case() -> dict:
+    """Measure a full index build of the configured data folder."""
+    from app.config import get_settings
+    from app.rag.ingestion import get_document_ingestion
+    from app.rag.vectorstore import get_vectorstore_manager
+    
+    # Model loading is not part of ingestion throughput
+    get_vectorstore_manager().warm_up()
+    files = sum(1 for path in Path(get_settings().data_folder).iterdir() if path.suffix.lstrip(".") in FORMATS)
+    
+    started = time.perf_counter()
+    documents, chunks = get_document_ingestion().index_documents()
+    elapsed = time.perf_counter() - started
+    
+    return {
+        "files": files,
+        "documents": documents,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(files / elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 2),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def _retrieval_case(queries: list[str], k: int, threads: int) -> dict:
+    """Build an index, then measure retrieve_relevant_chunks sequentially and from a thread pool."""
+    from app.rag.ingestion import get_document_ingestion
+    from app.rag.retrieval import get_rag_retrieval
+    from app.rag.vectorstore import get_vectorstore_manager
+    
+    get_vectorstore_manager().warm_up()
+    started = time.perf_counter()
+    _, chunks = get_document_ingestion().index_documents()
+    build_seconds = time.perf_counter() - started
+    
+    retrieval = get_rag_retrieval()
+    for query in queries[:10]:
+        retrieval.retrieve_relevant_chunks(query, k=k)
+    
+    def timed(query: str) -> float:
+        query_started = time.perf_counter()
+        retrieval.retrieve_relevant_chunks(query, k=k)
+        return time.perf_counter() - query_started
+    
+    started = time.perf_counter()
+    latencies = [timed(query) for query in queries]
+    sequential_seconds = time.perf_counter() - started
+    
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        started = time.perf_counter()
+        concurrent_latencies = list(pool.map(timed, queries))
+        concurrent_seconds = time.perf_counter() - started
+    
+    return {
+        "index_type": get_vectorstore_manager().get_collection_stats().get("index_type"),
+        "chunks": chunks,
+        "build_seconds": round(build_seconds, 3),
+        "queries": len(queries),
+        "latency_ms": _percentiles(latencies),
+        "qps": round(len(queries) / sequential_seconds, 2),
+        "concurrent": {
+            "threads": threads,
+            "latency_ms": _percentiles(concurrent_latencies),
+            "qps": round(len(queries) / concurrent_seconds, 2)
+        },
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+async def _drive_chat(
+    base_url: str,
+    queries: list[str],
+    concurrency: int,
+    stream: bool
+) -> dict:
+    """Send the queries to /chat or /chat/stream from `concurrency` concurrent clients."""
+    pending: asyncio.Queue = asyncio.Queue()
+    for query in queries:
+        pending.put_nowait(query)
+    
+    latencies, first_tokens, errors = [], [], []
+    stage_totals: dict[str, float] = {}
+    
+    def add_timings(timings: Optional[dict]) -> None:
+        for stage, ms in (timings or {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    
+    async def send(client: httpx.AsyncClient, query: str) -> None:
+        payload = {"message": query, "include_timings": True}
+        started = time.perf_counter()
+        if not stream:
+            response = await client.post("/chat", json=payload)
+            if response.status_code != 200:
+                errors.append(f"HTTP {response.status_code}")
+                return
+            latencies.append(time.perf_counter() - started)
+            add_timings(response.json().get("timings"))
+            return
+        
+        first_token = None
+        event = None
+        async with client.stream("POST", "/chat/stream", json=payload) as response:
+            if response.status_code != 200:
+                errors.append(f"HTTP {response.status_code}")
+                return
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if event == "token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                elif line.startswith("data: ") and event == "error":
+                    errors.append(line[len("data: "):])
+                    return
+                elif line.startswith("data: ") and event == "done":
+                    add_timings(json.loads(line[len("data: "):]).get("timings"))
+        latencies.append(time.perf_counter() - started)
+        if first_token is not None:
+            first_tokens.append(first_token)
+    
+    async def worker(client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                query = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await send(client, query)
+            except httpx.HTTPError as e:
+                errors.append(type(e).__name__)
+    
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    result = {
+        "mode": "stream" if stream else "chat",
+        "concurrency": concurrency,
+        "requests": len(queries),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "latency_ms": _percentiles(latencies),
+        "qps": round(len(latencies) / elapsed, 2),
+        "server_stages_ms": {
+            stage: round(total / len(latencies), 3) for stage, total in stage_totals.items()
+        } if latencies else {}
+    }
+    if stream:
+        result["first_token_ms"] = _percentiles(first_tokens)
+    return result
+
+
+def _wait_ready(base_url: str, server: subprocess.Popen, timeout: float) -> None:
+    """Wait until the backend reports ready on /health."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {server.returncode} during startup")
+        try:
+            health = httpx.get(f"{base_url}/health", timeout=5).json()
+            if health.get("readiness") == "ready" and health.get("status") == "healthy":
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Backend not ready after {timeout}s")
+
+
+def run_ingest_suite(args, generator: CorpusGenerator, workdir: Path) -> list[dict]:
+    """Full index builds per corpus size, with the embedding cache disabled."""
+    results = []
+    for size in args.sizes:
+        corpus_dir = _corpus(args, generator, workdir, size)
+        print(f"[ingest] {size} files...", flush=True)
+        env = _app_env(workdir, corpus_dir, f"ingest-{size}", embedding_cache_enabled="false")
+        shutil.rmtree(env["FAISS_INDEX_PATH"], ignore_errors=True)
+        result = {"size": size, **_run_case(_ingest_case, env)}
+        print(f"[ingest] {size} files: {result['chunks_per_second']} chunks/s", flush=True)
+        results.append(result)
+    return results
+
+
+def run_retrieval_suite(args, generator: CorpusGenerator, workdir: Path) -> list[dict]:
+    """Retrieval latency and QPS per corpus size and index type, with query caches disabled."""
+    results = []
+    for size in args.sizes:
+        corpus_dir = _corpus(args, generator, workdir, size)
+        queries = generator.queries(args.queries, size)
+        for index_type in args.index_types:
+            print(f"[retrieval] {size} files, {index_type}...", flush=True)
+            env = _app_env(
+                workdir,
+                corpus_dir,
+                f"retrieval-{size}-{index_type}",
+                faiss_index_type=index_type,
+                query_cache_enabled="false"
+            )
+            shutil.rmtree(env["FAISS_INDEX_PATH"], ignore_errors=True)
+            result = _run_case(_retrieval_case, env, queries, args.k, args.threads)
+            result = {"size": size, "requested_index_type": index_type, **result}
+            print(f"[retrieval] {size} files, {index_type}: p95 {result['latency_ms']['p95']} ms, {result['qps']} qps", flush=True)
+            results.append(result)
+    return results
+
+
+def run_chat_suite(args, generator: CorpusGenerator, workdir: Path) -> list[dict]:
+    """Concurrent /chat and /chat/stream load against the backend and a mock LLM."""
+    size = args.chat_size or min(args.sizes)
+    corpus_dir = _corpus(args, generator, workdir, size)
+    mock_port, backend_port = _free_port(), _free_port()
+    base_url = f"http://127.0.0.1:{backend_port}"
+    
+    env = _app_env(
+        workdir,
+        corpus_dir,
+        f"chat-{size}",
+        longcat_base_url=f"http://127.0.0.1:{mock_port}/v1",
+        longcat_api_key="benchmark",
+        response_cache_enabled=str(args.chat_cache).lower()
+    )
+    shutil.rmtree(env["FAISS_INDEX_PATH"], ignore_errors=True)
+    
+    mock = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.mock_llm",
+            "--port", str(mock_port),
+            "--latency-ms", str(args.llm_latency_ms),
+            "--tokens-per-second", str(args.llm_tokens_per_second),
+            "--completion-tokens", str(args.llm_completion_tokens)
+        ],
+        cwd=BACKEND_DIR
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(backend_port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env}
+    )
+    
+    results = []
+    try:
+        print(f"[chat] starting backend on a {size}-file corpus...", flush=True)
+        _wait_ready(base_url, server, args.startup_timeout)
+        query_pool = generator.queries(args.chat_requests * len(args.concurrency) * len(args.modes), size, seed=7)
+        for mode in args.modes:
+            for concurrency in args.concurrency:
+                # Fresh queries per run so the response cache (if enabled) only
+                # helps with genuinely repeated questions
+                queries, query_pool = query_pool[:args.chat_requests], query_pool[args.chat_requests:]
+                result = asyncio.run(_drive_chat(base_url, queries, concurrency, stream=(mode == "stream")))
+                result["llm"] = {
+                    "latency_ms": args.llm_latency_ms,
+                    "tokens_per_second": args.llm_tokens_per_second,
+                    "completion_tokens": args.llm_completion_tokens
+                }
+                print(
+                    f"[chat] {mode} x{concurrency}: p95 {result['latency_ms']['p95']} ms, "
+                    f"{result['qps']} qps, {result['errors']} errors",
+                    flush=True
+                )
+                results.append(result)
+    finally:
+        for process in (server, mock):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return results
+
+
+def _corpus(args, generator: CorpusGenerator, workdir: Path, size: int) -> Path:
+    """Generate (once) the corpus of a given size."""
+    corpus_dir = workdir / f"corpus-{size}-{args.words_per_file}-{'-'.join(args.formats)}"
+    generator.generate(str(corpus_dir), size, words_per_file=args.words_per_file, formats=tuple(args.formats))
+    return corpus_dir
+
+
+def _result_key(suite: str, result: dict) -> tuple:
+    """Identify the same case across result files."""
+    if suite == "ingest":
+        return (result["size"],)
+    if suite == "retrieval":
+        return (result["size"], result["requested_index_type"])
+    return (result["mode"], result["concurrency"])
+
+
+def _lookup(result: dict, path: tuple) -> Optional[float]:
+    value = result
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    if isinstance(value, dict):
+        # Peak RSS: compare the benchmark process itself
+        value = value.get("self")
+    return value
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    List metrics that regressed by more than `threshold` (a fraction) against a baseline.
+    
+    Returns:
+        One line per regression, empty if there are none
+    """
+    regressions = []
+    for suite, path, higher_is_better in COMPARED_METRICS:
+        previous = {_result_key(suite, result): result for result in baseline.get(suite, [])}
+        for result in current.get(suite, []):
+            key = _result_key(suite, result)
+            if key not in previous:
+                continue
+            old, new = _lookup(previous[key], path), _lookup(result, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append(
+                    f"{suite} {key} {'.'.join(path)}: {old} -> {new} ({change:+.1%})"
+                )
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def _str_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="RAG backend benchmarks")
+    parser.add_argument("--suites", type=_str_list, default=["ingest", "retrieval", "chat"], help="ingest,retrieval,chat")
+    parser.add_argument("--sizes", type=_int_list, default=[100, 1000], help="Corpus sizes in files")
+    parser.add_argument("--words-per-file", type=int, default=800)
+    parser.add_argument("--formats", type=_str_list, default=list(FORMATS), help="txt,md,pdf,docx")
+    parser.add_argument("--index-types", type=_str_list, default=list(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=200, help="Retrieval queries per case")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=8, help="Threads for the concurrent retrieval run")
+    parser.add_argument("--chat-size", type=int, default=None, help="Corpus size for the chat suite (default: smallest)")
+    parser.add_argument("--chat-requests", type=int, default=100, help="Requests per chat run")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--modes", type=_str_list, default=["chat", "stream"], help="chat,stream")
+    parser.add_argument("--chat-cache", action="store_true", help="Keep the semantic response cache enabled")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--llm-completion-tokens", type=int, default=64)
+    parser.add_argument("--startup-timeout", type=float, default=900.0)
+    parser.add_argument("--workdir", default=None, help="Keep corpora and indexes here (default: a temp dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", default=None, help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    generator = CorpusGenerator(seed=args.seed)
+    
+    os.environ.update({"LOG_LEVEL": "WARNING"})
+    from app.config import get_settings
+    
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embedding_model": get_settings().embedding_model,
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+        }
+    }
+    
+    suites = {
+        "ingest": run_ingest_suite,
+        "retrieval": run_retrieval_suite,
+        "chat": run_chat_suite
+    }
+    try:
+        for suite in args.suites:
+            results[suite] = suites[suite](args, generator, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Shared fixtures: isolated settings and a deterministic stand-in for the embedding model."""
+
+import hashlib
+import os
+
+# Read by the logger at import time: write records synchronously and keep
+# test output quiet
+os.environ.setdefault("LOG_ASYNC", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import app.llm.longcat_client as longcat_client
+import app.rag.history as history
+import app.rag.ingestion as ingestion
+import app.rag.retrieval as retrieval
+import app.rag.vectorstore as vectorstore
+from app.config import get_settings
+
+
+FAKE_DIMENSION = 16
+
+
+class FakeEmbeddings(Embeddings):
+    """Unit vectors seeded from the text, so equal texts get equal embeddings."""
+    
+    def __init__(self, **kwargs):
+        self.calls = 0
+    
+    def _embed(self, text: str) -> list[float]:
+        self.calls += 1
+        seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:4], "little")
+        vector = np.random.default_rng(seed).standard_normal(FAKE_DIMENSION)
+        return (vector / np.linalg.norm(vector)).tolist()
+    
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+    
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(tmp_path, monkeypatch):
+    """Point every data path into a temp directory and reset the singletons."""
+    data_folder = tmp_path / "data"
+    data_folder.mkdir()
+    monkeypatch.setenv("DATA_FOLDER", str(data_folder))
+    monkeypatch.setenv("FAISS_INDEX_PATH", str(tmp_path / "faiss_index"))
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "embedding_cache"))
+    monkeypatch.setenv("LONGCAT_API_KEY", "test")
+    # Small files: load them in-process instead of spawning a worker pool
+    monkeypatch.setenv("INGESTION_WORKERS", "1")
+    monkeypatch.setattr(vectorstore, "HuggingFaceEmbeddings", FakeEmbeddings)
+    
+    monkeypatch.setattr(vectorstore.VectorStoreManager, "_instance", None)
+    monkeypatch.setattr(history, "_history_instance", None)
+    monkeypatch.setattr(ingestion, "_ingestion_instance", None)
+    monkeypatch.setattr(retrieval, "_retrieval_instance", None)
+    monkeypatch.setattr(longcat_client, "_client_instance", None)
+    
+    get_settings.cache_clear()
+    yield get_settings
+    get_settings.cache_clear()
+
+
+def _make_chunks(count: int, start: int = 0, prefix: str = "chunk") -> tuple[list[Document], list[str]]:
+    """Build a batch of distinct chunks with their docstore IDs."""
+    documents = [
+        Document(
+            page_content=f"{prefix} {i} " + " ".join(f"word{(i * 7 + j) % 101}" for j in range(30)),
+            metadata={"source": f"{prefix}-{i // 10}.md", "position": i}
+        )
+        for i in range(start, start + count)
+    ]
+    return documents, [f"{prefix}-{i:08d}" for i in range(start, start + count)]
+
+
+@pytest.fixture
+def make_chunks():
+    """Factory for batches of distinct chunks: make_chunks(count, start=0, prefix="chunk")."""
+    return _make_chunks
@@ -0,0 +1,57 @@
+"""Tests for the BM25 keyword index and how it is saved."""
+
+import os
+from pathlib import Path
+
+from app.rag import bm25
+from app.rag.bm25 import BM25Index
+
+
+def _texts(start: int, count: int) -> tuple[list[str], list[str]]:
+    ids = [f"doc-{i}" for i in range(start, start + count)]
+    texts = [f"term{i % 7} shared code-{i} word{i}" for i in range(start, start + count)]
+    return ids, texts
+
+
+def _save(index: BM25Index, folder: Path) -> None:
+    """Save into a new folder, then adopt it, as the index manager does."""
+    folder.mkdir()
+    index.save(str(folder))
+    index.saved(str(folder))
+
+
+def _base_files(folder: Path) -> list[Path]:
+    return sorted(folder.glob(f"{bm25.BM25_BASE_PREFIX}*"))
+
+
+def test_saves_between_merges_link_the_base_and_write_only_the_delta(tmp_path):
+    index = BM25Index()
+    index.add(*_texts(0, 200))
+    index.merge()
+    _save(index, tmp_path / "v1")
+    
+    index.add(*_texts(200, 10))
+    index.remove(["doc-3", "doc-205"])
+    _save(index, tmp_path / "v2")
+    
+    # The base is the same file, not a rewritten copy
+    for old, new in zip(_base_files(tmp_path / "v1"), _base_files(tmp_path / "v2")):
+        assert old.name == new.name
+        assert os.path.samefile(old, new)
+    
+    loaded = BM25Index.load(str(tmp_path / "v2"), k1=1.2, b=0.75)
+    assert len(loaded) == len(index) == 208
+    for query in ("term3 shared", "code-204", "word3", "code-205", "word150 term1"):
+        assert loaded.search(query, 10) == index.search(query, 10)
+    
+    # A reloaded index keeps linking its base until it merges
+    loaded.add(*_texts(300, 5))
+    _save(loaded, tmp_path / "v3")
+    assert os.path.samefile(_base_files(tmp_path / "v1")[0], _base_files(tmp_path / "v3")[0])
+    
+    loaded.merge()
+    _save(loaded, tmp_path / "v4")
+    assert [path.name for path in _base_files(tmp_path / "v4")] != [path.name for path in _base_files(tmp_path / "v3")]
+    reloaded = BM25Index.load(str(tmp_path / "v4"), k1=1.2, b=0.75)
+    assert reloaded.search("code-302 term1", 10) == loaded.search("code-302 term1", 10)
+    assert reloaded.search("code-302", 1)[0][0] == "doc-302"
@@ -0,0 +1,243 @@
+"""Tests for the on-disk chunk store and how the index manager saves it."""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.rag import chunk_store
+from app.rag.chunk_store import ChunkStore, remove_stale_spill_files
+from app.rag.registry import SourceRegistry
+from app.rag.vectorstore import VectorStoreManager
+
+
+def _save(store: ChunkStore, folder: Path) -> None:
+    """Save a store the way the index manager does: into a new folder, then adopt it."""
+    store.save(str(folder))
+    store.saved(str(folder))
+
+
+def _file_digests(folder: Path) -> dict:
+    return {path.name: hashlib.sha256(path.read_bytes()).hexdigest() for path in folder.iterdir()}
+
+
+def _build_manager(make_chunks, count: int) -> VectorStoreManager:
+    """Build, swap in and save an index of `count` chunks."""
+    manager = VectorStoreManager()
+    vectorstore, config, keyword_index = manager.build_vectorstore([make_chunks(count)])
+    registry = SourceRegistry(manager.settings.faiss_index_path, load=False)
+    manager.replace_vectorstore(vectorstore, registry, 0, config, keyword_index)
+    return manager
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_searches_during_saves_read_consistent_chunks(isolated_settings, monkeypatch, make_chunks, use_mmap):
+    monkeypatch.setenv("INDEX_MMAP", str(use_mmap).lower())
+    monkeypatch.setenv("HYBRID_SEARCH_ENABLED", "false")
+    isolated_settings.cache_clear()
+    manager = _build_manager(make_chunks, 200)
+    
+    errors = []
+    done = threading.Event()
+    
+    def search():
+        store = manager.get_vectorstore().docstore
+        while not done.is_set():
+            try:
+                for query in ("chunk 3", "word17 word42", "chunk 250"):
+                    for doc, _ in manager.similarity_search_with_score(query, k=20):
+                        position = doc.metadata["position"]
+                        assert doc.id == f"chunk-{position:08d}"
+                        assert doc.page_content.startswith(f"chunk {position} ")
+                with manager._index_lock.read_lock():
+                    # Labels around the committed/pending boundary move on every save
+                    for label in range(max(store.size - 60, 0), store.size):
+                        doc = store.get(label)
+                        assert doc is None or doc.metadata["position"] == label
+            except Exception as e:
+                errors.append(e)
+                return
+    
+    # Switch threads as often as possible so readers land inside saves
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    readers = [threading.Thread(target=search) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        start = 200
+        for _ in range(30):
+            with manager.mutation():
+                manager.add_documents(*make_chunks(20, start=start))
+                manager.delete_documents([f"chunk-{start - 150:08d}"])
+                manager.save()
+            start += 20
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+        sys.setswitchinterval(switch_interval)
+    
+    assert not errors, repr(errors[0])
+    store = manager.get_vectorstore().docstore
+    assert store.get(start - 1).page_content.startswith(f"chunk {start - 1} ")
+    assert store.get(50) is None
+
+
+def test_save_switches_chunk_store_with_searches_excluded(monkeypatch, make_chunks):
+    manager = _build_manager(make_chunks, 50)
+    store = manager.get_vectorstore().docstore
+    held = []
+    saved = store.saved
+    
+    def checked_saved(folder_path):
+        held.append(manager._index_lock._writer_active)
+        saved(folder_path)
+    
+    monkeypatch.setattr(store, "saved", checked_saved)
+    with manager.mutation():
+        manager.add_documents(*make_chunks(10, start=50))
+        manager.save()
+    
+    assert held == [True]
+    assert store.get(55).page_content.startswith("chunk 55 ")
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_saves_never_modify_the_files_of_earlier_saves(tmp_path, make_chunks, use_mmap):
+    store = ChunkStore(use_mmap)
+    store.add(list(range(100)), *reversed(make_chunks(100)))
+    _save(store, tmp_path / "v1")
+    before = _file_digests(tmp_path / "v1")
+    
+    # Two workers that loaded the same index both save their own changes
+    first = ChunkStore.open(str(tmp_path / "v1"), use_mmap=use_mmap)
+    second = ChunkStore.open(str(tmp_path / "v1"), use_mmap=use_mmap)
+    documents, ids = make_chunks(20, start=100, prefix="first")
+    first.add(list(range(100, 120)), ids, documents)
+    first.delete_labels([3])
+    _save(first, tmp_path / "v2")
+    reader = ChunkStore.open(str(tmp_path / "v2"), use_mmap=True)
+    
+    documents, ids = make_chunks(5, start=100, prefix="second")
+    second.add(list(range(100, 105)), ids, documents)
+    _save(second, tmp_path / "v3")
+    
+    assert _file_digests(tmp_path / "v1") == before
+    assert reader.get(110).page_content.startswith("first 110 ")
+    assert reader.get(3) is None
+    assert second.get(3).page_content.startswith("chunk 3 ")
+    assert second.get(104).page_content.startswith("second 104 ")
+    assert first.get(119).id == "first-00000119"
+
+
+def test_opens_stores_saved_as_single_files(tmp_path, make_chunks):
+    store = ChunkStore()
+    store.add(list(range(10)), *reversed(make_chunks(10)))
+    store.delete_labels([4])
+    _save(store, tmp_path / "index")
+    
+    # Layout before segments: chunks.dat/.idx/.del and their committed lengths
+    folder = tmp_path / "index"
+    manifest = json.loads((folder / "chunks.json").read_text())
+    (segment,) = manifest["segments"]
+    for suffix in (".dat", ".idx", ".del"):
+        (folder / f"{segment['name']}{suffix}").rename(folder / f"chunks{suffix}")
+    (folder / "chunks.json").write_text(json.dumps({
+        "rows": segment["rows"],
+        "data_bytes": segment["data_bytes"],
+        "deleted": segment["deleted"]
+    }))
+    
+    legacy = ChunkStore.open(str(folder))
+    assert len(legacy) == 9 and legacy.get(4) is None
+    legacy.add([10], ["chunk-00000010"], make_chunks(1, start=10)[0])
+    legacy.delete_labels([5])
+    _save(legacy, tmp_path / "converted")
+    
+    reopened = ChunkStore.open(str(tmp_path / "converted"))
+    assert reopened.get(10).page_content.startswith("chunk 10 ")
+    assert reopened.get(5) is None and reopened.get(6) is not None
+    assert reopened.get_stats()["segments"] == 2
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_segments_are_merged_and_compacted(tmp_path, monkeypatch, make_chunks, use_mmap):
+    monkeypatch.setattr(chunk_store, "MAX_SEGMENTS", 4)
+    store = ChunkStore(use_mmap)
+    store.add(list(range(50)), *reversed(make_chunks(50)))
+    _save(store, tmp_path / "v0")
+    
+    label = 50
+    for version in range(1, 8):
+        documents, ids = make_chunks(5, start=label)
+        store.add(list(range(label, label + 5)), ids, documents)
+        store.delete_labels([version, label])
+        label += 5
+        _save(store, tmp_path / f"v{version}")
+        shutil.rmtree(tmp_path / f"v{version - 1}")
+        assert store.get_stats()["segments"] <= 4
+    
+    folder = tmp_path / "v7"
+    reopened = ChunkStore.open(str(folder), use_mmap=use_mmap)
+    for current in (store, reopened):
+        assert len(current) == 50 + 35 - 14
+        assert current.get(1) is None and current.get(50) is None
+        assert current.get(51).page_content.startswith("chunk 51 ")
+        assert current.get(0).id == "chunk-00000000"
+    assert reopened.get_stats()["dead_bytes"] == store.get_stats()["dead_bytes"]
+    
+    # Deleting most chunks rewrites everything into one segment
+    store.delete_labels([label for label in range(store.size) if store.get(label) is not None][:-3])
+    _save(store, tmp_path / "compacted")
+    assert len(store) == 3
+    assert store.get_stats()["segments"] == 1
+    assert store.get_stats()["dead_bytes"] == 0
+    assert len(list((tmp_path / "compacted").glob("*.dat"))) == 1
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_added_chunks_are_spilled_to_disk_until_saved(tmp_path, make_chunks, use_mmap):
+    prefix = tmp_path / "faiss_index"
+    store = ChunkStore(use_mmap, spill_prefix=str(prefix))
+    store.add(list(range(0, 60, 2)), *reversed(make_chunks(30)))
+    
+    (spill,) = tmp_path.glob("faiss_index.spill-*")
+    assert spill.stat().st_size == store.get_stats()["spill_bytes"] > 0
+    assert store.get(58).id == "chunk-00000029"
+    assert store.get(59) is None
+    
+    _save(store, prefix)
+    assert not list(tmp_path.glob("faiss_index.spill-*"))
+    assert store.get_stats()["spill_bytes"] == 0
+    assert store.get(58).page_content.startswith("chunk 29 ")
+    
+    # Later additions spill to a new file, which the next save links in
+    store.add([60, 61], *reversed(make_chunks(2, start=30)))
+    store.delete_labels([0])
+    (spill,) = tmp_path.glob("faiss_index.spill-*")
+    store.save(str(tmp_path / "next"))
+    store.saved(str(tmp_path / "next"))
+    assert not spill.exists()
+    reopened = ChunkStore.open(str(tmp_path / "next"), use_mmap=use_mmap)
+    assert reopened.get(61).page_content.startswith("chunk 31 ")
+    assert reopened.get(0) is None and len(reopened) == 31
+
+
+def test_removes_spill_files_of_exited_processes(tmp_path):
+    prefix = tmp_path / "faiss_index"
+    own = tmp_path / f"faiss_index.spill-{os.getpid()}-0000aaaa"
+    exited = tmp_path / "faiss_index.spill-999999999-0000bbbb"
+    other = tmp_path / "other.spill-999999999-0000cccc"
+    for path in (own, exited, other):
+        path.write_bytes(b"records")
+    
+    remove_stale_spill_files(str(prefix))
+    
+    assert own.exists() and other.exists()
+    assert not exited.exists()
@@ -0,0 +1,38 @@
+"""Tests for deduplicating, merging and token-budgeting the prompt context."""
+
+import pytest
+
+from app.rag.context_builder import ContextBuilder
+
+
+@pytest.fixture
+def builder(isolated_settings, monkeypatch):
+    # The fake embeddings have no tokenizer: 4 characters count as a token
+    monkeypatch.setenv("CONTEXT_MERGE_ENABLED", "false")
+    monkeypatch.setenv("CONTEXT_DEDUP_THRESHOLD", "0")
+    monkeypatch.setenv("CONTEXT_MAX_TOKENS", "10")
+    isolated_settings.cache_clear()
+    return ContextBuilder()
+
+
+def _chunk(source: str, content: str) -> dict:
+    return {"source": source, "content": content, "score": 1.0}
+
+
+def test_budget_filled_exactly_drops_the_remaining_chunks(builder):
+    # "[Document 1 - a.md]\n" and the content are 20 characters (5 tokens) each
+    chunks = [_chunk("a.md", "x" * 20)] + [_chunk(f"{name}.md", "y" * 4000) for name in "bcd"]
+    
+    context = builder.build(chunks)
+    
+    assert context == "[Document 1 - a.md]\n" + "x" * 20
+    assert builder.count_tokens(context) == 10
+
+
+def test_zero_budget_is_unlimited(builder, isolated_settings, monkeypatch):
+    monkeypatch.setenv("CONTEXT_MAX_TOKENS", "0")
+    isolated_settings.cache_clear()
+    builder = ContextBuilder()
+    chunks = [_chunk(f"{name}.md", "y" * 4000) for name in "abc"]
+    
+    assert builder.build(chunks).count("y" * 4000) == 3
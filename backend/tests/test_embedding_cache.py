@@ -0,0 +1,102 @@
+"""Tests for the persistent embedding cache shared between processes."""
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from app.rag.embedding_cache import EmbeddingCache, text_digest
+from app.rag.vectorstore import VectorStoreManager
+
+
+DIM = 8
+
+
+def _vector(digest: bytes) -> np.ndarray:
+    """Embedding derived from the key, so any mix-up between rows is visible."""
+    return np.frombuffer(digest[:DIM], dtype=np.uint8).astype(np.float32)
+
+
+def _put(cache: EmbeddingCache, texts: list[str]) -> None:
+    digests = [text_digest(text) for text in texts]
+    cache.put_many(digests, np.stack([_vector(digest) for digest in digests]))
+
+
+def _check(cache: EmbeddingCache, texts: list[str]) -> int:
+    """Assert every hit holds its own vector and return the number of hits."""
+    digests = [text_digest(text) for text in texts]
+    hits = 0
+    for digest, vector in zip(digests, cache.get_many(digests)):
+        if vector is not None:
+            np.testing.assert_array_equal(vector, _vector(digest))
+            hits += 1
+    return hits
+
+
+def test_instances_sharing_a_folder_do_not_overwrite_each_other(tmp_path):
+    first = EmbeddingCache(str(tmp_path), 5000)
+    second = EmbeddingCache(str(tmp_path), 5000)
+    
+    for batch in range(10):
+        _put(first, [f"first {batch} {i}" for i in range(150)])
+        _put(second, [f"second {batch} {i}" for i in range(150)])
+    
+    texts = [f"{name} {batch} {i}" for name in ("first", "second") for batch in range(10) for i in range(150)]
+    assert _check(first, texts) == len(texts)
+    assert _check(second, texts) == len(texts)
+    assert _check(EmbeddingCache(str(tmp_path), 5000), texts) == len(texts)
+
+
+def test_rows_evicted_by_another_instance_read_as_misses(tmp_path):
+    first = EmbeddingCache(str(tmp_path), 1024)
+    second = EmbeddingCache(str(tmp_path), 1024)
+    old = [f"old {i}" for i in range(1000)]
+    _put(first, old)
+    assert _check(first, old) == 1000
+    
+    # The second instance fills the cache, evicting and reusing the old rows
+    new = [f"new {i}" for i in range(1000)]
+    _put(second, new)
+    
+    assert _check(first, old) < 100
+    assert _check(first, new) == 1000
+
+
+def _writer(cache_dir: str, name: str) -> None:
+    cache = EmbeddingCache(cache_dir, 3000)
+    for batch in range(20):
+        _put(cache, [f"{name} {batch} {i}" for i in range(100)])
+        _check(cache, [f"{name} {batch} {i}" for i in range(100)])
+
+
+def test_concurrent_writer_processes_keep_keys_and_vectors_together(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    writers = [context.Process(target=_writer, args=(str(tmp_path), f"p{n}")) for n in range(3)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert all(writer.exitcode == 0 for writer in writers)
+    
+    texts = [f"p{n} {batch} {i}" for n in range(3) for batch in range(20) for i in range(100)]
+    cache = EmbeddingCache(str(tmp_path), 3000)
+    # 6000 entries went into 3000 rows: the survivors must all be intact
+    assert 2500 <= _check(cache, texts) <= 3000
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_queries_bypass_the_persistent_cache(isolated_settings, monkeypatch, batched):
+    monkeypatch.setenv("QUERY_BATCH_ENABLED", str(batched).lower())
+    isolated_settings.cache_clear()
+    manager = VectorStoreManager()
+    manager.get_embeddings().embed_documents(["a chunk"])
+    
+    def touched(*args):
+        raise AssertionError("query reached the persistent embedding cache")
+    
+    monkeypatch.setattr(EmbeddingCache, "get_many", touched)
+    monkeypatch.setattr(EmbeddingCache, "put_many", touched)
+    vectors = [manager.embed_query(f"question {i}") for i in range(5)]
+    
+    assert len(vectors) == 5 and all(len(vector) == 16 for vector in vectors)
+    assert manager.get_embedding_cache_stats()["entries"] == 1
@@ -0,0 +1,28 @@
+"""Tests for index construction and training."""
+
+import numpy as np
+
+from app.rag.index_factory import TrainingSample
+
+
+def test_training_sample_is_uniform_over_the_stream():
+    sample = TrainingSample(1000)
+    stream = np.arange(20000, dtype=np.float32)[:, None]
+    for start in range(0, len(stream), 256):
+        sample.add(stream[start:start + 256])
+    
+    positions = sample.vectors[:, 0]
+    assert sample.seen == 20000
+    assert len(positions) == len(np.unique(positions)) == 1000
+    # A sample of the first vectors would sit entirely in the first bucket
+    counts = np.histogram(positions, bins=4, range=(0, 20000))[0]
+    assert all(200 <= count <= 300 for count in counts), counts
+
+
+def test_training_sample_keeps_short_streams_whole():
+    sample = TrainingSample(100)
+    sample.add(np.ones((30, 4), dtype=np.float32))
+    sample.add(np.zeros((20, 4), dtype=np.float32))
+    
+    assert sample.vectors.shape == (50, 4)
+    assert sample.vectors[:30].all() and not sample.vectors[30:].any()
@@ -0,0 +1,108 @@
+"""Tests for full and differential indexing of the data folder."""
+
+import os
+from pathlib import Path
+
+import pytest
+from langchain_core.documents import Document
+
+from app.rag.history import get_conversation_history
+from app.rag.ingestion import DocumentIngestion
+
+
+def _write(folder: str, name: str, words: int, tag: str) -> None:
+    text = "\n\n".join(
+        " ".join(f"{tag}{paragraph}w{i}" for i in range(20))
+        for paragraph in range(words // 20)
+    )
+    (Path(folder) / name).write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def ingestion(isolated_settings, monkeypatch):
+    monkeypatch.setenv("CHUNK_SIZE", "200")
+    monkeypatch.setenv("CHUNK_OVERLAP", "40")
+    isolated_settings.cache_clear()
+    return DocumentIngestion()
+
+
+def test_full_index_registers_every_chunk_under_its_source(ingestion):
+    data = ingestion.settings.data_folder
+    _write(data, "alpha.txt", 400, "a")
+    _write(data, "beta.md", 200, "b")
+    (Path(data) / "empty.txt").write_text("", encoding="utf-8")
+    
+    documents, chunks = ingestion.index_documents()
+    
+    registry = ingestion.vectorstore_manager.get_registry()
+    store = ingestion.vectorstore_manager.get_vectorstore().docstore
+    assert documents == 3
+    assert sorted(registry.sources()) == ["alpha.txt", "beta.md", "empty.txt"]
+    assert registry.get_ids("empty.txt") == []
+    assert registry.get("empty.txt")["sha256"]
+    
+    ids = registry.get_ids("alpha.txt") + registry.get_ids("beta.md")
+    assert len(ids) == chunks == len(store)
+    for source in ("alpha.txt", "beta.md"):
+        entry = registry.get(source)
+        assert entry["sha256"] and entry["size"] > 0
+        assert all(store.search(doc_id).metadata["source"] == source for doc_id in entry["ids"])
+
+
+def test_reindex_changed_applies_only_the_differences(ingestion):
+    data = ingestion.settings.data_folder
+    _write(data, "alpha.txt", 400, "a")
+    _write(data, "beta.md", 200, "b")
+    _write(data, "gamma.txt", 200, "g")
+    ingestion.index_documents()
+    registry = ingestion.vectorstore_manager.get_registry()
+    old_beta, old_gamma = registry.get_ids("beta.md"), registry.get_ids("gamma.txt")
+    
+    # Touched with identical content, rewritten, deleted and new files
+    alpha = Path(data) / "alpha.txt"
+    os.utime(alpha, ns=(alpha.stat().st_atime_ns, alpha.stat().st_mtime_ns + 10 ** 9))
+    _write(data, "beta.md", 300, "B")
+    (Path(data) / "gamma.txt").unlink()
+    _write(data, "delta.txt", 200, "d")
+    
+    result = ingestion.reindex_changed()
+    
+    new_ids = registry.get_ids("beta.md") + registry.get_ids("delta.txt")
+    assert result["mode"] == "incremental"
+    assert (result["added"], result["modified"], result["removed"], result["unchanged"]) == (1, 1, 1, 1)
+    assert result["chunks_removed"] == len(old_beta) + len(old_gamma)
+    assert result["chunks_added"] == len(new_ids) > 0
+    assert not set(new_ids) & set(old_beta)
+    assert sorted(registry.sources()) == ["alpha.txt", "beta.md", "delta.txt"]
+    
+    store = ingestion.vectorstore_manager.get_vectorstore().docstore
+    assert result["chunks"] == len(store) == len(registry.get_ids("alpha.txt")) + len(new_ids)
+    
+    again = ingestion.reindex_changed()
+    assert (again["added"], again["modified"], again["removed"], again["unchanged"]) == (0, 0, 0, 3)
+    assert again["chunks_added"] == again["chunks_removed"] == 0
+
+
+def test_truncated_history_drops_its_indexed_chunks(ingestion):
+    data = ingestion.settings.data_folder
+    _write(data, "alpha.txt", 200, "a")
+    ingestion.index_documents()
+    history = get_conversation_history()
+    for turn in range(5):
+        history.append_conversation(f"question{turn} " * 10, f"zebraanswer{turn} " * 20)
+    
+    ingestion.index_history_increment()
+    manager = ingestion.vectorstore_manager
+    history_ids = manager.get_registry().get_ids("history.txt")
+    assert history_ids
+    assert manager.keyword_search("zebraanswer3", k=5)
+    
+    history.history_file.write_text("", encoding="utf-8")
+    ingestion.index_history_increment()
+    
+    store = manager.get_vectorstore().docstore
+    assert manager.get_registry().get_ids("history.txt") == []
+    assert not any(isinstance(store.search(doc_id), Document) for doc_id in history_ids)
+    assert len(store) == len(manager.get_registry().get_ids("alpha.txt"))
+    assert manager.keyword_search("zebraanswer3", k=5) == []
+    assert manager.get_history_offset() == 0
@@ -0,0 +1,47 @@
+"""Tests for retrying LongCat API requests."""
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from app.llm import longcat_client
+from app.llm.longcat_client import LongCatClient
+
+
+def _rate_limited(retry_after: str) -> RateLimitError:
+    request = httpx.Request("POST", "https://api.longcat.chat/openai/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return RateLimitError("Rate limit exceeded", response=response, body=None)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(longcat_client.time, "sleep", delays.append)
+    return delays
+
+
+def test_rate_limited_request_is_retried_after_retry_after(sleeps):
+    errors = [_rate_limited("0.5"), _rate_limited("0.25")]
+    
+    def request():
+        if errors:
+            raise errors.pop(0)
+        return "answer"
+    
+    assert LongCatClient()._with_retries(request) == "answer"
+    assert sleeps == [0.5, 0.25]
+
+
+def test_retry_after_beyond_max_delay_is_not_waited_for(sleeps, isolated_settings, monkeypatch):
+    monkeypatch.setenv("LLM_RETRY_MAX_DELAY", "5")
+    isolated_settings.cache_clear()
+    error = _rate_limited("60")
+    
+    def request():
+        raise error
+    
+    with pytest.raises(RateLimitError) as raised:
+        LongCatClient()._with_retries(request)
+    assert raised.value is error
+    assert sleeps == []
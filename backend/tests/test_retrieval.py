@@ -0,0 +1,37 @@
+"""Tests for the async query paths of the RAG pipeline."""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.rag.retrieval import RAGRetrieval
+
+
+class _ContextBuilt(Exception):
+    pass
+
+
+@pytest.mark.parametrize("method", ["aquery", "astream_query"])
+def test_async_queries_build_context_off_the_event_loop(method, monkeypatch):
+    retrieval = RAGRetrieval()
+    threads = []
+    
+    def build_context(chunks):
+        threads.append(threading.current_thread())
+        raise _ContextBuilt
+    
+    monkeypatch.setattr(retrieval, "_check_response_cache", lambda *args: (None, None))
+    monkeypatch.setattr(retrieval, "retrieve_relevant_chunks", lambda *args, **kwargs: [])
+    monkeypatch.setattr(retrieval, "build_context", build_context)
+    
+    async def run():
+        if method == "aquery":
+            await retrieval.aquery("question")
+        else:
+            async for _ in retrieval.astream_query("question"):
+                pass
+    
+    with pytest.raises(_ContextBuilt):
+        asyncio.run(run())
+    assert threads and threads[0] is not threading.main_thread()
@@ -0,0 +1,52 @@
+"""Tests for building, updating and searching the FAISS index."""
+
+import os
+import sys
+
+import pytest
+
+from app.rag.registry import SourceRegistry
+from app.rag.vectorstore import VectorStoreManager
+
+
+def test_trained_index_is_sized_for_and_trained_across_the_whole_stream(isolated_settings, monkeypatch, make_chunks):
+    monkeypatch.setenv("FAISS_INDEX_TYPE", "ivf_flat")
+    monkeypatch.setenv("FAISS_TRAIN_SAMPLE", "200")
+    isolated_settings.cache_clear()
+    manager = VectorStoreManager()
+    batches = [make_chunks(100, start=start) for start in range(0, 1200, 100)]
+    
+    vectorstore, config, _ = manager.build_vectorstore(batches)
+    
+    assert config["type"] == "ivf_flat"
+    assert config["trained_on"] == 200
+    # nlist follows the full corpus (1200 vectors), not the training sample
+    assert config["nlist"] == 1200 // 39
+    assert vectorstore.index.ntotal == config["next_id"] == 1200
+    
+    manager._vectorstore, manager._index_config = vectorstore, config
+    documents, _ = make_chunks(1, start=1150)
+    results = manager.similarity_search_with_score(documents[0].page_content, k=1, nprobe=config["nlist"])
+    assert results[0][0].id == "chunk-00001150"
+    assert results[0][1] < 1e-6
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/self/maps")
+def test_index_mmap_maps_the_saved_index(isolated_settings, monkeypatch, make_chunks):
+    manager = VectorStoreManager()
+    vectorstore, config, keyword_index = manager.build_vectorstore([make_chunks(300)])
+    registry = SourceRegistry(manager.settings.faiss_index_path, load=False)
+    manager.replace_vectorstore(vectorstore, registry, 0, config, keyword_index)
+    
+    monkeypatch.setenv("INDEX_MMAP", "true")
+    isolated_settings.cache_clear()
+    VectorStoreManager._instance = None
+    manager = VectorStoreManager()
+    vectorstore = manager.get_vectorstore()
+    
+    index_file = os.path.realpath(os.path.join(manager.settings.faiss_index_path, "index.faiss"))
+    with open("/proc/self/maps", encoding="utf-8") as maps:
+        mapped = {line.split(maxsplit=5)[-1].strip() for line in maps if "/" in line}
+    assert manager.get_collection_stats()["memory_mapped"] is True
+    assert index_file in mapped
+    assert vectorstore.index.ntotal == 300
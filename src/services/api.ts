@@ -1,4 +1,4 @@
-import type { ChatResponse, HealthResponse, ReindexResponse, StatsResponse } from '../types';
+import type { ChatResponse, HealthResponse, ReindexJobResponse, ReindexResponse, StatsResponse } from '../types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -60,6 +60,18 @@ class ApiService {
     });
   }
 
+  async getReindexJob(jobId: string): Promise<ReindexJobResponse> {
+    return this.fetchWithRetry<ReindexJobResponse>(`${this.baseUrl}/reindex/${jobId}`, {
+      method: 'GET',
+    });
+  }
+
+  async cancelReindexJob(jobId: string): Promise<ReindexJobResponse> {
+    return this.fetchWithRetry<ReindexJobResponse>(`${this.baseUrl}/reindex/${jobId}/cancel`, {
+      method: 'POST',
+    });
+  }
+
   async getHealth(): Promise<HealthResponse> {
     return this.fetchWithRetry<HealthResponse>(`${this.baseUrl}/health`, {
       method: 'GET',
@@ -23,11 +23,38 @@ export interface ChatResponse {
   response: string;
   sources: Source[];
   tokens: TokenUsage;
+  cached?: boolean;
+  timings?: Record<string, number>;
 }
 
 export interface ReindexResponse {
   status: string;
   message: string;
+  mode?: 'full' | 'incremental';
+  added?: number;
+  modified?: number;
+  removed?: number;
+  unchanged?: number;
+  chunks_added?: number;
+  chunks_removed?: number;
+  job_id?: string;
+}
+
+export interface ReindexJobResponse {
+  job_id: string;
+  status: 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+  phase: string;
+  mode: 'full' | 'incremental';
+  message: string;
+  files_done: number;
+  files_total: number;
+  chunks_embedded: number;
+  elapsed_seconds: number;
+  throughput_chunks_per_second: number;
+  eta_seconds: number | null;
+  created_at: string;
+  result: ReindexResponse | null;
+  error: string | null;
 }
 
 export interface HealthResponse {
@@ -35,6 +62,7 @@ export interface HealthResponse {
   vector_db: string;
   documents_indexed: number;
   total_chunks: number;
+  readiness?: string;
 }
 
 export interface StatsResponse {